@@ -0,0 +1,48 @@
+import timeit
+
+from django.template import engines
+from django.test import TestCase
+from django.test.client import RequestFactory
+from wagtail.core.models import Page
+
+from wagtailmenus.utils.misc import derive_section_root
+
+
+class BenchmarkTestCase(TestCase):
+    """
+    A base class for benchmarks, which are written as test cases so that
+    they can make use of the test suite's database setup and fixtures.
+    Timings are printed to stdout.
+    """
+    fixtures = ['test.json']
+    number = 20
+    repeat = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        print('\n%s' % cls.__name__)
+
+    def benchmark(self, label, func, number=None, repeat=None):
+        """
+        Call ``func`` ``number`` times, ``repeat`` times over, and print the
+        best average duration per call. The duration (in seconds) is also
+        returned.
+        """
+        number = number or self.number
+        timings = timeit.repeat(func, number=number, repeat=repeat or self.repeat)
+        duration = min(timings) / number
+        print('    %-64s %10.3f ms' % (label, duration * 1000))
+        return duration
+
+    def get_request(self, url='/'):
+        request = RequestFactory().get(url)
+        page = Page.objects.get(url_path='/home' + url).specific
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = page
+        request.META['WAGTAILMENUS_CURRENT_SECTION_ROOT'] = derive_section_root(page)
+        return request
+
+    def get_template(self, template_string, engine='django'):
+        if engine == 'django':
+            template_string = '{% load menu_tags %}' + template_string
+        return engines[engine].from_string(template_string)
@@ -0,0 +1,65 @@
+import shutil
+import tempfile
+
+from django.contrib.auth.models import AnonymousUser
+from django.test.client import RequestFactory
+from wagtail.core.models import Site
+
+from wagtailmenus.conf import settings
+from wagtailmenus.export import SiteExporter
+
+from .base import BenchmarkTestCase
+
+
+class MenuExportBenchmark(BenchmarkTestCase):
+    """
+    Compares the time taken to render the fixture main and section menus for
+    every page by preparing them in the usual way, and by applying active
+    classes to menus compiled once for the site (as ``SiteExporter`` does),
+    and times the export of every page of the fixture site.
+    """
+    number = 5
+
+    def setUp(self):
+        self.site = Site.objects.get(is_default_site=True)
+        self.exporter = SiteExporter(self.site)
+        self.pages = list(self.exporter.get_pages())
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def render_menus(self):
+        for page, ancestor_ids, section_root in self.pages:
+            request = RequestFactory().get(page.relative_url(self.site))
+            request.site = request._wagtail_site = self.site
+            request.user = AnonymousUser()
+            context = {
+                'request': request,
+                'wagtailmenus_vals': {
+                    'current_page': page,
+                    'section_root': section_root,
+                    'current_page_ancestor_ids': ancestor_ids,
+                },
+            }
+            settings.models.MAIN_MENU_MODEL.render_from_tag(context)
+            settings.objects.SECTION_MENU_CLASS.render_from_tag(
+                context, max_levels=settings.DEFAULT_SECTION_MENU_MAX_LEVELS
+            )
+
+    def render_compiled_menus(self):
+        for page, ancestor_ids, section_root in self.pages:
+            self.exporter.get_menus_for_page(
+                page, ancestor_ids, section_root, page.relative_url(self.site)
+            )
+
+    def test_fixture_site(self):
+        label = 'main and section menus for %s pages: %s'
+        self.benchmark(label % (len(self.pages), 'prepared per page'), self.render_menus)
+        self.benchmark(
+            label % (len(self.pages), 'compiled once, with overlays'),
+            self.render_compiled_menus,
+        )
+        duration = self.benchmark(
+            'export of all menus for %s pages' % len(self.pages),
+            lambda: SiteExporter(self.site).export(self.output_dir),
+        )
+        print('    %-64s %10.1f' % ('pages per second', len(self.pages) / duration))
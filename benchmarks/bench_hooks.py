@@ -0,0 +1,44 @@
+from wagtail.core import hooks
+
+from wagtailmenus.utils.hooks import get_hooks
+
+from .base import BenchmarkTestCase
+
+
+class GetHooksBenchmark(BenchmarkTestCase):
+    """
+    Compares the time taken to look up the functions registered for a hook
+    using Wagtail's ``hooks.get_hooks()`` and wagtailmenus' cached
+    ``get_hooks()``, for the number of lookups made when rendering a typical
+    main menu (one for each of five hook names, for each of 20 menus and sub
+    menus), with and without functions registered.
+    """
+    number = 200
+    hook_names = (
+        'menus_modify_base_page_queryset',
+        'menus_modify_base_menuitem_queryset',
+        'menus_modify_raw_menu_items',
+        'menus_modify_primed_menu_items',
+        'menus_cache_vary_on',
+    )
+
+    def lookup(self, get_hooks_func):
+        def func():
+            for i in range(20):
+                for hook_name in self.hook_names:
+                    get_hooks_func(hook_name)
+        return func
+
+    def compare(self, label):
+        self.benchmark('%s: wagtail.core.hooks.get_hooks()' % label, self.lookup(hooks.get_hooks))
+        self.benchmark('%s: wagtailmenus.utils.hooks.get_hooks()' % label, self.lookup(get_hooks))
+
+    def test_no_hooks_registered(self):
+        self.compare('100 lookups, no hooks')
+
+    def test_hooks_registered(self):
+        for hook_name in self.hook_names:
+            for order in (2, 1, 0):
+                hooks.register(hook_name, lambda *args, **kwargs: None, order=order)
+            self.addCleanup(hooks._hooks.pop, hook_name)
+        self.compare('100 lookups, 3 hooks each')
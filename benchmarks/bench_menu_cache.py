@@ -0,0 +1,100 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import override_settings
+
+from wagtailmenus.cache import invalidate_dependencies, menu_cache
+from wagtailmenus.snapshots import MAIN_MENU_KEY, compile_site_menus
+from wagtailmenus.utils.misc import get_site_from_request
+from wagtailmenus.versioning import get_site_version
+
+from .base import BenchmarkTestCase
+
+
+class MenuCacheStampedeBenchmark(BenchmarkTestCase):
+    """
+    Simulates many concurrent requests for a cached menu immediately after
+    it is invalidated, and compares the number of times the menu is built
+    (and the time taken to serve every request) when each request rebuilds
+    the menu itself, with ``MenuCache.get_or_build()``.
+    """
+    threads = 20
+    build_time = 0.05
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.reset_stats()
+        self.site = get_site_from_request(self.get_request())
+        # Version numbers are read from the cache from now on, so that
+        # threads don't need database access
+        get_site_version(self.site)
+        self.builds = 0
+        self.builds_lock = threading.Lock()
+
+    def build(self):
+        with self.builds_lock:
+            self.builds += 1
+        # Stands in for the queries needed to build a real menu
+        time.sleep(self.build_time)
+        return {'type': 'main_menu', 'items': []}, {'page:5'}
+
+    def build_without_lock(self):
+        data = menu_cache.get('bench')
+        if data is None:
+            data, dependencies = self.build()
+            menu_cache.set('bench', data, dependencies)
+        return data
+
+    def build_with_lock(self):
+        return menu_cache.get_or_build('bench', self.site, self.build)
+
+    def run_requests(self, label, func):
+        menu_cache.set('bench', {'type': 'main_menu', 'items': []}, {'page:5'})
+        invalidate_dependencies(['page:5'])
+        menu_cache.local.clear()
+        self.builds = 0
+        threads = [threading.Thread(target=func) for i in range(self.threads)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.monotonic() - start
+        print('    %-64s %10.3f ms' % (
+            '%s: %s requests, %s builds' % (label, self.threads, self.builds),
+            duration * 1000
+        ))
+
+    def test_concurrent_requests_after_invalidation(self):
+        self.run_requests('rebuild in every request', self.build_without_lock)
+        self.run_requests('get_or_build()', self.build_with_lock)
+        print('    %-64s %s' % ('get_or_build() stats', menu_cache.get_stats()))
+
+
+class MenuCacheTiersBenchmark(BenchmarkTestCase):
+    """
+    Compares the time taken to fetch the fixture main menu from the
+    in-memory cache for the current process, and from the shared cache
+    (here, Django's local-memory backend, so network round trips to a real
+    cache server would add to the latter).
+    """
+    number = 1000
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.local.clear()
+        self.site = get_site_from_request(self.get_request())
+        data = compile_site_menus(self.site)[MAIN_MENU_KEY]
+        self.build = lambda: (data, {'page:5', 'tree:000100020001'})
+        get_site_version(self.site)
+
+    def get_menu(self):
+        return menu_cache.get_or_build('bench', self.site, self.build)
+
+    def test_fixture_main_menu(self):
+        self.get_menu()
+        self.benchmark('fixture main menu: in-memory cache hit', self.get_menu)
+        with override_settings(WAGTAILMENUS_MENU_CACHE_LOCAL_SIZE=0):
+            menu_cache.local.clear()
+            self.benchmark('fixture main menu: shared cache hit', self.get_menu)
@@ -0,0 +1,62 @@
+from wagtail.core.models import Page
+
+from wagtailmenus.models import MainMenu, MainMenuItem
+from wagtailmenus.models.menus import get_deferred_link_page_fields
+
+from .base import BenchmarkTestCase
+
+
+class MenuItemQueryBenchmark(BenchmarkTestCase):
+    """
+    Measures the time taken to fetch menu items (along with minimal
+    'link_page' values) for main menus with different numbers of items, and
+    the cost of working out which 'link_page' fields to defer.
+    """
+    item_counts = (10, 50, 100, 500)
+
+    def setUp(self):
+        self.menu = MainMenu.objects.get(pk=1)
+        self.pages = list(Page.objects.filter(depth__gt=2))
+
+    def set_item_count(self, count):
+        MainMenuItem.objects.filter(menu=self.menu).delete()
+        MainMenuItem.objects.bulk_create(
+            MainMenuItem(
+                menu=self.menu,
+                link_page=self.pages[i % len(self.pages)],
+                sort_order=i,
+            )
+            for i in range(count)
+        )
+
+    def test_finding_deferred_fields(self):
+        def uncached():
+            [
+                'link_page__{}'.format(f.name) for f in Page._meta.get_fields()
+                if f.concrete and f.name not in ('id', 'path', 'depth')
+            ]
+
+        def cached():
+            get_deferred_link_page_fields(MainMenuItem)
+
+        self.benchmark('deferred link_page fields (uncached)', uncached, number=1000)
+        self.benchmark('deferred link_page fields (cached)', cached, number=1000)
+
+    def test_menu_item_queries(self):
+        only_fields = [f.name for f in MainMenuItem._meta.concrete_fields] + [
+            'link_page__id', 'link_page__path', 'link_page__depth'
+        ]
+        for count in self.item_counts:
+            self.set_item_count(count)
+
+            def fetch_with_defer():
+                list(self.menu.get_base_menuitem_queryset())
+
+            def fetch_with_only():
+                list(
+                    self.menu.get_menu_items_manager().for_display()
+                    .select_related('link_page').only(*only_fields)
+                )
+
+            self.benchmark('%s menu items: defer()' % count, fetch_with_defer)
+            self.benchmark('%s menu items: only()' % count, fetch_with_only)
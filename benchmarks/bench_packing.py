@@ -0,0 +1,94 @@
+import json
+import pickle
+
+from wagtailmenus.conf import settings
+from wagtailmenus.snapshots import MAIN_MENU_KEY, compile_site_menus, get_menu_context
+from wagtailmenus.utils.misc import get_site_from_request
+from wagtailmenus.utils.packing import pack_menu, unpack_menu
+
+from .base import BenchmarkTestCase
+
+
+def make_menu_data(items_per_level, levels):
+    """
+    Return a dictionary resembling a compiled main menu, with
+    ``items_per_level`` items at each of ``levels`` levels.
+    """
+    next_id = [1]
+
+    def make_items(parent_href, level):
+        items = []
+        for i in range(items_per_level):
+            href = '%spage-number-%s/' % (parent_href, i)
+            item = {
+                'text': 'Page number %s' % next_id[0],
+                'href': href,
+                'page_id': next_id[0],
+                'active_class': '',
+            }
+            next_id[0] += 1
+            if level < levels:
+                item['children'] = make_items(href, level + 1)
+            items.append(item)
+        return items
+
+    return {'type': 'main_menu', 'items': make_items('/', 1)}
+
+
+class PackedMenuBenchmark(BenchmarkTestCase):
+    """
+    Compares the size and encoding/decoding time of compiled menus stored
+    using ``pack_menu()``, pickle and JSON.
+    """
+    number = 10
+    menus = (
+        ('111 items', 10, 2),
+        ('1,110 items', 10, 3),
+        ('11,110 items', 10, 4),
+    )
+
+    def compare_formats(self, label, data):
+        formats = (
+            ('pickle', lambda: pickle.dumps(data, pickle.HIGHEST_PROTOCOL), pickle.loads),
+            ('json', lambda: json.dumps(data, separators=(',', ':')).encode(), json.loads),
+            ('packed', lambda: pack_menu(data), unpack_menu),
+        )
+        for name, encode, decode in formats:
+            encoded = encode()
+            self.assertEqual(decode(encoded), data)
+            print('    %-64s %10.1f KB' % (
+                '%s: size (%s)' % (label, name), len(encoded) / 1024
+            ))
+            self.benchmark('%s: encode (%s)' % (label, name), encode)
+            self.benchmark('%s: decode (%s)' % (label, name), lambda: decode(encoded))
+
+    def test_fixture_main_menu(self):
+        site = get_site_from_request(self.get_request())
+        self.compare_formats('fixture main menu', compile_site_menus(site)[MAIN_MENU_KEY])
+
+        # For comparison, pickle the 'primed' menu items and page objects
+        # that would be needed to render the same menu
+        menu = settings.models.MAIN_MENU_MODEL._get_render_prepared_object(
+            get_menu_context(site),
+            max_levels=None,
+            apply_active_classes=False,
+            allow_repeating_parents=True,
+            use_absolute_page_urls=False,
+            add_sub_menus_inline=False,
+        )
+        objects = (
+            list(menu.get_menu_items_for_rendering()),
+            list(menu.pages_for_display.values()),
+        )
+        encoded = pickle.dumps(objects, pickle.HIGHEST_PROTOCOL)
+        print('    %-64s %10.1f KB' % (
+            'fixture main menu: size (pickled items and pages)', len(encoded) / 1024
+        ))
+        self.benchmark(
+            'fixture main menu: decode (pickled items and pages)',
+            lambda: pickle.loads(encoded)
+        )
+
+    def test_generated_menus(self):
+        for label, items_per_level, levels in self.menus:
+            self.compare_formats(label, make_menu_data(items_per_level, levels))
@@ -0,0 +1,90 @@
+import tracemalloc
+from collections import namedtuple
+
+from wagtailmenus.models.menus import Menu
+from wagtailmenus.utils.tree import CompactPageTree
+
+from .base import BenchmarkTestCase
+
+# Stands in for 'Page', which would make generating large trees slow
+FakePage = namedtuple('FakePage', ('id', 'path', 'depth', 'steplen'))
+
+
+def make_pages(children_per_page, levels, root_path='00010001'):
+    """
+    Return a list of path-ordered pages forming a tree below a page with the
+    supplied ``root_path``.
+    """
+    pages = []
+    next_id = [1]
+
+    def add_children(parent_path, level):
+        for i in range(1, children_per_page + 1):
+            path = parent_path + '%04d' % i
+            pages.append(FakePage(next_id[0], path, len(path) // 4, 4))
+            next_id[0] += 1
+            if level < levels:
+                add_children(path, level + 1)
+
+    add_children(root_path, 1)
+    return pages
+
+
+class PageTreeBenchmark(BenchmarkTestCase):
+    """
+    Compares the build time, lookup time and memory use of the default 'page
+    children dict' with ``CompactPageTree``, for trees of different sizes.
+    """
+    number = 1
+    repeat = 3
+    trees = (
+        ('1,110 pages', 10, 3),
+        ('22,620 pages', 30, 3),
+        ('111,110 pages', 10, 5),
+        ('131,070 pages (binary tree)', 2, 16),
+    )
+
+    def measure_memory(self, func):
+        tracemalloc.start()
+        result = func()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del result
+        return size
+
+    def test_page_tree(self):
+        menu = Menu()
+        for label, children_per_page, levels in self.trees:
+            pages = make_pages(children_per_page, levels)
+
+            def build_dict():
+                return menu.get_page_children_dict(pages)
+
+            def build_compact():
+                return CompactPageTree(pages)
+
+            children_dict = build_dict()
+            compact_tree = build_compact()
+
+            def lookup_dict():
+                for page in pages:
+                    page.path in children_dict
+                    children_dict.get(page.path, [])
+
+            def lookup_compact():
+                for page in pages:
+                    compact_tree.page_has_children(page)
+                    compact_tree.get_children_for_page(page)
+
+            self.benchmark('%s: build (children dict)' % label, build_dict)
+            self.benchmark('%s: build (compact tree)' % label, build_compact)
+            self.benchmark('%s: lookups (children dict)' % label, lookup_dict)
+            self.benchmark('%s: lookups (compact tree)' % label, lookup_compact)
+            print('    %-64s %10.1f KB' % (
+                '%s: memory (children dict)' % label,
+                self.measure_memory(build_dict) / 1024
+            ))
+            print('    %-64s %10.1f KB' % (
+                '%s: memory (compact tree)' % label,
+                self.measure_memory(build_compact) / 1024
+            ))
@@ -0,0 +1,45 @@
+from django.test import override_settings
+
+from .base import BenchmarkTestCase
+
+
+class TemplateEngineBenchmark(BenchmarkTestCase):
+    """
+    Compares the time taken to render identical menus using the Django
+    template engine, the fast renderer for bundled templates, and Jinja2.
+    """
+
+    menus = (
+        (
+            'main_menu (3 levels)',
+            '{% main_menu max_levels=3 template="menus/main_menu.html" %}',
+            '{{ main_menu(max_levels=3, template="menus/main_menu.html") }}',
+        ),
+        (
+            'flat_menu (2 levels)',
+            "{% flat_menu 'footer' max_levels=2 template='menus/flat_menu.html' %}",
+            "{{ flat_menu('footer', max_levels=2, template='menus/flat_menu.html') }}",
+        ),
+        (
+            'children_menu (3 levels)',
+            '{% children_menu max_levels=3 template="menus/children_menu.html" %}',
+            '{{ children_menu(max_levels=3, template="menus/children_menu.html") }}',
+        ),
+    )
+
+    def test_rendering(self):
+        for label, django_string, jinja2_string in self.menus:
+            django_template = self.get_template(django_string)
+            jinja2_template = self.get_template(jinja2_string, engine='jinja2')
+
+            def render_django():
+                django_template.render({}, self.get_request())
+
+            def render_jinja2():
+                jinja2_template.render({}, self.get_request())
+
+            with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=False):
+                self.benchmark(label + ': Django', render_django)
+            with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=True):
+                self.benchmark(label + ': Django (fast renderer)', render_django)
+            self.benchmark(label + ': Jinja2', render_jinja2)
@@ -0,0 +1,57 @@
+from django.test.client import RequestFactory
+from wagtail.core.models import Page
+
+from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
+from wagtailmenus.models import MainMenu
+from wagtailmenus.tests import utils
+
+from .base import BenchmarkTestCase
+
+
+class SettingsLookupBenchmark(BenchmarkTestCase):
+    """
+    Compares the cost of looking up the settings needed to prime a single
+    menu item via the settings helper and via the settings snapshot, and
+    measures the overall per-item cost of ``Menu._prime_menu_item()``.
+    """
+    item_count = 1000
+
+    def lookup_via_helper(self):
+        for i in range(self.item_count):
+            settings.SECTION_ROOT_DEPTH
+            settings.ACTIVE_CLASS
+            settings.ACTIVE_ANCESTOR_CLASS
+            settings.PAGE_FIELD_FOR_MENU_ITEM_TEXT
+
+    def lookup_via_snapshot(self):
+        for i in range(self.item_count):
+            snapshot = get_settings_snapshot()
+            snapshot.SECTION_ROOT_DEPTH
+            snapshot.ACTIVE_CLASS
+            snapshot.ACTIVE_ANCESTOR_CLASS
+            snapshot.PAGE_FIELD_FOR_MENU_ITEM_TEXT
+
+    def test_settings_lookups(self):
+        label = 'settings lookups for %s items (%%s)' % self.item_count
+        self.benchmark(label % 'settings helper', self.lookup_via_helper)
+        self.benchmark(label % 'settings snapshot', self.lookup_via_snapshot)
+
+    def test_prime_menu_item(self):
+        request = RequestFactory().get('/about-us/')
+        menu = MainMenu.objects.get(pk=1)
+        menu._contextual_vals = utils.make_contextualvals_instance(
+            url='/about-us/', request=request,
+            current_page=Page.objects.get(url_path='/home/about-us/'),
+        )
+        menu._option_vals = utils.make_optionvals_instance(max_levels=2)
+        menu.set_request(request)
+        pages = list(menu.pages_for_display.values())
+
+        def prime_items():
+            for page in pages:
+                menu._prime_menu_item(page)
+
+        self.benchmark(
+            '_prime_menu_item() for %s pages' % len(pages), prime_items, number=200
+        )
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+"""
+Runs wagtailmenus' benchmarks (found in the 'benchmarks' directory), which use
+the same settings and test fixtures as the test suite. Specific benchmarks can
+be run by supplying labels in the same way as for 'runtests.py', e.g.:
+
+    python runbenchmarks.py benchmarks.bench_rendering
+"""
+import os
+import sys
+
+from django.core.management import execute_from_command_line
+
+os.environ['DJANGO_SETTINGS_MODULE'] = 'wagtailmenus.settings.testing'
+
+
+def runbenchmarks():
+    labels = sys.argv[1:] or ['benchmarks']
+    argv = [sys.argv[0], 'test', '--pattern=bench_*.py'] + labels
+    return execute_from_command_line(argv)
+
+
+if __name__ == '__main__':
+    sys.exit(runbenchmarks())
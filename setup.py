@@ -21,6 +21,7 @@ testing_extras = [
     'beautifulsoup4<4.6.1,>=4.5.1',
     'coverage>=4.5',
     'django-webtest>=1.9,<1.10',
+    'Jinja2>=2.10',
 ]
 
 development_extras = [
@@ -50,7 +51,7 @@ setup(
     description=("An app to help you manage menus in your Wagtail projects "
                  "more consistently."),
     long_description=README,
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     license="MIT",
     keywords="wagtail cms model utility",
     download_url=download_url,
@@ -63,7 +64,6 @@ setup(
         "Operating System :: OS Independent",
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.4',
         'Programming Language :: Python :: 3.5',
         'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
@@ -78,7 +78,7 @@ setup(
         "Topic :: Internet :: WWW/HTTP :: Dynamic Content",
     ],
     install_requires=requires,
-    python_requires='>=3.4',
+    python_requires='>=3.5',
     extras_require={
         'testing': testing_extras,
         'docs': documentation_extras,
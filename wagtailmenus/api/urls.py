@@ -0,0 +1,14 @@
+from django.conf.urls import url
+
+from wagtailmenus.api import views
+
+app_name = 'wagtailmenus_api'
+
+urlpatterns = [
+    url(r'^main/$', views.MainMenuAPIView.as_view(), name='main_menu'),
+    url(r'^main/sub-menu/(?P<parent_page_id>\d+)/$', views.MainMenuSubMenuView.as_view(), name='main_menu_sub_menu'),
+    url(r'^flat/(?P<handle>[-\w]+)/$', views.FlatMenuAPIView.as_view(), name='flat_menu'),
+    url(r'^flat/(?P<handle>[-\w]+)/sub-menu/(?P<parent_page_id>\d+)/$', views.FlatMenuSubMenuView.as_view(), name='flat_menu_sub_menu'),
+    url(r'^section/$', views.SectionMenuAPIView.as_view(), name='section_menu'),
+    url(r'^children/$', views.ChildrenMenuAPIView.as_view(), name='children_menu'),
+]
@@ -0,0 +1,419 @@
+import zlib
+
+from django.core import signing
+from django.http import (
+    Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
+)
+from django.utils.cache import patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+from django.views.generic import View
+from wagtail.core.models import Page
+
+from wagtailmenus import snapshots
+from wagtailmenus.cache import get_cache_vary_on, get_vary_on_key, menu_cache
+from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
+from wagtailmenus.utils.misc import (
+    derive_section_root, get_site_from_request, loads_lazy_sub_menu_options
+)
+from wagtailmenus.versioning import get_flat_menu_version, get_site_version
+
+
+class MenuAPIView(View):
+    """
+    Returns a JSON representation of a menu for the current site (as returned
+    by the menu's ``as_dict()`` method).
+
+    Responses include an ETag derived from the site's current menu version
+    (see ``wagtailmenus.versioning``), which allows conditional requests to be
+    answered with a '304 Not Modified' response, without fetching any menu or
+    menu data. Where the data served was prepared for an earlier version
+    (e.g. from a snapshot that is being rebuilt), the ETag is derived from
+    that version instead. Out-of-date data served from the menu cache (while
+    the menu is being rebuilt elsewhere) has no known version, so is served
+    without an ETag, and with 'Cache-Control: no-cache'.
+
+    Where functions registered for the ``menus_cache_vary_on`` hook add
+    values for the request, those are included in the ETag too, and
+    responses are marked as 'private', so that they aren't shared between
+    visitors by CDNs. Where any of those functions prevent the menu from
+    being cached, responses have no ETag, and are marked with 'no-store'.
+    """
+    http_method_names = ['get', 'head', 'options']
+    menu_class = None
+    apply_active_classes = True
+    default_max_levels = None
+    requires_page = False
+
+    def dispatch(self, request, *args, **kwargs):
+        site = get_site_from_request(request)
+        if site is None:
+            raise Http404
+        self.serving_stale_data = False
+        try:
+            self.setup_menu(request, site, **kwargs)
+        except ValueError as e:
+            return HttpResponseBadRequest(str(e))
+        view = condition(etag_func=self.get_etag)(super().dispatch)
+        response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304) and not self.serving_stale_data:
+            self.patch_response_headers(response)
+            return response
+        if response.has_header('ETag'):
+            del response['ETag']
+        if self.serving_stale_data:
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    def setup_menu(self, request, site, page=None, **kwargs):
+        """
+        Set the attributes needed to serve the menu for ``site`` and
+        ``page``, and look up its current version. If ``page`` isn't
+        supplied, it is identified by the request's 'page' query parameter
+        (see ``get_page()``). Also used to build menus outside of a request
+        (see ``wagtailmenus.warming``). Raises ``ValueError`` if any of the
+        request's options are invalid.
+        """
+        self.request = request
+        self.kwargs = kwargs
+        self.site = site
+        self.page = page if page is not None else self.get_page()
+        self.option_values = self.get_option_values()
+        self.cache_vary_on = self.get_cache_vary_on(self.option_values)
+        self.version = self.get_version()
+
+    def get_etag(self, request, *args, **kwargs):
+        if self.cache_vary_on is None:
+            # The response may be specific to the current visitor in ways
+            # that can't be identified by the ETag
+            return None
+        return self.get_etag_for_version(self.version)
+
+    def get_etag_for_version(self, version):
+        etag = self.make_etag(version)
+        if self.cache_vary_on:
+            etag += '.%s' % get_vary_on_key(self.cache_vary_on)
+        return etag
+
+    def get_version(self):
+        """
+        Return the current version number for the menu (see
+        ``wagtailmenus.versioning``).
+        """
+        return get_site_version(self.site)
+
+    def make_etag(self, version):
+        return '%s.%s' % (self.site.pk, version)
+
+    def patch_response_headers(self, response):
+        if self.cache_vary_on is None:
+            patch_cache_control(response, no_store=True)
+        elif self.cache_vary_on:
+            # Responses vary on values that CDNs have no way of knowing
+            patch_cache_control(
+                response, private=True, max_age=settings.API_CACHE_MAX_AGE
+            )
+        else:
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.API_CACHE_MAX_AGE,
+                s_maxage=settings.API_CACHE_SHARED_MAX_AGE,
+            )
+
+    def get(self, request, *args, **kwargs):
+        data, version = self.get_snapshot_data()
+        if data is None:
+            data, version = self.get_menu_data(self.option_values)
+        response = JsonResponse(data, json_dumps_params={'separators': (',', ':')})
+        if version is None:
+            self.serving_stale_data = True
+        elif version != self.version and self.cache_vary_on is not None:
+            # Takes precedence over the ETag for the current version
+            response['ETag'] = quote_etag(self.get_etag_for_version(version))
+        return response
+
+    def get_menu_data(self, option_values):
+        """
+        Return a tuple of compiled data for the menu (from the menu cache if
+        ``WAGTAILMENUS_USE_MENU_CACHE`` is ``True``) and the version number
+        it was prepared for (or ``None`` if out-of-date data was taken from
+        the cache while the menu is being rebuilt elsewhere).
+        """
+        def build():
+            menu = self.get_menu_class()._get_render_prepared_object(
+                self.get_menu_context(), **option_values
+            )
+            if menu is None:
+                raise Http404
+            return menu.as_dict(), menu.get_cache_dependencies()
+
+        if not settings.USE_MENU_CACHE or self.cache_vary_on is None:
+            return build()[0], self.version
+        data, fresh = menu_cache.get_or_build(
+            self.get_cache_key(option_values), self.site, build
+        )
+        return data, self.version if fresh else None
+
+    def get_cache_vary_on(self, option_values):
+        """
+        Return a list of additional values to include in the cache key for
+        the menu, or ``None`` if the menu should not be cached for this
+        request (see ``wagtailmenus.cache.get_cache_vary_on()``).
+        """
+        return get_cache_vary_on(
+            self.get_menu_class(), self.request, self.site, option_values,
+            current_page=self.page,
+        )
+
+    def get_cache_key(self, option_values):
+        values = [
+            self.site.pk,
+            self.get_menu_key(),
+            self.page.pk if self.page else '',
+            option_values['max_levels'] or '',
+            int(option_values['use_absolute_page_urls']),
+        ]
+        if self.cache_vary_on:
+            values.append(get_vary_on_key(self.cache_vary_on))
+        return ':'.join(str(value) for value in values)
+
+    def get_menu_key(self):
+        return self.get_menu_class().related_templatetag_name
+
+    def get_menu_class(self):
+        return self.menu_class
+
+    def get_snapshot_key(self):
+        """
+        Return the key identifying this view's menu in menu snapshots (see
+        ``wagtailmenus.snapshots``), or ``None`` if the menu isn't included.
+        """
+        return None
+
+    def get_snapshot_data(self):
+        """
+        Return a tuple of compiled data for the menu from the current site's
+        menu snapshot and the version number it was compiled for, if
+        snapshots are enabled, and the request doesn't use any options that
+        would change the output. Otherwise, return ``(None, None)``.
+        """
+        key = self.get_snapshot_key()
+        if key is None or self.page is not None or self.request.GET:
+            return None, None
+        # Snapshots are compiled for anonymous visitors, without any other
+        # request-specific values, so can't be used if menus vary on any
+        if self.cache_vary_on != []:
+            return None, None
+        return snapshots.get_snapshot_menu_data(self.site, key)
+
+    def get_page(self):
+        """
+        Return the live page identified by the 'page' query parameter, which
+        is treated as the 'current page' when rendering the menu. Only pages
+        belonging to the current site can be used.
+        """
+        page_id = self.request.GET.get('page')
+        if not page_id:
+            if self.requires_page:
+                raise ValueError("A 'page' value must be supplied.")
+            return None
+        try:
+            page_id = int(page_id)
+        except ValueError:
+            raise ValueError("'page' must be a page ID.")
+        try:
+            return Page.objects.live().descendant_of(
+                self.site.root_page, inclusive=True
+            ).get(pk=page_id).specific
+        except Page.DoesNotExist:
+            raise Http404
+
+    def get_max_levels(self):
+        max_levels = self.request.GET.get('max_levels')
+        if not max_levels:
+            return self.default_max_levels
+        if max_levels not in ('1', '2', '3', '4', '5'):
+            raise ValueError("'max_levels' must be an integer between 1 and 5.")
+        return int(max_levels)
+
+    def get_option_values(self):
+        return {
+            'max_levels': self.get_max_levels(),
+            'apply_active_classes': self.apply_active_classes,
+            'allow_repeating_parents': True,
+            'use_absolute_page_urls': self.request.GET.get('use_absolute_page_urls') in ('1', 'true'),
+            # Additional levels are added by as_dict() when needed
+            'add_sub_menus_inline': False,
+        }
+
+    def get_menu_context(self):
+        """
+        Return a dictionary that can stand in for the template context that
+        would usually be supplied to ``render_from_tag()``.
+        """
+        page = self.page
+        section_root = None
+        ancestor_ids = ()
+        if page:
+            section_root = derive_section_root(page)
+            section_root_depth = get_settings_snapshot().SECTION_ROOT_DEPTH
+            if page.depth >= section_root_depth:
+                ancestor_ids = page.get_ancestors(inclusive=True).filter(
+                    depth__gte=section_root_depth).values_list('id', flat=True)
+        self.request.site = self.site
+        return {
+            'request': self.request,
+            'wagtailmenus_vals': {
+                'current_page': page,
+                'section_root': section_root,
+                'current_page_ancestor_ids': ancestor_ids,
+            },
+        }
+
+
+class MainMenuAPIView(MenuAPIView):
+
+    def get_menu_class(self):
+        return settings.models.MAIN_MENU_MODEL
+
+    def get_snapshot_key(self):
+        return snapshots.MAIN_MENU_KEY
+
+
+class FlatMenuAPIView(MenuAPIView):
+    apply_active_classes = False
+
+    def get_version(self):
+        return get_flat_menu_version(self.site, self.kwargs['handle'])
+
+    def make_etag(self, version):
+        return '%s.%s.%s' % (self.site.pk, self.kwargs['handle'], version)
+
+    def get_menu_class(self):
+        return settings.models.FLAT_MENU_MODEL
+
+    def get_snapshot_key(self):
+        return snapshots.get_flat_menu_key(self.kwargs['handle'])
+
+    def get_menu_key(self):
+        return '%s:%s' % (super().get_menu_key(), self.kwargs['handle'])
+
+    def get_option_values(self):
+        option_values = super().get_option_values()
+        option_values.update(
+            handle=self.kwargs['handle'],
+            show_menu_heading=True,
+            fall_back_to_default_site_menus=settings.FLAT_MENUS_FALL_BACK_TO_DEFAULT_SITE_MENUS,
+        )
+        return option_values
+
+
+class SectionMenuAPIView(MenuAPIView):
+    requires_page = True
+
+    @property
+    def default_max_levels(self):
+        return settings.DEFAULT_SECTION_MENU_MAX_LEVELS
+
+    def get_menu_class(self):
+        return settings.objects.SECTION_MENU_CLASS
+
+    def get_option_values(self):
+        option_values = super().get_option_values()
+        option_values['show_section_root'] = True
+        return option_values
+
+
+class ChildrenMenuAPIView(MenuAPIView):
+    apply_active_classes = False
+    requires_page = True
+
+    @property
+    def default_max_levels(self):
+        return settings.DEFAULT_CHILDREN_MENU_MAX_LEVELS
+
+    def get_menu_class(self):
+        return settings.objects.CHILDREN_MENU_CLASS
+
+    def get_option_values(self):
+        option_values = super().get_option_values()
+        option_values['parent_page'] = self.page
+        return option_values
+
+
+class SubMenuViewMixin:
+    """
+    Returns the HTML for a single sub menu of a main or flat menu, which can
+    be used to replace the placeholders output when rendering a menu with
+    ``lazy_sub_menus=True``.
+
+    Rendering options (including the template to use) are taken from a signed
+    'options' query parameter, generated by the menu when the placeholder was
+    rendered. Active classes are never applied, because only sub menus outside
+    of the current page's 'active trail' are loaded this way.
+    """
+
+    def get(self, request, *args, **kwargs):
+        menu = self.get_menu_class()._get_render_prepared_object(
+            self.get_menu_context(), **self.option_values
+        )
+        if menu is None:
+            raise Http404
+        parent_page = menu.pages_for_display.get(int(kwargs['parent_page_id']))
+        if parent_page is None:
+            raise Http404
+        return HttpResponse(self.render_sub_menu(menu, parent_page))
+
+    def get_sub_menu_options(self):
+        try:
+            return loads_lazy_sub_menu_options(self.request.GET.get('options', ''))
+        except (signing.BadSignature, ValueError, zlib.error):
+            raise ValueError("'options' is missing or invalid.")
+
+    def get_page(self):
+        return None
+
+    def get_option_values(self):
+        options = self.sub_menu_options = self.get_sub_menu_options()
+        option_values = super().get_option_values()
+        option_values.update(
+            max_levels=options['max_levels'],
+            apply_active_classes=False,
+            allow_repeating_parents=options['allow_repeating_parents'],
+            use_absolute_page_urls=options['use_absolute_page_urls'],
+            sub_menu_template_name=options['sub_menu_template_name'],
+            sub_menu_template_names=options['sub_menu_template_names'],
+            client_side_active_classes=options['client_side_active_classes'],
+            template_engine=options['template_engine'],
+        )
+        return option_values
+
+    def render_sub_menu(self, menu, parent_page):
+        options = self.sub_menu_options
+        context = self.get_menu_context()
+        context.update(
+            current_level=options['level'] - 1,
+            original_menu_tag=menu.related_templatetag_name,
+            original_menu_instance=menu,
+        )
+        return menu.get_sub_menu_class().render_from_tag(
+            context,
+            parent_page=parent_page,
+            max_levels=menu.max_levels,
+            apply_active_classes=False,
+            allow_repeating_parents=options['allow_repeating_parents'],
+            use_absolute_page_urls=options['use_absolute_page_urls'],
+            template_name=options['template_name'],
+            client_side_active_classes=options['client_side_active_classes'],
+            template_engine=options['template_engine'],
+        )
+
+
+class MainMenuSubMenuView(SubMenuViewMixin, MainMenuAPIView):
+    pass
+
+
+class FlatMenuSubMenuView(SubMenuViewMixin, FlatMenuAPIView):
+    pass
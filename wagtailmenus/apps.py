@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class WagtailMenusConfig(AppConfig):
     name = 'wagtailmenus'
     verbose_name = 'WagtailMenus'
+
+    def ready(self):
+        from wagtailmenus import checks  # noqa: F401
+        from wagtailmenus.signal_handlers import register_signal_handlers
+        from wagtailmenus.warming import warm_menus_after_migrate
+        register_signal_handlers()
+        post_migrate.connect(
+            warm_menus_after_migrate, sender=self,
+            dispatch_uid='wagtailmenus_warm_menus_after_migrate'
+        )
@@ -0,0 +1,457 @@
+"""
+Caching for 'compiled' menus (the dictionaries returned by ``Menu.as_dict()``),
+with invalidation driven by the parts of the page tree that each menu depends
+on, rather than by everything on the site.
+
+When a menu is cached, it's stored along with a set of 'dependencies' (see
+``Menu.get_cache_dependencies()``), each of which is a short string:
+
+``'page:<id>'``
+    The menu includes (or is otherwise affected by) the page with this id.
+
+``'tree:<path>'``
+    The menu includes pages from the branch of the page tree starting at
+    this path (e.g. for menu items with ``allow_subnav`` enabled, or for
+    section and children menus), so any change within it matters.
+
+``'below:<path>'``
+    Something the menu depends on is below this path, so moving, deleting
+    or unpublishing the page at this path (which changes or removes all of
+    its descendants) matters.
+
+``'menu:<name>'``
+    The menu object itself (see ``get_main_menu_dependency()`` and
+    ``get_flat_menu_dependency()``).
+
+Every dependency has a random 'token' stored in the cache, which is replaced
+whenever the dependency is invalidated. Tokens are recorded alongside each
+cached menu, and a cached menu is only used if all of its recorded tokens are
+still current. When a page is changed, only the dependencies that could be
+affected by that page are invalidated (see ``get_page_change_dependencies()``),
+so changes to pages that appear in no menu leave cached menus untouched.
+
+Cached menus are kept for a while after they become out-of-date (see
+``WAGTAILMENUS_MENU_CACHE_STALE_TIMEOUT``), so that when one needs rebuilding,
+only the process that claims the rebuild 'lock' for it does the work, and any
+other requests for the menu in the meantime are served the previous version.
+
+Recently used menus are also kept in memory by each process (see
+``LocalMenuCache``), and reused for as long as the site's menu version number
+(see ``wagtailmenus.versioning``) is unchanged, which saves fetching and
+decoding them from the cache for every request.
+
+Functions registered for the ``menus_cache_vary_on`` hook can add values to
+the keys that menus are cached with (e.g. where other hooks change menus
+depending on the current user's group), or prevent menus from being cached
+at all (see ``get_cache_vary_on()``).
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+
+from wagtailmenus.conf import settings
+from wagtailmenus.utils.hooks import get_hooks
+from wagtailmenus.utils.packing import pack_menu, unpack_menu
+from wagtailmenus.versioning import get_site_version
+
+MENU_CACHE_KEY = 'wagtailmenus:menu:%s'
+DEPENDENCY_CACHE_KEY = 'wagtailmenus:dependency:%s'
+LOCK_CACHE_KEY = 'wagtailmenus:lock:%s'
+
+# When a menu isn't cached at all and another process is already building it,
+# how long to wait for the result before building it anyway
+LOCK_WAIT = 1.0
+LOCK_WAIT_INTERVAL = 0.05
+
+
+def get_cache():
+    return caches[settings.CACHE_ALIAS]
+
+
+def get_ancestor_paths(page, inclusive=False):
+    """
+    Return a list of tree paths for the ancestors of ``page`` (and the page
+    itself if ``inclusive`` is ``True``).
+    """
+    path = page.path
+    steplen = page.steplen
+    stop = len(path) + (steplen if inclusive else 0)
+    return [path[:i] for i in range(steplen, stop, steplen)]
+
+
+def get_page_dependencies(page):
+    """Return dependencies for a menu that includes ``page``."""
+    dependencies = {'page:%s' % page.pk}
+    dependencies.update('below:%s' % path for path in get_ancestor_paths(page))
+    return dependencies
+
+
+def get_tree_dependencies(page):
+    """
+    Return dependencies for a menu that includes pages from the branch of
+    the page tree starting at ``page``.
+    """
+    dependencies = {'tree:%s' % page.path}
+    dependencies.update('below:%s' % path for path in get_ancestor_paths(page))
+    return dependencies
+
+
+def get_main_menu_dependency(site_id):
+    return 'menu:main:%s' % site_id
+
+
+def get_flat_menu_dependency(handle):
+    # Flat menus on other sites can fall back to using the default site's
+    # menu, so dependencies are shared by all flat menus with a handle
+    return 'menu:flat:%s' % handle
+
+
+def get_page_change_dependencies(page):
+    """
+    Return the dependencies affected by a change to ``page`` (including it
+    being published, unpublished, moved or deleted).
+    """
+    dependencies = {'page:%s' % page.pk, 'below:%s' % page.path}
+    dependencies.update(
+        'tree:%s' % path for path in get_ancestor_paths(page, inclusive=True)
+    )
+    return dependencies
+
+
+def get_cache_vary_on(menu_class, request, site, option_values, current_page=None):
+    """
+    Return a list of values (as strings) that the cache key for a menu of
+    type ``menu_class`` should vary on for ``request``, as contributed by
+    functions registered for the ``menus_cache_vary_on`` hook, or ``None``
+    if any of those functions return ``False`` (meaning the menu should not
+    be cached).
+
+    Functions may return ``None`` (to add nothing), a single value, or an
+    iterable of values.
+    """
+    hook_methods = get_hooks('menus_cache_vary_on')
+    if not hook_methods:
+        return []
+    vary_on = []
+    for hook in hook_methods:
+        value = hook(
+            request=request,
+            menu_class=menu_class,
+            menu_tag=menu_class.related_templatetag_name,
+            current_site=site,
+            current_page=current_page,
+            option_values=option_values,
+        )
+        if value is False:
+            return None
+        if value is None:
+            continue
+        if isinstance(value, (str, bytes)) or not hasattr(value, '__iter__'):
+            value = [value]
+        vary_on.extend(str(item) for item in value)
+    return vary_on
+
+
+def get_vary_on_key(vary_on):
+    """
+    Return a short string derived from ``vary_on`` (a list of strings), for
+    including in cache keys.
+    """
+    return hashlib.md5('\x1f'.join(vary_on).encode('utf-8')).hexdigest()
+
+
+def create_token():
+    return uuid.uuid4().hex
+
+
+def invalidate_dependencies(dependencies):
+    """
+    Invalidate any cached menus with any of the supplied ``dependencies``.
+    """
+    if dependencies:
+        get_cache().set_many(
+            {DEPENDENCY_CACHE_KEY % dep: create_token() for dep in dependencies},
+            timeout=None,
+        )
+
+
+def invalidate_for_page(page):
+    """Invalidate any cached menus affected by a change to ``page``."""
+    invalidate_dependencies(get_page_change_dependencies(page))
+
+
+class LocalMenuCache:
+    """
+    A thread-safe, in-memory store of compiled menus for the current process,
+    holding up to ``WAGTAILMENUS_MENU_CACHE_LOCAL_SIZE`` menus (discarding the
+    least recently used ones first). Each menu is stored along with the site
+    version number it was built for, and is only returned if the supplied
+    version matches, and it was stored less than
+    ``WAGTAILMENUS_MENU_CACHE_LOCAL_TIMEOUT`` seconds ago.
+
+    The same dictionary is returned every time, so it should not be modified.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            entry_version, expires, data = entry
+            if entry_version != version or time.monotonic() >= expires:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def set(self, key, version, data):
+        size = settings.MENU_CACHE_LOCAL_SIZE
+        if size <= 0:
+            return
+        expires = time.monotonic() + settings.MENU_CACHE_LOCAL_TIMEOUT
+        with self.lock:
+            self.entries[key] = (version, expires, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class MenuCache:
+    """
+    Stores compiled menus in the cache identified by
+    ``WAGTAILMENUS_CACHE_ALIAS``, using the binary format defined in
+    ``wagtailmenus.utils.packing``, with recently used menus also kept in
+    memory (see ``LocalMenuCache``).
+
+    Counts of hits (for the in-memory and shared caches separately), 'misses'
+    (where a menu was built) and 'stale' responses (where an out-of-date menu
+    was used while it was being rebuilt elsewhere) are kept for the current
+    process, and can be read using ``get_stats()``.
+    """
+    stats_keys = ('local_hits', 'hits', 'misses', 'stale')
+
+    def __init__(self):
+        self.local = LocalMenuCache()
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+        self.rebuild_semaphore = None
+
+    @property
+    def cache(self):
+        return get_cache()
+
+    def record(self, event):
+        with self.stats_lock:
+            self.stats[event] += 1
+
+    def get_stats(self):
+        """
+        Return a dictionary of 'local_hits', 'hits' (for the shared cache),
+        'misses' and 'stale' counts for the current process.
+        """
+        with self.stats_lock:
+            return {event: self.stats[event] for event in self.stats_keys}
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats.clear()
+
+    def get_rebuild_semaphore(self):
+        """
+        Return a semaphore limiting the number of menus built at once by the
+        current process to ``WAGTAILMENUS_MENU_CACHE_MAX_REBUILDS``.
+        """
+        limit = settings.MENU_CACHE_MAX_REBUILDS
+        if self.rebuild_semaphore is None or self.rebuild_semaphore[0] != limit:
+            self.rebuild_semaphore = (limit, threading.BoundedSemaphore(limit))
+        return self.rebuild_semaphore[1]
+
+    def get_tokens(self, dependencies):
+        """
+        Return a dictionary of current tokens for the supplied
+        ``dependencies``, creating tokens for any that don't have one yet.
+        """
+        if not dependencies:
+            return {}
+        cache = self.cache
+        keys = {DEPENDENCY_CACHE_KEY % dep: dep for dep in dependencies}
+        found = cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        for key in missing:
+            cache.add(key, create_token(), timeout=None)
+        if missing:
+            # Tokens may have been added by another process in the meantime
+            found.update(cache.get_many(missing))
+        return {dep: found.get(key) for key, dep in keys.items()}
+
+    def get_entry(self, key):
+        """
+        Return a tuple of packed menu data stored for ``key`` (or ``None`` if
+        nothing has been stored), a boolean indicating whether the data is
+        up-to-date (it has not expired, and none of the menu's dependencies
+        have changed), and the menu's dependencies (as a set).
+        """
+        cache = self.cache
+        entry = cache.get(MENU_CACHE_KEY % key)
+        if entry is None:
+            return None, False, set()
+        tokens, packed, fresh_until = entry
+        if time.time() >= fresh_until:
+            return packed, False, set(tokens)
+        if tokens:
+            current = cache.get_many([DEPENDENCY_CACHE_KEY % dep for dep in tokens])
+            for dep, token in tokens.items():
+                if current.get(DEPENDENCY_CACHE_KEY % dep) != token:
+                    return packed, False, set(tokens)
+        return packed, True, set(tokens)
+
+    def get(self, key):
+        """
+        Return compiled menu data stored for ``key``, or ``None`` if nothing
+        has been stored, or the stored data is out-of-date.
+        """
+        packed, fresh, _ = self.get_entry(key)
+        if not fresh:
+            return None
+        return unpack_menu(packed)
+
+    def set(self, key, data, dependencies, tokens=None):
+        """
+        Store compiled menu ``data`` for ``key``, to be used until any of
+        the supplied ``dependencies`` are invalidated (or
+        ``WAGTAILMENUS_MENU_CACHE_TIMEOUT`` seconds have passed).
+
+        ``tokens`` should be a dictionary of tokens for the dependencies
+        (as returned by ``get_tokens()``), read *before* ``data`` was built,
+        so that if anything changes in the meantime, the stored data is
+        already out-of-date. Tokens are read now for any dependencies not
+        included.
+        """
+        tokens = dict(tokens or {})
+        missing = set(dependencies).difference(tokens)
+        if missing:
+            tokens.update(self.get_tokens(missing))
+        tokens = {dep: tokens[dep] for dep in dependencies}
+        timeout = settings.MENU_CACHE_TIMEOUT
+        entry = (tokens, pack_menu(data), time.time() + timeout)
+        # Out-of-date data is kept for a while longer, so that it can be
+        # used while the menu is being rebuilt
+        self.cache.set(
+            MENU_CACHE_KEY % key, entry, timeout + settings.MENU_CACHE_STALE_TIMEOUT
+        )
+
+    def acquire_lock(self, key):
+        """
+        Attempt to claim the right to rebuild the menu for ``key``. Returns
+        a token for releasing the lock if successful, or ``None`` if another
+        process holds the lock already.
+        """
+        token = create_token()
+        if self.cache.add(LOCK_CACHE_KEY % key, token, settings.MENU_CACHE_LOCK_TIMEOUT):
+            return token
+        return None
+
+    def release_lock(self, key, token):
+        cache = self.cache
+        # Don't release a lock that has expired and been claimed by another
+        # process since
+        if cache.get(LOCK_CACHE_KEY % key) == token:
+            cache.delete(LOCK_CACHE_KEY % key)
+
+    def wait_for(self, key):
+        """
+        Wait up to ``LOCK_WAIT`` seconds for another process to store
+        up-to-date data for ``key``, and return it (or ``None`` if nothing
+        was stored in time).
+        """
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_WAIT_INTERVAL)
+            data = self.get(key)
+            if data is not None:
+                return data
+        return None
+
+    def get_or_build(self, key, site, build):
+        """
+        Return a tuple of compiled menu data for ``key`` and a boolean
+        indicating whether the data is up-to-date. Data is taken from the
+        cache if possible. Otherwise, ``build()`` (which should return a
+        tuple of compiled menu data and dependencies) is called, and the
+        result is stored.
+
+        Where out-of-date data is available, it is returned without calling
+        ``build()`` if another process is rebuilding the menu, or the current
+        process is already building ``WAGTAILMENUS_MENU_CACHE_MAX_REBUILDS``
+        menus.
+        """
+        # If anything changes on the site after this point, any menu built
+        # or fetched may already be out-of-date, so it is only kept in memory
+        # until the version number is next checked
+        site_version = get_site_version(site)
+        data = self.local.get(key, site_version)
+        if data is not None:
+            self.record('local_hits')
+            return data, True
+
+        packed, fresh, previous_dependencies = self.get_entry(key)
+        if fresh:
+            self.record('hits')
+            data = unpack_menu(packed)
+            self.local.set(key, site_version, data)
+            return data, True
+
+        lock = self.acquire_lock(key)
+        if lock is None:
+            if packed is not None:
+                self.record('stale')
+                return unpack_menu(packed), False
+            data = self.wait_for(key)
+            if data is not None:
+                self.record('hits')
+                self.local.set(key, site_version, data)
+                return data, True
+
+        try:
+            semaphore = self.get_rebuild_semaphore()
+            if not semaphore.acquire(blocking=packed is None):
+                self.record('stale')
+                return unpack_menu(packed), False
+            try:
+                self.record('misses')
+                # Menus usually depend on the same things as when they were
+                # last built, so tokens for those are read before building,
+                # and tokens for anything new are read straight afterwards
+                # (before the version check below, so any change made since
+                # either fails the check, or replaces the tokens stored,
+                # because versions are bumped before tokens are replaced)
+                tokens = self.get_tokens(previous_dependencies)
+                data, dependencies = build()
+                tokens.update(self.get_tokens(set(dependencies).difference(tokens)))
+                # If anything changed on the site while the menu was being
+                # built, the result may already be out-of-date, so it isn't
+                # stored
+                if get_site_version(site) == site_version:
+                    self.set(key, data, dependencies, tokens)
+                    self.local.set(key, site_version, data)
+                return data, True
+            finally:
+                semaphore.release()
+        finally:
+            if lock is not None:
+                self.release_lock(key, lock)
+
+
+menu_cache = MenuCache()
@@ -0,0 +1,71 @@
+from django.core.checks import Error, Warning, register
+
+from wagtailmenus.conf import settings
+
+
+def get_menu_classes():
+    return (
+        settings.models.MAIN_MENU_MODEL,
+        settings.models.FLAT_MENU_MODEL,
+        settings.objects.SECTION_MENU_CLASS,
+        settings.objects.CHILDREN_MENU_CLASS,
+    )
+
+
+@register()
+def check_page_fields_for_menus(app_configs, **kwargs):
+    """
+    Check that page field names supplied via the ``PAGE_FIELDS_FOR_MENUS``
+    setting, menu classes' ``page_fields_for_display`` attributes, or the
+    ``menus_page_fields`` hook are all valid.
+    """
+    from wagtailmenus.utils.page_fields import get_hook_page_fields, is_page_field
+
+    errors = []
+    sources = []
+    setting_value = settings.PAGE_FIELDS_FOR_MENUS
+    if setting_value is not None:
+        if (
+            not isinstance(setting_value, (list, tuple)) or
+            not all(isinstance(name, str) for name in setting_value)
+        ):
+            return [Error(
+                "The WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS setting must be a list "
+                "or tuple of page field names.",
+                id='wagtailmenus.E001',
+            )]
+        sources.append(('the WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS setting', setting_value))
+    for menu_class in get_menu_classes():
+        if menu_class.page_fields_for_display is not None:
+            sources.append((
+                "%s.page_fields_for_display" % menu_class.__name__,
+                menu_class.page_fields_for_display,
+            ))
+    if not sources:
+        # All page fields are loaded, so there is nothing to check
+        return errors
+    sources.append(("the 'menus_page_fields' hook", get_hook_page_fields()))
+
+    for source, field_names in sources:
+        for name in field_names:
+            if not is_page_field(name):
+                errors.append(Error(
+                    "'%s' (from %s) is not a field on any page model." % (name, source),
+                    hint="Only the names of concrete fields can be used.",
+                    id='wagtailmenus.E002',
+                ))
+
+    text_field = settings.PAGE_FIELD_FOR_MENU_ITEM_TEXT
+    if not is_page_field(text_field):
+        errors.append(Warning(
+            "WAGTAILMENUS_PAGE_FIELD_FOR_MENU_ITEM_TEXT ('%s') is not a field "
+            "on any page model, so it cannot be loaded for menus "
+            "automatically." % text_field,
+            hint=(
+                "Add any fields used by the '%s' attribute to "
+                "WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS, to avoid additional "
+                "queries when rendering menus." % text_field
+            ),
+            id='wagtailmenus.W001',
+        ))
+    return errors
@@ -7,3 +7,18 @@ MAX_LEVELS_CHOICES = (
     (3, _('3: Allow 2 levels of sub-navigation')),
     (4, _('4: Allow 3 levels of sub-navigation')),
 )
+
+LAZY_SUB_MENU_SIGNING_SALT = 'wagtailmenus.lazy_sub_menu'
+
+# Page fields that are always loaded when only some page fields are loaded
+# for menus (see the PAGE_FIELDS_FOR_MENUS setting). Fields that don't exist
+# for a specific page type are ignored.
+REQUIRED_MENU_PAGE_FIELDS = (
+    # Page
+    'id', 'path', 'depth', 'title', 'url_path', 'content_type',
+    'show_in_menus',
+    # MenuPageMixin
+    'repeat_in_subnav', 'repeated_item_text',
+    # AbstractLinkPage
+    'link_page', 'link_url', 'url_append', 'extra_classes',
+)
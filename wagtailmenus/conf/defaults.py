@@ -38,8 +38,12 @@ DEFAULT_SECTION_MENU_TEMPLATE = 'menus/section_menu.html'
 
 DEFAULT_SUB_MENU_TEMPLATE = 'menus/sub_menu.html'
 
+DEFAULT_SUB_MENU_PLACEHOLDER_TEMPLATE = 'menus/sub_menu_placeholder.html'
+
 SITE_SPECIFIC_TEMPLATE_DIRS = False
 
+USE_FAST_RENDERER = False
+
 
 # ------------------------------
 # Default tag behaviour settings
@@ -73,6 +77,48 @@ MAIN_MENU_ITEMS_RELATED_NAME = 'menu_items'
 SECTION_MENU_CLASS = 'wagtailmenus.models.SectionMenu'
 
 
+# ----------------
+# Caching settings
+# ----------------
+
+CACHE_ALIAS = 'default'
+
+VERSION_CACHE_TIMEOUT = 600
+
+USE_MENU_CACHE = False
+
+MENU_CACHE_TIMEOUT = 3600
+
+MENU_CACHE_STALE_TIMEOUT = 300
+
+MENU_CACHE_LOCK_TIMEOUT = 30
+
+MENU_CACHE_MAX_REBUILDS = 4
+
+MENU_CACHE_LOCAL_SIZE = 100
+
+MENU_CACHE_LOCAL_TIMEOUT = 60
+
+SNAPSHOT_DIR = None
+
+SNAPSHOT_CHECK_INTERVAL = 5
+
+INVALIDATION_DELAY = 0
+
+INVALIDATION_MAX_DELAY = 30
+
+WARM_MENUS_AFTER_MIGRATE = False
+
+
+# -----------------
+# JSON API settings
+# -----------------
+
+API_CACHE_MAX_AGE = 0
+
+API_CACHE_SHARED_MAX_AGE = 60
+
+
 # ----------------------
 # Miscellaneous settings
 # ----------------------
@@ -83,8 +129,16 @@ ACTIVE_ANCESTOR_CLASS = 'ancestor'
 
 PAGE_FIELD_FOR_MENU_ITEM_TEXT = 'title'
 
+PAGE_FIELDS_FOR_MENUS = None
+
+USE_COMPACT_PAGE_TREE = False
+
 SECTION_ROOT_DEPTH = 3
 
+QUERY_BUDGET = None
+
+QUERY_BUDGET_RAISE = None
+
 
 # ----------
 # Deprecated
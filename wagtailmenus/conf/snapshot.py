@@ -0,0 +1,48 @@
+"""
+An immutable snapshot of the settings values referenced most often while
+rendering menus (several times for every menu item). Reading an attribute
+from a namedtuple is considerably cheaper than requesting a value from the
+settings helper, which checks for deprecated settings on every lookup.
+
+The snapshot is rebuilt (on next access) whenever Django's ``setting_changed``
+signal is sent, so values overridden in tests are still respected.
+"""
+from collections import namedtuple
+
+from django.core.signals import setting_changed
+
+from wagtailmenus.conf import settings
+
+SNAPSHOT_SETTING_NAMES = (
+    'ACTIVE_CLASS',
+    'ACTIVE_ANCESTOR_CLASS',
+    'PAGE_FIELD_FOR_MENU_ITEM_TEXT',
+    'QUERY_BUDGET',
+    'SECTION_ROOT_DEPTH',
+    'USE_COMPACT_PAGE_TREE',
+    'USE_FAST_RENDERER',
+)
+
+SettingsSnapshot = namedtuple('SettingsSnapshot', SNAPSHOT_SETTING_NAMES)
+
+_snapshot = None
+
+
+def get_settings_snapshot():
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = _snapshot = SettingsSnapshot(*(
+            getattr(settings, name) for name in SNAPSHOT_SETTING_NAMES
+        ))
+    return snapshot
+
+
+def reset_settings_snapshot(**kwargs):
+    global _snapshot
+    _snapshot = None
+
+
+setting_changed.connect(
+    reset_settings_snapshot, dispatch_uid='wagtailmenus_reset_settings_snapshot'
+)
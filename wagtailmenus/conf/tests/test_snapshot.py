@@ -0,0 +1,28 @@
+from django.test import SimpleTestCase, override_settings
+
+from wagtailmenus.conf import defaults
+from wagtailmenus.conf.snapshot import SettingsSnapshot, get_settings_snapshot
+
+
+class TestSettingsSnapshot(SimpleTestCase):
+
+    def test_snapshot_is_reused(self):
+        snapshot = get_settings_snapshot()
+        self.assertIsInstance(snapshot, SettingsSnapshot)
+        self.assertIs(get_settings_snapshot(), snapshot)
+        self.assertEqual(snapshot.ACTIVE_CLASS, defaults.ACTIVE_CLASS)
+        self.assertEqual(snapshot.SECTION_ROOT_DEPTH, defaults.SECTION_ROOT_DEPTH)
+
+    def test_snapshot_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            get_settings_snapshot().ACTIVE_CLASS = 'current'
+
+    def test_snapshot_is_rebuilt_when_settings_change(self):
+        with override_settings(
+            WAGTAILMENUS_ACTIVE_CLASS='current',
+            WAGTAILMENUS_PAGE_FIELD_FOR_MENU_ITEM_TEXT='seo_title',
+        ):
+            snapshot = get_settings_snapshot()
+            self.assertEqual(snapshot.ACTIVE_CLASS, 'current')
+            self.assertEqual(snapshot.PAGE_FIELD_FOR_MENU_ITEM_TEXT, 'seo_title')
+        self.assertEqual(get_settings_snapshot().ACTIVE_CLASS, defaults.ACTIVE_CLASS)
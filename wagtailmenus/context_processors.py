@@ -1,6 +1,7 @@
 from django.http import Http404
 from django.utils.functional import SimpleLazyObject
 from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
 from wagtailmenus.utils.misc import (
     get_site_from_request, derive_page, derive_section_root
 )
@@ -16,7 +17,7 @@ def wagtailmenus(request):
         match = None
 
         guess_position = settings.GUESS_TREE_POSITION_FROM_PATH
-        section_root_depth = settings.SECTION_ROOT_DEPTH
+        section_root_depth = get_settings_snapshot().SECTION_ROOT_DEPTH
 
         if guess_position and not current_page:
             match, full_url_match = derive_page(request, site)
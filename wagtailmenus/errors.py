@@ -10,3 +10,12 @@ class SubMenuUsageError(TemplateSyntaxError):
             "'children_menu' (custom tags are not supported). You might "
             "want to update your template to use the 'children_menu' tag "
             "instead."))
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised when more queries are executed while rendering a menu than the
+    ``WAGTAILMENUS_QUERY_BUDGET`` setting allows (if ``DEBUG`` or
+    ``WAGTAILMENUS_QUERY_BUDGET_RAISE`` is ``True``).
+    """
+    pass
@@ -0,0 +1,447 @@
+"""
+Static export of rendered menus for every live page of a site, for use by
+static site generators and edge deployments. Used by the ``export_menus``
+management command.
+
+Rather than preparing every menu from scratch for every page, the main menu,
+flat menus and section menus are each compiled once per site (or once per
+section root, for section menus) without any active classes (see
+``wagtailmenus.snapshots.compile_menu()``). For each page, active classes
+are then applied to a copy of the compiled data (an 'overlay'), using the
+page's position in the page tree (which is worked out without any further
+queries) and the same rules as ``Menu.prime_menu_items()``. The result is
+rendered using the menu's usual templates (or fast renderers), with
+``CompiledMenuItem`` objects standing in for pages and menu items.
+
+Flat menus are rendered once per site, because the ``flat_menu`` tag doesn't
+apply active classes by default.
+"""
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from urllib.parse import urlparse
+
+from django.db import connections
+from django.template.loader import get_template
+
+from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
+from wagtailmenus.models.menuitems import MenuItem
+from wagtailmenus.utils.misc import flatten_context
+
+ExportResult = namedtuple('ExportResult', ('site_id', 'page_count', 'duration', 'error'))
+
+MAIN_MENU_FILE_NAME = 'main_menu.html'
+SECTION_MENU_FILE_NAME = 'section_menu.html'
+FLAT_MENU_FILE_NAME = 'flat_menu.%s.html'
+
+
+def get_page_active_class(item_page_id, page_id, ancestor_ids, repeated=False):
+    """
+    Return the active class for an item linking to the page with
+    ``item_page_id``, following the rules used by
+    ``Menu.prime_menu_items()``. ``repeated`` should be ``True`` if the page
+    is repeated in its own sub menu, in which case the repeated item is the
+    'active' one.
+    """
+    settings_snapshot = get_settings_snapshot()
+    if item_page_id == page_id:
+        if repeated:
+            return settings_snapshot.ACTIVE_ANCESTOR_CLASS
+        return settings_snapshot.ACTIVE_CLASS
+    if item_page_id in ancestor_ids:
+        return settings_snapshot.ACTIVE_ANCESTOR_CLASS
+    return ''
+
+
+def get_url_active_class(url, path):
+    """
+    Return the active class for an item linking to a custom ``url``, when
+    ``path`` is the path of the current page, following the rules used by
+    ``AbstractMenuItem.get_active_class_for_request()``.
+    """
+    parsed_url = urlparse(url)
+    if parsed_url.netloc:
+        return ''
+    if path == parsed_url.path:
+        return get_settings_snapshot().ACTIVE_CLASS
+    if path.startswith(parsed_url.path) and parsed_url.path != '/':
+        return get_settings_snapshot().ACTIVE_ANCESTOR_CLASS
+    return ''
+
+
+def get_active_class(item, page_id, ancestor_ids, path, repeating_page_ids=()):
+    """
+    Return the active class that ``item`` (a compiled menu item) should have
+    when the page with ``page_id`` (with ``ancestor_ids`` and URL ``path``)
+    is the current page. ``repeating_page_ids`` are the ids of pages with
+    ``repeat_in_subnav`` set to ``True``.
+    """
+    item_page_id = item.get('page_id')
+    if item_page_id is None:
+        # Items added by hooks or 'modify_submenu_items()' methods may have
+        # classes of their own
+        if item.get('active_class') or 'more_count' in item or not item.get('href'):
+            return item.get('active_class', '')
+        # A menu item for a custom URL
+        return get_url_active_class(item['href'], path)
+    active_class = get_page_active_class(
+        item_page_id, page_id, ancestor_ids,
+        repeated=bool(item.get('children')) and item_page_id in repeating_page_ids,
+    )
+    # Link pages have their 'extra classes' as an active class
+    return active_class or item.get('active_class', '')
+
+
+def apply_active_classes(items, page_id, ancestor_ids, path, repeating_page_ids=(),
+                         parent_page_id=None):
+    """
+    Return a copy of ``items`` (a list of compiled menu items) with active
+    classes applied for the page with ``page_id``. ``parent_page_id`` is the
+    id of the page that ``items`` is a sub menu for (if any).
+    """
+    result = []
+    for item in items:
+        if parent_page_id is not None and item.get('page_id') == parent_page_id:
+            # Repeated items are only ever 'active' (see
+            # 'MenuPageMixin.get_repeated_menu_item()')
+            active_class = ''
+            if parent_page_id == page_id:
+                active_class = get_settings_snapshot().ACTIVE_CLASS
+        else:
+            active_class = get_active_class(
+                item, page_id, ancestor_ids, path, repeating_page_ids
+            )
+        item = dict(item, active_class=active_class)
+        if 'children' in item:
+            item['children'] = apply_active_classes(
+                item['children'], page_id, ancestor_ids, path, repeating_page_ids,
+                item.get('page_id')
+            )
+        result.append(item)
+    return result
+
+
+def overlay_menu(data, page_id, ancestor_ids, path, repeating_page_ids=()):
+    """
+    Return a copy of ``data`` (a compiled menu) with active classes applied
+    for the page with ``page_id``.
+    """
+    section_root = data.get('section_root')
+    data = dict(data, items=apply_active_classes(
+        data['items'], page_id, ancestor_ids, path, repeating_page_ids,
+        section_root['page_id'] if section_root else None
+    ))
+    if section_root:
+        data['section_root'] = dict(section_root, active_class=get_page_active_class(
+            section_root['page_id'], page_id, ancestor_ids,
+            repeated=section_root['page_id'] in repeating_page_ids,
+        ))
+    return data
+
+
+class CompiledMenuItem(MenuItem):
+    """
+    A menu item created from a compiled menu item (a dictionary), which can
+    be rendered by menu templates in place of the page or menu item it was
+    compiled from, and passed to the ``sub_menu`` tag to render its children.
+    Only the values included in compiled menus are available to templates.
+    """
+    allow_subnav = True
+    data_attrs = ''
+    sub_menu = None
+
+    def __init__(self, data):
+        self.text = data['text']
+        self.href = data['href']
+        self.active_class = data.get('active_class') or ''
+        self.pk = self.page_id = data.get('page_id')
+        self.has_children_in_menu = 'children' in data
+        self.children = [CompiledMenuItem(item) for item in data.get('children', ())]
+        if 'more_count' in data:
+            self.is_more_item = True
+            self.more_count = data['more_count']
+
+    @property
+    def link_page(self):
+        # Used by the 'sub_menu' tag as the 'parent page' for sub menus
+        return self if self.page_id is not None else None
+
+
+class CompiledMenu:
+    """
+    A menu compiled once for a site: ``menu`` is the prepared menu instance,
+    and ``data`` its compiled data. Stands in for the 'original menu
+    instance' when the menu is rendered, so that the ``sub_menu`` tag
+    renders additional levels using ``CompiledSubMenu``.
+    """
+
+    def __init__(self, menu):
+        self.menu = menu
+        self.data = menu.as_dict()
+        self.template = menu.get_template()
+        self.sub_menu_templates = {}
+
+    def get_sub_menu_class(self):
+        return CompiledSubMenu
+
+    def get_sub_menu_template(self, level, template_name=''):
+        """
+        Return the template for rendering sub menus at ``level`` (or the
+        template with ``template_name``, if supplied to the ``sub_menu``
+        tag), in the same way as ``SubMenu.get_template()``.
+        """
+        key = template_name or level
+        if key not in self.sub_menu_templates:
+            if template_name:
+                template = get_template(
+                    template_name, using=self.menu.get_template_engine()
+                )
+            else:
+                template = self.menu.get_sub_menu_template(level=level)
+            self.sub_menu_templates[key] = template
+        return self.sub_menu_templates[key]
+
+    def render(self, menu_items, **context_values):
+        """
+        Render the menu using ``menu_items`` (a list of ``CompiledMenuItem``
+        objects) instead of the menu's own items, with ``context_values``
+        added to the context.
+        """
+        context_data = self.menu.get_context_data(
+            menu_items=menu_items, original_menu_instance=self, **context_values
+        )
+        return self.menu.render_template(self.template, context_data)
+
+
+class CompiledSubMenu:
+    """
+    Used by the ``sub_menu`` tag (in place of ``SubMenu``) to render the
+    children of a ``CompiledMenuItem``. Sub menus are always rendered in
+    full (rather than as 'lazy' placeholders).
+    """
+
+    @classmethod
+    def render_from_tag(cls, context, parent_page, template_name='', **kwargs):
+        compiled_menu = context['original_menu_instance']
+        level = context.get('current_level', 0) + 1
+        context_data = flatten_context(context)
+        context_data.update({
+            'current_level': level,
+            'parent_page': parent_page,
+            'menu_items': parent_page.children,
+        })
+        return compiled_menu.menu.render_template(
+            compiled_menu.get_sub_menu_template(level, template_name),
+            context_data,
+        )
+
+
+class SiteExporter:
+    """
+    Compiles menus for ``site`` once, and renders menus for each of its live
+    pages with active classes applied.
+    """
+
+    def __init__(self, site):
+        from wagtail.core.models import Page
+        from wagtailmenus.snapshots import get_menu_context
+        self.site = site
+        self.section_menus = {}
+        self.request = get_menu_context(site)['request']
+        # Specific pages are needed for their URLs (which some page types
+        # customise) and 'repeat_in_subnav' values
+        self.live_pages = list(
+            Page.objects.live().descendant_of(site.root_page, inclusive=True).specific()
+        )
+        self.repeating_page_ids = set(
+            page.pk for page in self.live_pages
+            if getattr(page, 'repeat_in_subnav', False)
+        )
+        self.compile_site_menus()
+
+    def compile_site_menus(self):
+        from wagtailmenus.snapshots import get_flat_menu_handles, prepare_menu
+        menu = prepare_menu(settings.models.MAIN_MENU_MODEL, self.site)
+        self.main_menu = CompiledMenu(menu) if menu is not None else None
+        # Rendered flat menus, using the 'flat_menu' tag's defaults (so no
+        # active classes or heading)
+        self.flat_menus = {}
+        for handle in get_flat_menu_handles(self.site):
+            menu = prepare_menu(
+                settings.models.FLAT_MENU_MODEL, self.site,
+                handle=handle,
+                show_menu_heading=False,
+                fall_back_to_default_site_menus=settings.FLAT_MENUS_FALL_BACK_TO_DEFAULT_SITE_MENUS,
+            )
+            if menu is not None:
+                flat_menu = CompiledMenu(menu)
+                self.flat_menus[handle] = flat_menu.render([
+                    CompiledMenuItem(item) for item in flat_menu.data['items']
+                ])
+
+    def get_section_menu(self, section_root):
+        from wagtailmenus.snapshots import get_menu_context, prepare_menu
+        if section_root.pk not in self.section_menus:
+            context = get_menu_context(self.site)
+            context['wagtailmenus_vals']['section_root'] = section_root
+            menu = prepare_menu(
+                settings.objects.SECTION_MENU_CLASS, self.site,
+                context=context,
+                max_levels=settings.DEFAULT_SECTION_MENU_MAX_LEVELS,
+                show_section_root=True,
+            )
+            self.section_menus[section_root.pk] = CompiledMenu(menu) if menu is not None else None
+        return self.section_menus[section_root.pk]
+
+    def get_pages(self):
+        """
+        Yield a tuple of ``(page, ancestor_ids, section_root)`` for every
+        live page belonging to the site.
+        """
+        from wagtail.core.models import Page
+        section_root_depth = get_settings_snapshot().SECTION_ROOT_DEPTH
+        root_page = self.site.root_page
+        # Ids for every page in the site (including those that aren't live),
+        # for finding ancestors by path
+        ids_by_path = dict(
+            Page.objects.descendant_of(root_page, inclusive=True)
+            .values_list('path', 'pk')
+        )
+        ids_by_path.update(
+            Page.objects.ancestor_of(root_page).values_list('path', 'pk')
+        )
+        section_roots = {}
+        for page in self.live_pages:
+            steplen = page.steplen
+            ancestor_ids = set(
+                ids_by_path[page.path[:depth * steplen]]
+                for depth in range(section_root_depth, page.depth + 1)
+            )
+            section_root = None
+            if page.depth >= section_root_depth:
+                section_root_path = page.path[:section_root_depth * steplen]
+                if section_root_path not in section_roots:
+                    section_roots[section_root_path] = Page.objects.get(
+                        path=section_root_path
+                    ).specific
+                section_root = section_roots[section_root_path]
+            yield page, ancestor_ids, section_root
+
+    def get_menus_for_page(self, page, ancestor_ids, section_root, path):
+        """
+        Return a dictionary of rendered menus for ``page`` (with URL
+        ``path``): 'main_menu', 'section_menu' (for pages within a section)
+        and 'flat_menus' (a dictionary of rendered flat menus by handle).
+        """
+        def render(compiled_menu, **context_values):
+            data = overlay_menu(
+                compiled_menu.data, page.pk, ancestor_ids, path, self.repeating_page_ids
+            )
+            request = copy(self.request)
+            request.path = request.path_info = path
+            context_values.update({
+                'request': request,
+                'wagtailmenus_vals': {
+                    'current_page': page,
+                    'section_root': section_root,
+                    'current_page_ancestor_ids': ancestor_ids,
+                },
+                'current_page': page,
+                'current_page_ancestor_ids': ancestor_ids,
+                'current_ancestor_ids': ancestor_ids,
+                'apply_active_classes': True,
+            })
+            if 'section_root' in data:
+                context_values['section_root'] = CompiledMenuItem(data['section_root'])
+            return compiled_menu.render(
+                [CompiledMenuItem(item) for item in data['items']], **context_values
+            )
+
+        menus = {}
+        if self.main_menu is not None:
+            menus['main_menu'] = render(
+                self.main_menu,
+                section_root=section_root,
+                current_section_root_page=section_root,
+            )
+        if section_root is not None:
+            section_menu = self.get_section_menu(section_root)
+            if section_menu is not None:
+                menus['section_menu'] = render(section_menu)
+        menus['flat_menus'] = self.flat_menus
+        return menus
+
+    def export(self, output_dir):
+        """
+        Write the rendered menus for every live page of the site to HTML
+        files in ``output_dir``, in a directory structure matching page URLs
+        (within a directory for the site's hostname). Returns the number of
+        pages exported.
+        """
+        site_dir = os.path.join(output_dir, self.site.hostname)
+        count = 0
+        for page, ancestor_ids, section_root in self.get_pages():
+            url = page.relative_url(self.site)
+            if url is None:
+                # The page isn't routable
+                continue
+            path = urlparse(url).path
+            menus = self.get_menus_for_page(page, ancestor_ids, section_root, path)
+            files = {
+                FLAT_MENU_FILE_NAME % handle: html
+                for handle, html in menus['flat_menus'].items()
+            }
+            if 'main_menu' in menus:
+                files[MAIN_MENU_FILE_NAME] = menus['main_menu']
+            if 'section_menu' in menus:
+                files[SECTION_MENU_FILE_NAME] = menus['section_menu']
+            page_dir = os.path.join(site_dir, *path.strip('/').split('/'))
+            os.makedirs(page_dir, exist_ok=True)
+            for file_name, html in files.items():
+                with open(os.path.join(page_dir, file_name), 'w', encoding='utf-8') as f:
+                    f.write(html)
+            count += 1
+        return count
+
+
+def export_site(site_id, output_dir):
+    """
+    Export menus for every live page of the site with ``site_id``, and
+    return an ``ExportResult``. Can be called from a pool of processes.
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # Processes started using the 'spawn' method
+        django.setup()
+    from wagtail.core.models import Site
+
+    start = time.perf_counter()
+    count = 0
+    error = None
+    try:
+        site = Site.objects.select_related('root_page').get(pk=site_id)
+        count = SiteExporter(site).export(output_dir)
+    except Exception as e:
+        error = '%s: %s' % (e.__class__.__name__, e)
+    return ExportResult(site_id, count, time.perf_counter() - start, error)
+
+
+def export_sites(site_ids, output_dir, workers=1):
+    """
+    Export menus for every live page of the sites with ``site_ids``, using a
+    pool of ``workers`` processes (or the current process if ``workers`` is
+    ``1``). Yields an ``ExportResult`` for each site as it is completed.
+    """
+    if workers <= 1:
+        for site_id in site_ids:
+            yield export_site(site_id, output_dir)
+        return
+    # Processes mustn't share database connections with this one
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(export_site, site_ids, [output_dir] * len(site_ids)):
+            yield result
@@ -0,0 +1,271 @@
+"""
+Changes to pages and menus need to bump menu version numbers (see
+``wagtailmenus.versioning``) and invalidate cached menus (see
+``wagtailmenus.cache``). Rather than doing that as soon as each change is
+made (which, when publishing pages in bulk, would repeat the same work for
+every page), changes are collected into an ``InvalidationBatch``:
+
+* Changes made within a transaction are collected until the transaction is
+  committed (using ``transaction.on_commit()``), then applied together, so
+  that each version number is only bumped once. If the transaction is rolled
+  back, nothing is applied (although changes from a rolled back transaction
+  may be applied along with those of the next transaction committed in the
+  same thread, which only invalidates more than is necessary).
+* Once applied, menu snapshots for the affected sites are rebuilt (if
+  snapshots are enabled).
+* If ``WAGTAILMENUS_INVALIDATION_DELAY`` is greater than zero, committed
+  batches are handed to a single background thread instead, which waits
+  until no further batches have been submitted for the length of the delay
+  (or until ``WAGTAILMENUS_INVALIDATION_MAX_DELAY`` has passed since the
+  first of them was submitted), then processes them all together.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from wagtail.core.models import Site
+
+from wagtailmenus.cache import get_page_change_dependencies, invalidate_dependencies
+from wagtailmenus.conf import settings
+from wagtailmenus.versioning import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# The values needed from a page to work out what a change to it affects
+PageInfo = namedtuple('PageInfo', ('pk', 'path', 'steplen'))
+
+
+def get_version_keys_for_sites(site_ids):
+    """
+    Return a list of ``(site_id, handle)`` tuples identifying the version
+    numbers that should be bumped when something affecting all menus for the
+    supplied sites is changed.
+    """
+    flat_menu_model = settings.models.FLAT_MENU_MODEL
+    keys = [(site_id, '') for site_id in site_ids]
+    keys.extend(
+        flat_menu_model.objects.filter(site_id__in=site_ids)
+        .values_list('site_id', 'handle')
+    )
+    if Site.objects.filter(pk__in=site_ids, is_default_site=True).exists():
+        # Other sites can fall back to using the default site's flat menus
+        handles = set(handle for site_id, handle in keys if handle)
+        for site_id in Site.objects.values_list('pk', flat=True):
+            keys.append((site_id, ''))
+            keys.extend((site_id, handle) for handle in handles)
+    return keys
+
+
+class InvalidationBatch:
+    """
+    A collection of changed pages, along with version numbers and cache
+    dependencies to invalidate, which can be applied all at once.
+    """
+
+    def __init__(self):
+        self.pages = set()
+        self.version_keys = set()
+        self.dependencies = set()
+
+    def __bool__(self):
+        return bool(self.pages or self.version_keys or self.dependencies)
+
+    def add_page(self, page):
+        self.pages.add(PageInfo(page.pk, page.path, page.steplen))
+
+    def add_menu_change(self, version_keys, dependencies):
+        self.version_keys.update(version_keys)
+        self.dependencies.update(dependencies)
+
+    def merge(self, other):
+        self.pages.update(other.pages)
+        self.version_keys.update(other.version_keys)
+        self.dependencies.update(other.dependencies)
+
+    def apply(self):
+        """
+        Bump version numbers and invalidate cached menus for everything in
+        the batch. Returns a set of ids for the sites affected.
+        """
+        version_keys = set(self.version_keys)
+        dependencies = set(self.dependencies)
+        if self.pages:
+            site_roots = list(Site.objects.values_list('pk', 'root_page__path'))
+            page_site_ids = set()
+            for page in self.pages:
+                site_ids = [
+                    site_id for site_id, root_path in site_roots
+                    if page.path.startswith(root_path)
+                ]
+                if site_ids:
+                    page_site_ids.update(site_ids)
+                    dependencies.update(get_page_change_dependencies(page))
+            if page_site_ids:
+                version_keys.update(get_version_keys_for_sites(page_site_ids))
+        if version_keys:
+            bump_versions(version_keys)
+        invalidate_dependencies(dependencies)
+        return set(site_id for site_id, handle in version_keys)
+
+
+class InvalidationWorker:
+    """
+    Processes batches in a single background thread, once ``delay`` seconds
+    have passed without any more being submitted, or ``max_delay`` seconds
+    have passed since the first of them was submitted (whichever comes
+    first).
+    """
+
+    def __init__(self):
+        self.pending = None
+        self.deadline = None
+        self.latest_deadline = None
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def submit(self, batch, delay, max_delay=None):
+        if max_delay is None or max_delay < delay:
+            max_delay = delay
+        with self.condition:
+            now = time.monotonic()
+            if self.pending is None:
+                self.pending = InvalidationBatch()
+                self.latest_deadline = now + max_delay
+            self.pending.merge(batch)
+            # Wait for the full delay again, unless that would mean waiting
+            # longer than 'max_delay' in total
+            self.deadline = min(now + delay, self.latest_deadline)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='wagtailmenus-invalidation', daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+
+    def take_pending(self):
+        with self.condition:
+            batch, self.pending = self.pending, None
+            return batch
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                remaining = self.deadline - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+            batch = self.take_pending()
+            if batch is not None:
+                try:
+                    self.process(batch)
+                finally:
+                    # Don't leave this thread's database connections open
+                    connections.close_all()
+
+    def process(self, batch):
+        try:
+            process_batch(batch)
+        except Exception:
+            logger.exception("Menu invalidations could not be applied.")
+
+    def flush(self):
+        """
+        Apply any pending changes in the current thread, without waiting for
+        the delay to pass.
+        """
+        batch = self.take_pending()
+        if batch is not None:
+            self.process(batch)
+
+
+worker = InvalidationWorker()
+atexit.register(worker.flush)
+
+
+def rebuild_snapshots(site_ids):
+    from wagtailmenus import snapshots
+    from wagtailmenus.versioning import get_site_version
+    if not snapshots.snapshots_enabled():
+        return
+    for site in Site.objects.filter(pk__in=site_ids):
+        snapshots.rebuild_site_snapshot(site, get_site_version(site))
+
+
+def process_batch(batch):
+    """
+    Apply the changes in ``batch``, then rebuild menu snapshots for the
+    affected sites.
+    """
+    rebuild_snapshots(batch.apply())
+
+
+def submit(batch):
+    """
+    Process ``batch`` (see ``process_batch()``), either straight away, or in
+    the background (if ``WAGTAILMENUS_INVALIDATION_DELAY`` is greater than
+    zero).
+    """
+    if not batch:
+        return
+    delay = settings.INVALIDATION_DELAY
+    if delay > 0:
+        worker.submit(batch, delay, settings.INVALIDATION_MAX_DELAY)
+    else:
+        process_batch(batch)
+
+
+_local = threading.local()
+
+
+def get_transaction_batch(using=None):
+    """
+    Return the batch that changes made during the current transaction should
+    be added to, or ``None`` if there is no transaction.
+    """
+    connection = transaction.get_connection(using)
+    if not hasattr(_local, 'batches'):
+        _local.batches = {}
+    alias = connection.alias
+    if not connection.in_atomic_block:
+        # Any batch left here was for a transaction that was rolled back
+        _local.batches.pop(alias, None)
+        return None
+    batch = _local.batches.get(alias)
+    if batch is None:
+        batch = _local.batches[alias] = InvalidationBatch()
+    # A callback is registered for every change, because those registered
+    # within a transaction (or savepoint) that is rolled back are discarded.
+    # Only the first to run once the transaction is committed submits the
+    # batch.
+    transaction.on_commit(lambda: commit_batch(batch, alias), using=using)
+    return batch
+
+
+def commit_batch(batch, alias):
+    if _local.batches.get(alias) is not batch:
+        # Already submitted
+        return
+    del _local.batches[alias]
+    submit(batch)
+
+
+@contextmanager
+def collect_changes():
+    """
+    Yield a batch that changes can be added to, which is submitted when the
+    current transaction is committed (or straight away if there is no
+    transaction).
+    """
+    batch = get_transaction_batch()
+    if batch is not None:
+        yield batch
+        return
+    batch = InvalidationBatch()
+    yield batch
+    submit(batch)
@@ -0,0 +1,131 @@
+"""
+A Jinja2 extension that makes wagtailmenus' menu tags available as global
+functions in Jinja2 templates. To use it, add
+``'wagtailmenus.jinja2tags.menus'`` to the ``extensions`` option of your
+project's Jinja2 template engine.
+
+Menus rendered this way use Jinja2 templates (wagtailmenus provides Jinja2
+versions of its bundled templates in ``wagtailmenus/jinja2/menus/``), and
+rather than converting the entire template context to a dictionary for every
+menu level rendered, only the values that menu classes actually need are
+passed on.
+"""
+import jinja2
+from django.template import engines
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from wagtailmenus.templatetags import menu_tags
+
+# 'contextfunction' was replaced by 'pass_context' in Jinja2 3.0
+pass_context = getattr(jinja2, 'pass_context', None) or jinja2.contextfunction
+
+# The context values needed by all menu classes to render a menu
+MENU_CONTEXT_KEYS = ('request', 'wagtailmenus_vals')
+
+# Additional values added to the context when rendering a menu, that the
+# 'sub_menu' function needs in order to render additional levels
+SUB_MENU_CONTEXT_KEYS = MENU_CONTEXT_KEYS + (
+    'current_level',
+    'original_menu_tag',
+    'original_menu_instance',
+    'max_levels',
+    'apply_active_classes',
+    'allow_repeating_parents',
+    'use_absolute_page_urls',
+    'add_sub_menus_inline',
+    'current_template',
+)
+
+
+def get_lean_context(context, keys):
+    """
+    Return a dictionary containing only the items from the Jinja2 ``context``
+    that are needed for rendering a menu.
+    """
+    data = {}
+    for key in keys:
+        value = context.get(key, None)
+        if value is not None:
+            data[key] = value
+    return data
+
+
+def get_engine_name(environment):
+    """
+    Return the alias of the Django template backend using the supplied Jinja2
+    ``environment``, which is used to ensure that menu templates are loaded
+    as Jinja2 templates.
+    """
+    if environment.wagtailmenus_engine_name is None:
+        for engine in engines.all():
+            if getattr(engine, 'env', None) is environment:
+                environment.wagtailmenus_engine_name = engine.name
+                break
+    return environment.wagtailmenus_engine_name
+
+
+def render_menu(tag_func, context, keys, *args, **kwargs):
+    kwargs.setdefault('template_engine', get_engine_name(context.environment))
+    return Markup(tag_func(get_lean_context(context, keys), *args, **kwargs))
+
+
+@pass_context
+def main_menu(context, **kwargs):
+    return render_menu(menu_tags.main_menu, context, MENU_CONTEXT_KEYS, **kwargs)
+
+
+@pass_context
+def flat_menu(context, handle, **kwargs):
+    return render_menu(
+        menu_tags.flat_menu, context, MENU_CONTEXT_KEYS, handle, **kwargs)
+
+
+@pass_context
+def section_menu(context, **kwargs):
+    return render_menu(
+        menu_tags.section_menu, context, MENU_CONTEXT_KEYS, **kwargs)
+
+
+@pass_context
+def children_menu(context, parent_page=None, **kwargs):
+    return render_menu(
+        menu_tags.children_menu, context, MENU_CONTEXT_KEYS,
+        parent_page=parent_page, **kwargs)
+
+
+@pass_context
+def sub_menu(context, menuitem_or_page, **kwargs):
+    return render_menu(
+        menu_tags.sub_menu, context, SUB_MENU_CONTEXT_KEYS,
+        menuitem_or_page, **kwargs)
+
+
+@pass_context
+def queue_children_menus(context, pages, **kwargs):
+    return menu_tags.queue_children_menus(context, pages, **kwargs)
+
+
+@pass_context
+def menu_active_state(context, **kwargs):
+    return render_menu(menu_tags.menu_active_state, context, MENU_CONTEXT_KEYS, **kwargs)
+
+
+class WagtailMenusExtension(Extension):
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(wagtailmenus_engine_name=None)
+        self.environment.globals.update({
+            'main_menu': main_menu,
+            'flat_menu': flat_menu,
+            'section_menu': section_menu,
+            'children_menu': children_menu,
+            'sub_menu': sub_menu,
+            'menu_active_state': menu_active_state,
+            'queue_children_menus': queue_children_menus,
+        })
+
+
+# Nicer import names
+menus = WagtailMenusExtension
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.core.models import Site
+
+from wagtailmenus.export import export_sites
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the main menu, section menu and flat menus for every live "
+        "page of every site (or the sites specified) to HTML files in "
+        "OUTPUT_DIR, in a directory structure matching page URLs, with "
+        "active classes applied for each page")
+
+    def add_arguments(self, parser):
+        parser.add_argument('output_dir', help="The directory to write files to")
+        parser.add_argument(
+            '--site',
+            action='append',
+            type=int,
+            dest='site_ids',
+            help="The ID of a site to export menus for (can be used several times)",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="The number of processes to use (each exports a single site at a time)",
+        )
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all()
+        if options['site_ids']:
+            sites = sites.filter(pk__in=options['site_ids'])
+        site_ids = list(sites.values_list('pk', flat=True))
+
+        start = time.perf_counter()
+        page_count = 0
+        failures = []
+        for result in export_sites(site_ids, options['output_dir'], workers=options['workers']):
+            if result.error:
+                failures.append(result)
+                self.stderr.write('site %s failed: %s' % (result.site_id, result.error))
+                continue
+            page_count += result.page_count
+            if options['verbosity'] > 1:
+                self.stdout.write('site %s: %s pages in %.2f seconds (%.1f pages per second)' % (
+                    result.site_id, result.page_count, result.duration,
+                    result.page_count / result.duration if result.duration else 0,
+                ))
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            "Exported menus for %s pages of %s sites in %.2f seconds (%.1f "
+            "pages per second)." % (
+                page_count, len(site_ids) - len(failures), duration,
+                page_count / duration if duration else 0,
+            ))
+        if failures:
+            raise CommandError("Menus for %s sites could not be exported." % len(failures))
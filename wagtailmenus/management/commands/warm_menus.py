@@ -0,0 +1,82 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.core.models import Site
+
+from wagtailmenus.warming import get_warming_tasks, warm_menus
+
+
+class Command(BaseCommand):
+    help = (
+        "Build and store compiled menus for every site (or the sites "
+        "specified), so that they are ready before the first visitors arrive. "
+        "Warms the menu cache (if WAGTAILMENUS_USE_MENU_CACHE is True) and "
+        "menu snapshots (if WAGTAILMENUS_SNAPSHOT_DIR is set)")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--site',
+            action='append',
+            type=int,
+            dest='site_ids',
+            help="The ID of a site to warm menus for (can be used several times)",
+        )
+        parser.add_argument(
+            '--section-menus',
+            action='store_true',
+            dest='section_menus',
+            default=False,
+            help="Also warm section menus for every page within a section",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="The number of menus to build at once",
+        )
+        parser.add_argument(
+            '--processes',
+            action='store_true',
+            dest='use_processes',
+            default=False,
+            help="Use a pool of processes instead of threads",
+        )
+
+    def handle(self, *args, **options):
+        sites = Site.objects.all()
+        if options['site_ids']:
+            sites = sites.filter(pk__in=options['site_ids'])
+        tasks = get_warming_tasks(sites, section_menus=options['section_menus'])
+        if not tasks:
+            self.stdout.write(
+                "Nothing to warm. Enable WAGTAILMENUS_USE_MENU_CACHE or "
+                "WAGTAILMENUS_SNAPSHOT_DIR to use this command.")
+            return
+
+        start = time.perf_counter()
+        failures = []
+        for result in warm_menus(
+            tasks, workers=options['workers'], use_processes=options['use_processes']
+        ):
+            task = result.task
+            label = 'site %s: %s' % (task.site_id, task.menu)
+            if task.handle:
+                label += " '%s'" % task.handle
+            if task.page_id is not None:
+                label += ' (page %s)' % task.page_id
+            if result.error:
+                failures.append(result)
+                self.stderr.write('%s failed: %s' % (label, result.error))
+            elif options['verbosity'] > 1:
+                self.stdout.write('%s (%.1f ms)' % (label, result.duration * 1000))
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            "Warmed %s of %s menus for %s sites in %.2f seconds (%.1f ms per "
+            "menu on average)." % (
+                len(tasks) - len(failures), len(tasks),
+                len(set(task.site_id for task in tasks)), duration,
+                duration * 1000 / len(tasks),
+            ))
+        if failures:
+            raise CommandError("%s menus could not be warmed." % len(failures))
@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 21:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailcore', '0023_alter_page_revision_on_delete_behaviour'),
+        ('wagtailmenus', '0023_remove_use_specific'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('handle', models.CharField(blank=True, max_length=100, verbose_name='handle')),
+                ('version', models.BigIntegerField(verbose_name='version')),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='wagtailcore.Site', verbose_name='site')),
+            ],
+            options={
+                'verbose_name': 'menu version',
+                'verbose_name_plural': 'menu versions',
+                'unique_together': {('site', 'handle')},
+            },
+        ),
+    ]
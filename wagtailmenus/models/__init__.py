@@ -1,3 +1,4 @@
 from .pages import *  # noqa
 from .menus import *  # noqa
 from .menuitems import *  # noqa
+from .versions import *  # noqa
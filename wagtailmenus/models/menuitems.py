@@ -7,7 +7,7 @@ from modelcluster.fields import ParentalKey
 from wagtail.admin.edit_handlers import FieldPanel, PageChooserPanel
 from wagtail.core.models import Page, Orderable
 
-from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
 from wagtailmenus.managers import MenuItemManager
 
 
@@ -85,7 +85,7 @@ class AbstractMenuItem(models.Model, MenuItem):
             return ''
         return getattr(
             self.link_page,
-            settings.PAGE_FIELD_FOR_MENU_ITEM_TEXT,
+            get_settings_snapshot().PAGE_FIELD_FOR_MENU_ITEM_TEXT,
             self.link_page.title
         )
 
@@ -129,12 +129,12 @@ class AbstractMenuItem(models.Model, MenuItem):
         if parsed_url.netloc:
             return ''
         if request.path == parsed_url.path:
-            return settings.ACTIVE_CLASS
+            return get_settings_snapshot().ACTIVE_CLASS
         if (
             request.path.startswith(parsed_url.path) and
             parsed_url.path != '/'
         ):
-            return settings.ACTIVE_ANCESTOR_CLASS
+            return get_settings_snapshot().ACTIVE_ANCESTOR_CLASS
         return ''
 
     def __str__(self):
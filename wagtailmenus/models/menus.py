@@ -1,21 +1,45 @@
 import warnings
-from collections import defaultdict, namedtuple, OrderedDict
+from collections import Counter, defaultdict, namedtuple, OrderedDict
+from functools import lru_cache, reduce
+from itertools import chain
+from operator import or_
 from types import GeneratorType
+from urllib.parse import urlencode, urlparse
 
-from django.db import models
-from django.db.models import BooleanField, Case, Q, When
-from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, models
+from django.db.models import BooleanField, Case, Count, Q, When
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.functions import Coalesce, Substr
+from django.core.exceptions import FieldDoesNotExist, FieldError, ImproperlyConfigured
 from django.template.loader import get_template, select_template
+from django.urls import NoReverseMatch, reverse
 from django.utils.functional import cached_property, lazy
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import ngettext, ugettext_lazy as _
 from modelcluster.models import ClusterableModel
-from wagtail.core import hooks
 from wagtail.core.models import Page, Site
+from wagtail.core.utils import resolve_model_string
 
 from wagtailmenus import forms, panels
+from wagtailmenus.cache import (
+    get_flat_menu_dependency, get_main_menu_dependency, get_page_dependencies,
+    get_tree_dependencies
+)
 from wagtailmenus.conf import constants, settings
-from wagtailmenus.utils.misc import get_site_from_request
+from wagtailmenus.conf.snapshot import get_settings_snapshot
+from wagtailmenus.query_budgets import count_menu_queries
+from wagtailmenus.renderers import get_fast_renderer, render_fast
+from wagtailmenus.utils.hooks import get_hooks
+from wagtailmenus.utils.loaders import get_children_loader
+from wagtailmenus.utils.misc import (
+    dumps_lazy_sub_menu_options, flatten_context, get_site_from_request,
+    menu_sync_to_async
+)
+from wagtailmenus.utils.page_fields import (
+    get_page_fields_to_load, get_specific_pages
+)
+from wagtailmenus.utils.tree import CompactPageTree
 from .menuitems import MenuItem
 from .mixins import DefinesSubMenuTemplatesMixin
 from .pages import AbstractLinkPage
@@ -23,6 +47,21 @@ from .pages import AbstractLinkPage
 
 mark_safe_lazy = lazy(mark_safe, str)
 
+
+@lru_cache(maxsize=None)
+def get_deferred_link_page_fields(menu_item_model):
+    """
+    Return a tuple of lookups for all 'link_page' fields (for
+    ``menu_item_model``) that do not need to be fetched along with menu items.
+    The result is cached for each model, because finding the fields involves
+    checking every field on the page model.
+    """
+    page_model = menu_item_model._meta.get_field('link_page').related_model
+    return tuple(
+        'link_page__{}'.format(f.name) for f in page_model._meta.get_fields()
+        if f.concrete and f.name not in ('id', 'path', 'depth')
+    )
+
 ContextualVals = namedtuple('ContextualVals', (
     'parent_context',
     'request',
@@ -61,6 +100,7 @@ class Menu:
     template_name = None
     menu_instance_context_name = 'menu'
     sub_menu_class = None
+    page_fields_for_display = None
 
     @classmethod
     def render_from_tag(
@@ -86,19 +126,51 @@ class Menu:
             * get_context_data()
             * render_to_template()
         """
-        instance = cls._get_render_prepared_object(
-            context,
-            max_levels=max_levels,
-            apply_active_classes=apply_active_classes,
-            allow_repeating_parents=allow_repeating_parents,
-            use_absolute_page_urls=use_absolute_page_urls,
-            add_sub_menus_inline=add_sub_menus_inline,
-            template_name=template_name,
-            **kwargs
-        )
-        if not instance:
-            return ''
-        return instance.render_to_template()
+        with count_menu_queries(cls, kwargs.get('handle')):
+            instance = cls._get_render_prepared_object(
+                context,
+                max_levels=max_levels,
+                apply_active_classes=apply_active_classes,
+                allow_repeating_parents=allow_repeating_parents,
+                use_absolute_page_urls=use_absolute_page_urls,
+                add_sub_menus_inline=add_sub_menus_inline,
+                template_name=template_name,
+                **kwargs
+            )
+            if not instance:
+                return ''
+            return instance.render_to_template()
+
+    @classmethod
+    async def arender_from_tag(cls, context, *args, thread_sensitive=True, **kwargs):
+        """
+        An async equivalent of ``render_from_tag()``, for use in ASGI
+        deployments (requires Django 3.0 or later).
+
+        Everything involved in rendering a menu (identifying the menu, querying
+        the database for pages and menu items, and rendering the menu and any
+        sub menus) happens within a single ``sync_to_async()`` call, rather than
+        hopping between threads for each query.
+
+        By default, the work is done in the same thread as other
+        'thread sensitive' synchronous code (as recommended for code using
+        Django's ORM). Supplying ``thread_sensitive=False`` allows independent
+        menus to be rendered concurrently in separate threads (each using its
+        own database connection, which is closed afterwards), e.g.:
+
+        .. code-block:: python
+
+            main_menu_html, footer_menu_html = await asyncio.gather(
+                MainMenu.arender_from_tag(context, thread_sensitive=False),
+                FlatMenu.arender_from_tag(context, 'footer', thread_sensitive=False),
+            )
+
+        Because separate connections are used, menus rendered with
+        ``thread_sensitive=False`` can't see changes made within a transaction
+        that hasn't been committed yet.
+        """
+        render = menu_sync_to_async(cls.render_from_tag, thread_sensitive=thread_sensitive)
+        return await render(context, *args, **kwargs)
 
     @classmethod
     def _get_render_prepared_object(cls, context, **option_values):
@@ -157,9 +229,13 @@ class Menu:
 
             option_vals.extra['fall_back_to_default_site_menus']
         """
+        apply_active_classes = kwargs.pop('apply_active_classes')
+        if kwargs.get('client_side_active_classes'):
+            # Active classes are applied in the browser instead
+            apply_active_classes = False
         return OptionVals(
             kwargs.pop('max_levels'),
-            kwargs.pop('apply_active_classes'),
+            apply_active_classes,
             kwargs.pop('allow_repeating_parents'),
             kwargs.pop('use_absolute_page_urls'),
             kwargs.pop('add_sub_menus_inline', settings.DEFAULT_ADD_SUB_MENUS_INLINE),
@@ -218,10 +294,89 @@ class Menu:
         """
         context_data = self.get_context_data()
         template = self.get_template()
+        return self.render_template(template, context_data)
 
+    def render_template(self, template, context_data):
+        """
+        Render ``template`` (as returned by ``get_template()``) using
+        ``context_data`` (as returned by ``get_context_data()``) and return a
+        string, using a 'fast renderer' for the template if one is available
+        and ``USE_FAST_RENDERER`` is ``True``.
+        """
         context_data['current_template'] = template.template.name
+        if hasattr(getattr(template.template, 'environment', None), 'wagtailmenus_engine_name'):
+            # The menu instance is still available as 'menu_instance', but
+            # the additional key would shadow one of the global functions
+            # added by wagtailmenus' Jinja2 extension
+            context_data.pop(self.menu_instance_context_name, None)
+        if get_settings_snapshot().USE_FAST_RENDERER:
+            render_func = get_fast_renderer(template)
+            if render_func:
+                return render_fast(render_func, template, context_data)
         return template.render(context_data)
 
+    def as_dict(self):
+        """
+        Return a dictionary representation of the current menu instance and
+        its menu items (including any additional levels), suitable for
+        serializing as JSON. Like ``render_to_template()``, this should only be
+        called once the instance has been prepared by ``prepare_to_render()``.
+        """
+        return {
+            'type': self.related_templatetag_name,
+            'items': self.get_menu_items_as_dicts(),
+        }
+
+    def get_menu_items_as_dicts(self):
+        return [
+            self.menu_item_as_dict(item)
+            for item in self.get_menu_items_for_rendering()
+        ]
+
+    def menu_item_as_dict(self, item):
+        """
+        Return a dictionary representation of a single 'primed' menu item. If
+        the item has children in the menu, those are included too.
+        """
+        if isinstance(item, dict):
+            # Items added by hooks or 'modify_submenu_items()' methods can be
+            # simple dictionaries, as templates can render those too
+            data = {key: item.get(key) for key in ('text', 'href', 'active_class')}
+            data['text'] = str(data['text'])
+            data['page_id'] = None
+            if item.get('is_more_item'):
+                data['more_count'] = item['more_count']
+            return data
+        if isinstance(item, MenuItem):
+            page = item.link_page
+        else:
+            page = item if isinstance(item, Page) else None
+        data = {
+            'text': str(item.text),
+            'href': item.href,
+            'page_id': page.pk if page else None,
+            'active_class': getattr(item, 'active_class', ''),
+        }
+        if getattr(item, 'has_children_in_menu', False):
+            sub_menu = getattr(item, 'sub_menu', None) or self.create_sub_menu(page)
+            data['children'] = sub_menu.get_menu_items_as_dicts()
+        return data
+
+    def get_cache_dependencies(self):
+        """
+        Return a set of 'dependencies' identifying the pages (and branches of
+        the page tree) that this menu's output depends on, so that a cached
+        copy can be invalidated when any of them change (see
+        ``wagtailmenus.cache``). Like ``as_dict()``, this should only be
+        called once the instance has been prepared by ``prepare_to_render()``.
+        """
+        dependencies = set()
+        current_page = self._contextual_vals.current_page
+        if current_page is not None and self._option_vals.apply_active_classes:
+            # Active classes depend on the current page's position in the tree
+            dependencies.update(get_page_dependencies(current_page))
+        return dependencies
+
     def get_common_hook_kwargs(self, **kwargs):
         """
         Returns a dictionary of common values to be passed as keyword
@@ -257,10 +412,38 @@ class Menu:
     def get_base_page_queryset(self):
         qs = Page.objects.filter(live=True, expired=False, show_in_menus=True)
         # allow hooks to modify the queryset
-        for hook in hooks.get_hooks('menus_modify_base_page_queryset'):
-            qs = hook(qs, **self.common_hook_kwargs)
+        hook_methods = get_hooks('menus_modify_base_page_queryset')
+        if hook_methods:
+            hook_kwargs = self.common_hook_kwargs
+            for hook in hook_methods:
+                qs = hook(qs, **hook_kwargs)
         return qs
 
+    def get_page_fields_for_display(self):
+        """
+        Return a set of names of the page fields to load for pages in the
+        menu, or ``None`` if all fields should be loaded (the default). Field
+        names are taken from the class's ``page_fields_for_display`` attribute
+        or the ``PAGE_FIELDS_FOR_MENUS`` setting, and combined with those
+        needed by wagtailmenus or declared via the ``menus_page_fields`` hook.
+        """
+        field_names = self.page_fields_for_display
+        if field_names is None:
+            field_names = settings.PAGE_FIELDS_FOR_MENUS
+        if field_names is None:
+            return None
+        return get_page_fields_to_load(field_names)
+
+    def get_specific_pages(self, queryset):
+        """
+        Return an iterable of 'specific' pages for ``queryset``, with only the
+        fields from ``get_page_fields_for_display()`` loaded.
+        """
+        field_names = self.get_page_fields_for_display()
+        if field_names is None:
+            return queryset.specific()
+        return get_specific_pages(queryset, field_names)
+
     def get_pages_for_display(self):
         raise NotImplementedError(
             "Subclasses of 'Menu' must define their own "
@@ -273,6 +456,17 @@ class Menu:
         # using OrderedDict to preserve ordering in Python < 3.6
         return OrderedDict((p.id, p) for p in self.get_pages_for_display())
 
+    async def aget_pages_for_display(self, thread_sensitive=True):
+        """
+        An async equivalent of ``get_pages_for_display()``. All queries needed
+        to fetch the pages are made within a single ``sync_to_async()`` call,
+        and the result is cached, so that it can be reused by other methods
+        without any further queries. Returns a list of 'specific' pages.
+        """
+        def get_pages():
+            return list(self.pages_for_display.values())
+        return await menu_sync_to_async(get_pages, thread_sensitive=thread_sensitive)()
+
     def get_page_children_dict(self, page_qs=None):
         """
         Returns a dictionary of lists, where the keys are 'path' values for
@@ -287,8 +481,21 @@ class Menu:
     def page_children_dict(self):
         return self.get_page_children_dict()
 
+    def uses_compact_page_tree(self):
+        """
+        Return a boolean indicating whether child pages should be looked up
+        using ``compact_page_tree`` instead of ``page_children_dict``.
+        """
+        return get_settings_snapshot().USE_COMPACT_PAGE_TREE
+
+    @cached_property
+    def compact_page_tree(self):
+        return CompactPageTree(self.pages_for_display.values())
+
     def get_children_for_page(self, page):
         """Return a list of relevant child pages for a given page."""
+        if self.uses_compact_page_tree():
+            return self.compact_page_tree.get_children_for_page(page)
         return self.page_children_dict.get(page.path, [])
 
     def page_has_children(self, page):
@@ -296,6 +503,8 @@ class Menu:
         Return a boolean indicating whether a given page has any relevant
         child pages.
         """
+        if self.uses_compact_page_tree():
+            return self.compact_page_tree.page_has_children(page)
         return page.path in self.page_children_dict
 
     def get_sub_menu_class(self):
@@ -320,24 +529,7 @@ class Menu:
         return menu_class._get_render_prepared_object(context, **option_vals)
 
     def create_dict_from_parent_context(self):
-        parent_context = self._contextual_vals.parent_context
-
-        try:
-            # Django template engine (or similar) Context
-            return parent_context.flatten()
-        except AttributeError:
-            pass
-
-        try:
-            # Jinja2 Context
-            return parent_context.get_all()
-        except AttributeError:
-            pass
-
-        if isinstance(parent_context, dict):
-            return parent_context.copy()
-
-        return {}
+        return flatten_context(self._contextual_vals.parent_context)
 
     def get_context_data(self, **kwargs):
         """
@@ -378,9 +570,13 @@ class Menu:
         """
         items = self.get_raw_menu_items()
 
-        # Allow hooks to modify the raw list
-        for hook in hooks.get_hooks('menus_modify_raw_menu_items'):
-            items = hook(items, **self.common_hook_kwargs)
+        # Allow hooks to modify the raw list (hook kwargs are only built when
+        # there are hooks to receive them)
+        hook_methods = get_hooks('menus_modify_raw_menu_items')
+        if hook_methods:
+            hook_kwargs = self.common_hook_kwargs
+            for hook in hook_methods:
+                items = hook(items, **hook_kwargs)
 
         # Prime and modify the menu items accordingly
         items = self.modify_menu_items(self.prime_menu_items(items))
@@ -388,13 +584,87 @@ class Menu:
             items = list(items)
 
         # Allow hooks to modify the primed/modified list
-        hook_methods = hooks.get_hooks('menus_modify_primed_menu_items')
-        for hook in hook_methods:
-            items = hook(items, **self.common_hook_kwargs)
+        hook_methods = get_hooks('menus_modify_primed_menu_items')
+        if hook_methods:
+            hook_kwargs = self.common_hook_kwargs
+            for hook in hook_methods:
+                items = hook(items, **hook_kwargs)
+
+        if self.uses_client_side_active_classes():
+            self.set_active_state_attrs(items)
         return items
 
     items = property(get_menu_items_for_rendering)
 
+    def uses_client_side_active_classes(self):
+        """
+        Return a boolean indicating whether active classes should be applied
+        in the browser (using the ``{% menu_active_state %}`` tag) instead of
+        being added to menu items on the server.
+        """
+        return bool(self._option_vals.extra.get('client_side_active_classes'))
+
+    def set_active_state_attrs(self, menu_items):
+        """
+        Set a 'data_attrs' value on each item in ``menu_items``, which
+        templates output inside the item's ``<li>`` element, so that the
+        correct classes can be applied in the browser.
+        """
+        for item in menu_items:
+            attrs = self.get_active_state_attrs(item)
+            if isinstance(item, dict):
+                item['data_attrs'] = attrs
+            else:
+                item.data_attrs = attrs
+
+    def get_active_state_attrs(self, item):
+        """
+        Return a string of HTML data attributes identifying the page (or
+        custom URL) that ``item`` links to, which does not vary with the
+        current request.
+        """
+        if isinstance(item, MenuItem):
+            page = item.link_page
+            if not page:
+                # Mirror MenuItem.get_active_class_for_request()
+                parsed_url = urlparse(item.link_url or '')
+                if parsed_url.netloc or not parsed_url.path:
+                    return ''
+                return format_html(' data-wm-url="{}"', parsed_url.path)
+        elif isinstance(item, Page):
+            if issubclass(item.specific_class, AbstractLinkPage):
+                return ''
+            page = item
+        else:
+            return ''
+
+        attrs = format_html(' data-wm-page="{}"', page.pk)
+        if (
+            self._option_vals.allow_repeating_parents and
+            getattr(item, 'has_children_in_menu', False) and
+            getattr(page, 'repeat_in_subnav', False)
+        ):
+            # The page will be repeated in the sub menu, where the 'active'
+            # class will be applied instead
+            attrs += mark_safe(' data-wm-repeats')
+        return attrs
+
+    def uses_lazy_sub_menus(self):
+        """
+        Return a boolean indicating whether sub menus outside of the current
+        page's 'active trail' should be replaced with placeholders, to be
+        loaded separately when needed.
+        """
+        return bool(self._option_vals.extra.get('lazy_sub_menus'))
+
+    def get_lazy_sub_menu_url(self, sub_menu):
+        """
+        Return a URL from which the HTML for ``sub_menu`` (a prepared
+        ``SubMenu`` instance belonging to this menu) can be loaded, or ``None``
+        if sub menus for this type of menu cannot be loaded separately.
+        """
+        return None
+
     def get_raw_menu_items(self):
         """
         Returns a python list of ``Page`` on ``MenuItem`` objects that will
@@ -406,6 +676,7 @@ class Menu:
     def _prime_menu_item(self, item):
         ctx_vals = self._contextual_vals
         option_vals = self._option_vals
+        settings_snapshot = get_settings_snapshot()
         current_site = ctx_vals.current_site
         current_page = ctx_vals.current_page
         request = self.request
@@ -458,7 +729,7 @@ class Menu:
         if page:
             if (
                 not stop_at_this_level and
-                page.depth >= settings.SECTION_ROOT_DEPTH and
+                page.depth >= settings_snapshot.SECTION_ROOT_DEPTH and
                 (not item_is_menu_item_object or item.allow_subnav)
             ):
                 if hasattr(page, 'has_submenu_items'):
@@ -486,16 +757,16 @@ class Menu:
                 if(current_page and page.pk == current_page.pk):
                     # This is the current page, so the menu item should
                     # probably have the 'active' class
-                    active_class = settings.ACTIVE_CLASS
+                    active_class = settings_snapshot.ACTIVE_CLASS
                     if (
                         option_vals.allow_repeating_parents and
                         has_children_in_menu
                     ):
                         if getattr(page, 'repeat_in_subnav', False):
-                            active_class = settings.ACTIVE_ANCESTOR_CLASS
+                            active_class = settings_snapshot.ACTIVE_ANCESTOR_CLASS
 
                 elif page.pk in ctx_vals.current_page_ancestor_ids:
-                    active_class = settings.ACTIVE_ANCESTOR_CLASS
+                    active_class = settings_snapshot.ACTIVE_ANCESTOR_CLASS
             else:
                 # This is a `MenuItem` for a custom URL
                 active_class = item.get_active_class_for_request(request)
@@ -507,7 +778,7 @@ class Menu:
         if item_is_menu_item_object:
             item.text = item.menu_text
         else:
-            item.text = getattr(item, settings.PAGE_FIELD_FOR_MENU_ITEM_TEXT, item.title)
+            item.text = getattr(item, settings_snapshot.PAGE_FIELD_FOR_MENU_ITEM_TEXT, item.title)
 
         # ---------------------------------------------------------------------
         # Set 'href' attribute
@@ -550,13 +821,32 @@ class Menu:
         """
         return menu_items
 
+    def get_more_item(self, parent_page):
+        """
+        Return a 'sentinel' menu item to add after the children of
+        ``parent_page`` when some of them have been left out of the menu, or
+        ``None``. Sub menus use this method of the original menu instance.
+        """
+        return None
+
+    def get_template_engine(self):
+        """
+        Return the name of the template engine that should be used to load
+        templates for this menu, or ``None`` to use the first engine that can
+        find a matching template (Django's default behaviour). The value
+        can be set via a 'template_engine' option value, as the
+        Jinja2 extension in ``wagtailmenus.jinja2tags`` does.
+        """
+        return self._option_vals.extra.get('template_engine')
+
     def get_template(self):
         template_name = self._option_vals.template_name or self.template_name
+        using = self.get_template_engine()
 
         if template_name:
-            return get_template(template_name)
+            return get_template(template_name, using=using)
 
-        return select_template(self.get_template_names())
+        return select_template(self.get_template_names(), using=using)
 
     def get_template_names(self):
         """Return a list (or tuple) of template names to search for when
@@ -628,7 +918,12 @@ class MenuFromPage(Menu):
             depth__lte=parent_page.depth + self.max_levels,
         )
         # Always return 'specific' page instances
-        return queryset.specific()
+        return self.get_specific_pages(queryset)
+
+    def get_cache_dependencies(self):
+        dependencies = super().get_cache_dependencies()
+        dependencies.update(get_tree_dependencies(self.parent_page_for_menu_items))
+        return dependencies
 
     def get_children_for_page(self, page):
         """Returns a list of relevant child pages for a given page"""
@@ -728,9 +1023,10 @@ class SectionMenu(DefinesSubMenuTemplatesMixin, MenuFromPage):
     def prepare_to_render(self, request, contextual_vals, option_vals):
         super().prepare_to_render(request, contextual_vals, option_vals)
         root_page = self.root_page.specific
+        settings_snapshot = get_settings_snapshot()
 
         root_page.text = getattr(
-            root_page, settings.PAGE_FIELD_FOR_MENU_ITEM_TEXT,
+            root_page, settings_snapshot.PAGE_FIELD_FOR_MENU_ITEM_TEXT,
             root_page.title
         )
         if option_vals.use_absolute_page_urls:
@@ -744,17 +1040,63 @@ class SectionMenu(DefinesSubMenuTemplatesMixin, MenuFromPage):
             current_page = contextual_vals.current_page
             if current_page and root_page.id == current_page.id:
                 if getattr(root_page, 'repeat_in_subnav', False):
-                    active_class = settings.ACTIVE_ANCESTOR_CLASS
+                    active_class = settings_snapshot.ACTIVE_ANCESTOR_CLASS
                 else:
-                    active_class = settings.ACTIVE_CLASS
+                    active_class = settings_snapshot.ACTIVE_CLASS
             elif root_page.id in contextual_vals.current_page_ancestor_ids:
-                active_class = settings.ACTIVE_ANCESTOR_CLASS
+                active_class = settings_snapshot.ACTIVE_ANCESTOR_CLASS
         root_page.active_class = active_class
+
+        if self.uses_client_side_active_classes():
+            data_attrs = format_html(' data-wm-page="{}"', root_page.pk)
+            if getattr(root_page, 'repeat_in_subnav', False):
+                data_attrs += mark_safe(' data-wm-repeats')
+            root_page.data_attrs = data_attrs
         self.root_page = root_page
 
     def get_parent_page_for_menu_items(self):
         return self.root_page
 
+    def uses_active_trail_only(self):
+        """
+        Return a boolean indicating whether only the pages on the current
+        page's 'active trail' should be expanded, instead of every page in
+        the section (down to ``max_levels``).
+        """
+        return bool(self._option_vals.extra.get('active_trail_only'))
+
+    def get_active_trail_paths(self):
+        """
+        Return the tree paths of pages whose children should be displayed
+        when ``uses_active_trail_only()`` returns ``True``: the section root
+        itself, and any ancestors of the current page (including the current
+        page) that are within ``max_levels`` of the section root.
+        """
+        root_page = self.root_page
+        paths = [root_page.path]
+        current_page = self._contextual_vals.current_page
+        if current_page and current_page.path.startswith(root_page.path):
+            # Ancestor paths can be derived from the current page's path,
+            # without querying the database
+            last_depth = min(
+                current_page.depth, root_page.depth + self.max_levels - 1
+            )
+            for depth in range(root_page.depth + 1, last_depth + 1):
+                paths.append(current_page.path[:depth * Page.steplen])
+        return paths
+
+    def get_pages_for_display(self):
+        if not self.uses_active_trail_only():
+            return super().get_pages_for_display()
+        children_q = Q()
+        for path in self.get_active_trail_paths():
+            children_q |= Q(
+                path__startswith=path, depth=len(path) // Page.steplen + 1
+            )
+        queryset = self.get_base_page_queryset().filter(children_q)
+        # Always return 'specific' page instances
+        return self.get_specific_pages(queryset)
+
     def get_context_data(self, **kwargs):
         data = {
             'show_section_root': self._option_vals.extra['show_section_root'],
@@ -763,6 +1105,18 @@ class SectionMenu(DefinesSubMenuTemplatesMixin, MenuFromPage):
         data.update(kwargs)
         return super().get_context_data(**data)
 
+    def as_dict(self):
+        data = super().as_dict()
+        if self._option_vals.extra['show_section_root']:
+            root_page = self.root_page
+            data['section_root'] = {
+                'text': str(root_page.text),
+                'href': root_page.href,
+                'page_id': root_page.pk,
+                'active_class': root_page.active_class,
+            }
+        return data
+
 
 class ChildrenMenu(DefinesSubMenuTemplatesMixin, MenuFromPage):
     menu_short_name = 'children'  # used to find templates
@@ -796,23 +1150,264 @@ class ChildrenMenu(DefinesSubMenuTemplatesMixin, MenuFromPage):
         parent_page = option_vals.parent_page or contextual_vals.current_page
         if not parent_page:
             return
+        extra = option_vals.extra
         return cls(
             max_levels=option_vals.max_levels,
             parent_page=parent_page,
+            limit=extra.get('limit'),
+            order_by=extra.get('order_by'),
+            page_types=extra.get('page_types'),
+            show_more_item=extra.get('show_more_item', False),
         )
 
     @classmethod
     def get_least_specific_template_name(cls):
         return settings.DEFAULT_CHILDREN_MENU_TEMPLATE
 
-    def __init__(self, parent_page, max_levels):
+    def __init__(
+        self, parent_page, max_levels, limit=None, order_by=None,
+        page_types=None, show_more_item=False
+    ):
         self.parent_page = parent_page
         self.max_levels = max_levels
+        self.limit = limit
+        self.order_by = order_by or ()
+        self.page_types = page_types or ()
+        self.show_more_item = show_more_item
+        self.remaining_children_counts = {}
         super().__init__()
 
     def get_parent_page_for_menu_items(self):
         return self.parent_page
 
+    def get_pages_for_display(self):
+        """
+        When a ``limit``, ``order_by`` or ``page_types`` value has been
+        supplied, pages are fetched one level at a time, so that filtering,
+        ordering and limiting can all be done by the database (only the
+        children of pages selected for the previous level are considered).
+        Otherwise, if the parent page has been queued (e.g. using the
+        ``{% queue_children_menus %}`` tag), pages are fetched via the
+        request's ``ChildrenLoader``, along with those for other queued pages
+        (see ``wagtailmenus.utils.loaders``).
+        """
+        if not (self.limit or self.order_by or self.page_types):
+            parent_page = self.parent_page_for_menu_items
+            loader = get_children_loader(self.request, create=False)
+            if (
+                loader is None or
+                not loader.is_queued(parent_page, self.max_levels) or
+                # Pages fetched using a queryset modified for one menu can't
+                # be shared with others
+                get_hooks('menus_modify_base_page_queryset')
+            ):
+                return super().get_pages_for_display()
+            return loader.get_pages(self, parent_page, self.max_levels)
+
+        parent_page = self.parent_page_for_menu_items
+        queryset = self.get_base_page_queryset()
+        if self.page_types:
+            queryset = queryset.filter(reduce(or_, (
+                queryset.type_q(model) for model in self.get_page_type_models()
+            )))
+        queryset = self.order_queryset(queryset)
+
+        pages = []
+        parent_paths = [parent_page.path]
+        for depth in range(
+            parent_page.depth + 1, parent_page.depth + self.max_levels + 1
+        ):
+            level_pages = self.get_pages_for_level(
+                queryset.filter(depth=depth), parent_paths
+            )
+            if not level_pages:
+                break
+            pages.extend(level_pages)
+            parent_paths = [page.path for page in level_pages]
+        return pages
+
+    def get_page_type_models(self):
+        """
+        Return a list of page models identified by ``page_types``, which can
+        be model classes or 'app_label.ModelName' strings.
+        """
+        models = []
+        for value in self.page_types:
+            try:
+                model = resolve_model_string(value)
+            except (LookupError, ValueError):
+                raise ValueError(
+                    "'%s' is not a valid page type. Page types should be "
+                    "supplied in the format 'app_label.ModelName'." % value
+                )
+            if not issubclass(model, Page):
+                raise ValueError("'%s' is not a page type." % value)
+            models.append(model)
+        return models
+
+    def order_queryset(self, queryset):
+        """
+        Return ``queryset`` ordered according to ``order_by``. Values can be
+        fields on the ``Page`` model (or lookups spanning relationships, e.g.
+        ``'owner__last_name'``), or names of fields on the specific page types
+        identified by ``page_types`` (e.g. ``'-publish_date'``). Where more
+        than one of those page types has the field, pages are ordered by an
+        annotation combining their values.
+        """
+        page_type_models = self.get_page_type_models() if self.page_types else []
+        ordering = []
+        annotations = {}
+        for value in self.order_by:
+            name = value[1:] if value.startswith('-') else value
+            try:
+                queryset.query.names_to_path(name.split(LOOKUP_SEP), queryset.model._meta)
+            except FieldError:
+                lookups = self.get_specific_field_lookups(name, page_type_models)
+                if not lookups:
+                    raise ValueError(
+                        "Pages can't be ordered by '%s'. Values for 'order_by' "
+                        "should be fields on the Page model, or fields on the "
+                        "page types specified by 'page_types'." % name
+                    )
+                if len(lookups) == 1:
+                    name = lookups[0]
+                else:
+                    annotation_name = 'wagtailmenus_order_%s' % len(annotations)
+                    annotations[annotation_name] = Coalesce(*lookups)
+                    name = annotation_name
+            ordering.append('-' + name if value.startswith('-') else name)
+        # Adding 'path' as a tie-breaker keeps the ordering stable
+        ordering.append('path')
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset.order_by(*ordering)
+
+    @staticmethod
+    def get_specific_field_lookups(name, page_type_models):
+        """
+        Return a list of lookups (relative to ``Page``) for the field that
+        ``name`` starts with, for each of ``page_type_models`` that has such
+        a field (e.g. ``'blogpage__publish_date'`` for ``'publish_date'``).
+        """
+        field_name, _sep, rest = name.partition(LOOKUP_SEP)
+        lookups = []
+        for model in page_type_models:
+            try:
+                field = model._meta.get_field(field_name)
+            except FieldDoesNotExist:
+                continue
+            if not field.concrete:
+                continue
+            # Follow parent links from the model that defines the field up to
+            # 'Page' (e.g. 'toplevelpage__' or 'basepage__blogpage__')
+            path = []
+            concrete_model = field.model
+            while concrete_model is not Page and concrete_model._meta.parents:
+                parent, link = next(
+                    (parent, link) for parent, link in concrete_model._meta.parents.items()
+                    if issubclass(parent, Page)
+                )
+                path.insert(0, link.related_query_name())
+                concrete_model = parent
+            lookup = LOOKUP_SEP.join(path + [name])
+            if lookup not in lookups:
+                lookups.append(lookup)
+        return lookups
+
+    def get_pages_for_level(self, queryset, parent_paths):
+        """
+        Return a list of 'specific' pages from ``queryset`` (already filtered
+        to a single depth and ordered) that are children of pages with the
+        supplied ``parent_paths``, limiting the number of children for each
+        parent page to ``limit``.
+        """
+        limit = self.limit
+        if not limit:
+            return list(self.get_specific_pages(queryset.filter(reduce(or_, (
+                Q(path__startswith=path) for path in parent_paths
+            )))))
+
+        if len(parent_paths) == 1:
+            pages = list(self.get_specific_pages(
+                queryset.filter(path__startswith=parent_paths[0])[:limit]
+            ))
+        elif connections[queryset.db].features.allow_sliced_subqueries_with_in:
+            # Select the first few children of each parent in a single query
+            pages = list(self.get_specific_pages(queryset.filter(reduce(or_, (
+                Q(pk__in=queryset.filter(path__startswith=path).values('pk')[:limit])
+                for path in parent_paths
+            )))))
+        else:
+            pages = list(chain.from_iterable(
+                self.get_specific_pages(queryset.filter(path__startswith=path)[:limit])
+                for path in parent_paths
+            ))
+
+        if self.show_more_item:
+            self.remaining_children_counts.update(
+                self.get_remaining_children_counts(queryset, parent_paths, pages)
+            )
+        return pages
+
+    def get_remaining_children_counts(self, queryset, parent_paths, pages):
+        """
+        Return a dictionary of the number of children left out of the menu
+        for pages with the supplied ``parent_paths``, keyed by page path. Only
+        pages where ``limit`` was reached are included (and counted).
+        """
+        selected_counts = Counter(page.path[:-page.steplen] for page in pages)
+        limit_reached = [
+            path for path in parent_paths if selected_counts[path] >= self.limit
+        ]
+        if not limit_reached:
+            return {}
+        totals = queryset.filter(reduce(or_, (
+            Q(path__startswith=path) for path in limit_reached
+        ))).order_by().values(
+            parent_path=Substr('path', 1, len(limit_reached[0]))
+        ).annotate(total=Count('pk')).values_list('parent_path', 'total')
+        return {
+            path: total - self.limit
+            for path, total in totals if total > self.limit
+        }
+
+    def get_more_item(self, parent_page):
+        """
+        Overrides ``Menu.get_more_item()`` to return an item linking to
+        ``parent_page`` (with the number of children left out as
+        'more_count') when ``show_more_item`` is ``True`` and the ``limit``
+        was reached for that page.
+        """
+        if not self.show_more_item:
+            return
+        remaining = self.remaining_children_counts.get(parent_page.path)
+        if not remaining:
+            return
+        if self._option_vals.use_absolute_page_urls:
+            href = parent_page.get_full_url(request=self.request)
+        else:
+            href = parent_page.relative_url(
+                self._contextual_vals.current_site, self.request
+            )
+        return {
+            'text': ngettext(
+                '%(count)s more', '%(count)s more', remaining
+            ) % {'count': remaining},
+            'href': href,
+            'active_class': '',
+            'has_children_in_menu': False,
+            'is_more_item': True,
+            'more_count': remaining,
+        }
+
+    def modify_menu_items(self, menu_items):
+        menu_items = super().modify_menu_items(menu_items)
+        more_item = self.get_more_item(self.parent_page)
+        if more_item:
+            menu_items = list(menu_items)
+            menu_items.append(more_item)
+        return menu_items
+
     def get_context_data(self, **kwargs):
         data = {'parent_page': self.parent_page}
         data.update(kwargs)
@@ -853,19 +1448,69 @@ class SubMenu(MenuFromPage):
 
     def __init__(self, original_menu, parent_page, max_levels):
         self.original_menu = original_menu
-        self.page_children_dict = original_menu.page_children_dict
         self.parent_page = parent_page
         self.max_levels = max_levels
 
+    @property
+    def page_children_dict(self):
+        return self.original_menu.page_children_dict
+
+    def get_children_for_page(self, page):
+        return self.original_menu.get_children_for_page(page)
+
+    def page_has_children(self, page):
+        return self.original_menu.page_has_children(page)
+
     def get_parent_page_for_menu_items(self):
         return self.parent_page
 
+    def uses_client_side_active_classes(self):
+        return self.original_menu.uses_client_side_active_classes()
+
+    def render_to_template(self):
+        if self.should_render_placeholder():
+            url = self.original_menu.get_lazy_sub_menu_url(self)
+            if url:
+                return self.render_placeholder(url)
+        return super().render_to_template()
+
+    def should_render_placeholder(self):
+        original_menu = self.original_menu
+        if not original_menu.uses_lazy_sub_menus():
+            return False
+        if original_menu.uses_client_side_active_classes():
+            # Output must not vary from page to page
+            return True
+        return (
+            self.parent_page.pk not in
+            self._contextual_vals.current_page_ancestor_ids
+        )
+
+    def render_placeholder(self, url):
+        template = get_template(
+            settings.DEFAULT_SUB_MENU_PLACEHOLDER_TEMPLATE,
+            using=self.get_template_engine()
+        )
+        return template.render({
+            'url': url,
+            'parent_page': self.parent_page,
+            'current_level': self._contextual_vals.current_level,
+        })
+
     def get_raw_menu_items(self):
         """Overrides the 'MenuFromPage' version, because sub menus are powered
         by page data, which is prefetched by the the original menu instance.
         """
         return self.original_menu.get_children_for_page(self.parent_page)
 
+    def modify_menu_items(self, menu_items):
+        menu_items = super().modify_menu_items(menu_items)
+        more_item = self.original_menu.get_more_item(self.parent_page)
+        if more_item:
+            menu_items = list(menu_items)
+            menu_items.append(more_item)
+        return menu_items
+
     def get_template(self):
         if self._option_vals.template_name or self.template_name:
             return super().get_template()
@@ -883,6 +1528,7 @@ class MenuWithMenuItems(ClusterableModel, Menu):
     """A base model class for menus who's 'menu_items' are defined by
     a set of 'menu item' model instances."""
     menu_items_relation_setting_name = None
+    lazy_sub_menu_url_name = None
 
     class Meta:
         abstract = True
@@ -896,14 +1542,16 @@ class MenuWithMenuItems(ClusterableModel, Menu):
 
         # Prefetch minimal page values only. The rest will be
         # fetched by get_pages_for_display()
-        qs = qs.select_related('link_page').defer(*[
-            'link_page__{}'.format(f.name) for f in Page._meta.get_fields()
-            if f.concrete and f.name not in ('id', 'path', 'depth')
-        ])
+        qs = qs.select_related('link_page').defer(
+            *get_deferred_link_page_fields(qs.model)
+        )
 
         # allow hooks to modify the queryset
-        for hook in hooks.get_hooks('menus_modify_base_menuitem_queryset'):
-            qs = hook(qs, **self.common_hook_kwargs)
+        hook_methods = get_hooks('menus_modify_base_menuitem_queryset')
+        if hook_methods:
+            hook_kwargs = self.common_hook_kwargs
+            for hook in hook_methods:
+                qs = hook(qs, **hook_kwargs)
         return qs
 
     def get_menu_items_manager(self):
@@ -950,6 +1598,18 @@ class MenuWithMenuItems(ClusterableModel, Menu):
     def top_level_items(self):
         return self.get_top_level_items()
 
+    async def aget_top_level_items(self, thread_sensitive=True):
+        """
+        An async equivalent of ``get_top_level_items()``. The menu item query,
+        and the queries needed to fetch pages for those items (and any
+        sub menus), are all made within a single ``sync_to_async()`` call. The
+        result is cached, so that it can be reused when rendering without any
+        further queries.
+        """
+        def get_items():
+            return self.top_level_items
+        return await menu_sync_to_async(get_items, thread_sensitive=thread_sensitive)()
+
     def get_pages_for_display(self):
         """Returns a queryset of all pages needed to render the menu."""
 
@@ -961,11 +1621,12 @@ class MenuWithMenuItems(ClusterableModel, Menu):
 
         # Start with an empty queryset, and expand as needed
         queryset = Page.objects.none()
+        section_root_depth = get_settings_snapshot().SECTION_ROOT_DEPTH
 
         for item in (item for item in menu_items if item.link_page):
             if(
                 item.allow_subnav and
-                item.link_page.depth >= settings.SECTION_ROOT_DEPTH
+                item.link_page.depth >= section_root_depth
             ):
                 # Add this branch to the overall `queryset`
                 queryset = queryset | Page.objects.filter(
@@ -980,7 +1641,25 @@ class MenuWithMenuItems(ClusterableModel, Menu):
         queryset = self.get_base_page_queryset() & queryset
 
         # Always return 'specific' page instances
-        return queryset.specific()
+        return self.get_specific_pages(queryset)
+
+    def get_cache_dependencies(self):
+        dependencies = super().get_cache_dependencies()
+        # All items are considered (rather than just those being displayed),
+        # because publishing a page could result in it being displayed
+        menu_items = getattr(self, '_raw_menu_items', None)
+        if menu_items is None:
+            menu_items = self.get_base_menuitem_queryset()
+        section_root_depth = get_settings_snapshot().SECTION_ROOT_DEPTH
+        for item in (item for item in menu_items if item.link_page):
+            if(
+                item.allow_subnav and
+                item.link_page.depth >= section_root_depth
+            ):
+                dependencies.update(get_tree_dependencies(item.link_page))
+            else:
+                dependencies.update(get_page_dependencies(item.link_page))
+        return dependencies
 
     def add_menu_items_for_pages(self, pagequeryset=None, allow_subnav=True):
         """Add menu items to this menu, linking to each page in `pagequeryset`
@@ -1004,6 +1683,39 @@ class MenuWithMenuItems(ClusterableModel, Menu):
     def get_raw_menu_items(self):
         return self.top_level_items
 
+    def get_lazy_sub_menu_url_kwargs(self, sub_menu):
+        return {'parent_page_id': sub_menu.parent_page.pk}
+
+    def get_lazy_sub_menu_url(self, sub_menu):
+        if not self.lazy_sub_menu_url_name:
+            return None
+        opt_vals = self._option_vals
+        options = {
+            'level': sub_menu._contextual_vals.current_level,
+            'max_levels': self.max_levels,
+            'allow_repeating_parents': opt_vals.allow_repeating_parents,
+            'use_absolute_page_urls': opt_vals.use_absolute_page_urls,
+            'client_side_active_classes': self.uses_client_side_active_classes(),
+            'template_name': sub_menu.get_template().template.name,
+            'sub_menu_template_name': opt_vals.sub_menu_template_name,
+            'sub_menu_template_names': opt_vals.sub_menu_template_names,
+            'template_engine': self.get_template_engine(),
+        }
+        try:
+            url = reverse(
+                self.lazy_sub_menu_url_name,
+                kwargs=self.get_lazy_sub_menu_url_kwargs(sub_menu)
+            )
+        except NoReverseMatch:
+            raise ImproperlyConfigured(
+                "Rendering with 'lazy_sub_menus=True' requires "
+                "'wagtailmenus.api.urls' to be included in your URL "
+                "configuration (with the namespace 'wagtailmenus_api')."
+            )
+        # Signing prevents arbitrary templates being requested
+        token = dumps_lazy_sub_menu_options(options)
+        return '%s?%s' % (url, urlencode({'options': token}))
+
     def get_context_data(self, **kwargs):
         data = {
             'max_levels': self.max_levels,
@@ -1024,6 +1736,7 @@ class AbstractMainMenu(DefinesSubMenuTemplatesMixin, MenuWithMenuItems):
     related_templatetag_name = 'main_menu'
     content_panels = panels.main_menu_content_panels
     menu_items_relation_setting_name = 'MAIN_MENU_ITEMS_RELATED_NAME'
+    lazy_sub_menu_url_name = 'wagtailmenus_api:main_menu_sub_menu'
 
     site = models.OneToOneField(
         'wagtailcore.Site',
@@ -1083,6 +1796,11 @@ class AbstractMainMenu(DefinesSubMenuTemplatesMixin, MenuWithMenuItems):
         instance, created = cls.objects.get_or_create(site=site)
         return instance
 
+    def get_cache_dependencies(self):
+        dependencies = super().get_cache_dependencies()
+        dependencies.add(get_main_menu_dependency(self.site_id))
+        return dependencies
+
     @classmethod
     def get_least_specific_template_name(cls):
         return settings.DEFAULT_MAIN_MENU_TEMPLATE
@@ -1100,6 +1818,7 @@ class AbstractFlatMenu(DefinesSubMenuTemplatesMixin, MenuWithMenuItems):
     base_form_class = forms.FlatMenuAdminForm
     content_panels = panels.flat_menu_content_panels
     menu_items_relation_setting_name = 'FLAT_MENU_ITEMS_RELATED_NAME'
+    lazy_sub_menu_url_name = 'wagtailmenus_api:flat_menu_sub_menu'
 
     site = models.ForeignKey(
         Site,
@@ -1207,6 +1926,23 @@ class AbstractFlatMenu(DefinesSubMenuTemplatesMixin, MenuWithMenuItems):
     def get_heading(self):
         return self.heading
 
+    def get_lazy_sub_menu_url_kwargs(self, sub_menu):
+        kwargs = super().get_lazy_sub_menu_url_kwargs(sub_menu)
+        kwargs['handle'] = self.handle
+        return kwargs
+
+    def as_dict(self):
+        data = super().as_dict()
+        data['handle'] = self.handle
+        if self._option_vals.extra['show_menu_heading']:
+            data['heading'] = self.get_heading()
+        return data
+
+    def get_cache_dependencies(self):
+        dependencies = super().get_cache_dependencies()
+        dependencies.add(get_flat_menu_dependency(self.handle))
+        return dependencies
+
     def get_context_data(self, **kwargs):
         data = {
             'menu_heading': self.get_heading(),
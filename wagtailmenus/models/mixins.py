@@ -65,13 +65,14 @@ class DefinesSubMenuTemplatesMixin:
             return self._sub_menu_template_cache[level]
 
         template_name = self._get_specified_sub_menu_template_name(level)
+        using = self.get_template_engine()
         if template_name:
             # A template was specified somehow
-            template = get_template(template_name)
+            template = get_template(template_name, using=using)
         else:
             # A template wasn't specified, so search the filesystem
             template = select_template(
-                self.get_sub_menu_template_names(level)
+                self.get_sub_menu_template_names(level), using=using
             )
 
         # Cache the template instance before returning
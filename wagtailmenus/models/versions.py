@@ -0,0 +1,31 @@
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+
+class MenuVersion(models.Model):
+    """
+    Stores the current 'menu version' number for a site (when ``handle`` is
+    blank), or for a flat menu handle on a site. Values are usually read from
+    the cache (see ``wagtailmenus.versioning``), so this model only serves as
+    a durable fallback.
+    """
+    site = models.ForeignKey(
+        'wagtailcore.Site',
+        verbose_name=_('site'),
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    handle = models.CharField(
+        verbose_name=_('handle'),
+        max_length=100,
+        blank=True,
+    )
+    version = models.BigIntegerField(verbose_name=_('version'))
+
+    class Meta:
+        unique_together = ('site', 'handle')
+        verbose_name = _('menu version')
+        verbose_name_plural = _('menu versions')
+
+    def __str__(self):
+        return '%s %s: %s' % (self.site_id, self.handle or '*', self.version)
@@ -0,0 +1,175 @@
+"""
+Counting of the database queries executed while menus are rendered by
+``Menu.render_from_tag()`` (including the queries for any sub menus), and
+enforcement of the limits set by the ``WAGTAILMENUS_QUERY_BUDGET`` setting.
+
+Queries are counted using database 'execute wrappers' (requires Django 2.0
+or later), which are only installed while a menu with a budget is being
+rendered, or while queries are being recorded by ``record_menu_queries()``,
+so rendering isn't slowed down otherwise. Where execute wrappers aren't
+available, budgets aren't checked, and a warning is issued instead.
+"""
+import logging
+import threading
+import warnings
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings as django_settings
+from django.db import connections
+
+from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
+from wagtailmenus.errors import QueryBudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def get_query_budget(menu_class):
+    """
+    Return the maximum number of queries that rendering a menu of type
+    ``menu_class`` should take (according to the ``QUERY_BUDGET`` setting),
+    or ``None`` if there is no limit.
+    """
+    budgets = get_settings_snapshot().QUERY_BUDGET
+    if budgets is None or isinstance(budgets, int):
+        return budgets
+    keys = ['%s.%s' % (menu_class.__module__, menu_class.__name__)]
+    if hasattr(menu_class, '_meta'):
+        keys.append(menu_class._meta.label)
+    keys.append(menu_class.related_templatetag_name)
+    for key in keys:
+        if key in budgets:
+            return budgets[key]
+    return None
+
+
+def get_menu_label(menu_class, handle=None):
+    """
+    Return a label for menus of type ``menu_class`` (the name of the tag
+    that renders them, followed by the handle for flat menus), for use in
+    log messages and recorded query counts.
+    """
+    label = menu_class.related_templatetag_name or menu_class.__name__
+    if handle:
+        label += ':%s' % handle
+    return label
+
+
+class QueryCounter:
+    """
+    Collects the SQL for queries executed while a single menu (with the
+    ``label`` and ``budget`` supplied) is rendered.
+    """
+
+    def __init__(self, label, budget):
+        self.label = label
+        self.budget = budget
+        self.queries = []
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def check(self):
+        """
+        Log a warning (with the SQL for each query) if more queries were
+        executed than the budget allows, or raise ``QueryBudgetExceeded`` if
+        ``QUERY_BUDGET_RAISE`` is ``True`` (or ``DEBUG`` is ``True``, unless
+        ``QUERY_BUDGET_RAISE`` is ``False``).
+        """
+        if self.budget is None or self.count <= self.budget:
+            return
+        message = '%s menu rendered using %s queries (budget: %s):\n%s' % (
+            self.label, self.count, self.budget, '\n'.join(self.queries)
+        )
+        should_raise = settings.QUERY_BUDGET_RAISE
+        if should_raise is None:
+            should_raise = django_settings.DEBUG
+        if should_raise:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def queries_can_be_counted():
+    """
+    Return ``True`` if the database connections support execute wrappers
+    (added in Django 2.0), which are needed to count queries.
+    """
+    return all(hasattr(connection, 'execute_wrapper') for connection in connections.all())
+
+
+def get_counters():
+    if not hasattr(_local, 'counters'):
+        _local.counters = []
+        _local.recorders = []
+    return _local.counters
+
+
+def record_query(execute, sql, params, many, context):
+    # A database execute wrapper, which adds the query to every counter (so
+    # queries for sub menus count towards the menus they belong to)
+    for counter in _local.counters:
+        counter.queries.append(sql)
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_menu_queries(menu_class, handle=None):
+    """
+    Count the queries executed within the block as the rendering of a menu
+    of type ``menu_class``, and check them against the menu's budget when
+    the block is exited. Used by ``Menu.render_from_tag()``.
+    """
+    budget = get_query_budget(menu_class)
+    counters = get_counters()
+    outermost = not counters
+    if budget is None and not (outermost and _local.recorders):
+        # Any queries are counted for the menu being rendered (if any)
+        yield
+        return
+    if not queries_can_be_counted():
+        if budget is not None:
+            warnings.warn(
+                "Queries for the %s menu can't be counted, because database "
+                "execute wrappers require Django 2.0 or later. The "
+                "WAGTAILMENUS_QUERY_BUDGET setting will be ignored."
+                % get_menu_label(menu_class, handle),
+                RuntimeWarning,
+            )
+        yield
+        return
+
+    counter = QueryCounter(get_menu_label(menu_class, handle), budget)
+    with ExitStack() as stack:
+        if outermost:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record_query))
+        counters.append(counter)
+        try:
+            yield
+        finally:
+            counters.pop()
+    if outermost:
+        for recorder in _local.recorders:
+            recorder[counter.label] += counter.count
+    counter.check()
+
+
+@contextmanager
+def record_menu_queries():
+    """
+    Yield a ``Counter`` of the number of queries used to render menus within
+    the block (in the current thread), by menu label (see
+    ``get_menu_label()``). Queries for sub menus are included in the counts
+    for the menus they belong to.
+    """
+    get_counters()
+    recorder = Counter()
+    _local.recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _local.recorders.remove(recorder)
@@ -0,0 +1,407 @@
+"""
+Pure-Python equivalents of the menu templates bundled with wagtailmenus.
+
+When ``WAGTAILMENUS_USE_FAST_RENDERER`` is ``True``, ``Menu.render_to_template()``
+checks whether the template it is about to render is one of the stock
+templates found in ``wagtailmenus/templates`` (i.e. the project hasn't
+overridden it). If so, the menu is rendered by one of the functions below
+instead of the Django template engine. Each function produces exactly the same
+output as the template it replaces (including whitespace), and values are
+escaped in the same way that Django's template engine would escape them.
+"""
+import os
+
+from django.core.signals import setting_changed
+from django.template import Context
+from django.template.backends.django import Template as DjangoTemplate
+from django.utils.formats import localize
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+STOCK_TEMPLATES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'templates'
+)
+
+
+# ########################################################
+# Helpers
+# ########################################################
+
+class _Missing:
+    pass
+
+
+MISSING = _Missing()
+
+
+def lookup(obj, attr):
+    """
+    Resolve ``attr`` against ``obj`` in the same order Django's template
+    engine would for ``{{ obj.attr }}`` (dictionary lookup first, then
+    attribute lookup), calling the result if it is callable. Returns
+    ``MISSING`` if the value cannot be resolved.
+    """
+    try:
+        value = obj[attr]
+    except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+        try:
+            value = getattr(obj, attr)
+        except (AttributeError, TypeError):
+            return MISSING
+    if callable(value):
+        if getattr(value, 'do_not_call_in_templates', False):
+            return value
+        if getattr(value, 'alters_data', False):
+            return MISSING
+        try:
+            value = value()
+        except TypeError:
+            return MISSING
+    return value
+
+
+def is_truthy(obj, attr):
+    value = lookup(obj, attr)
+    return value is not MISSING and bool(value)
+
+
+class RenderHelper:
+    """
+    Binds together the values needed to output values in the same way as the
+    Django template engine that would otherwise have been used for rendering.
+    """
+
+    def __init__(self, engine):
+        self.autoescape = engine.autoescape
+        self.string_if_invalid = engine.string_if_invalid
+
+    def output(self, value):
+        if value is MISSING:
+            value = self.string_if_invalid
+        value = localize(value)
+        if self.autoescape:
+            return conditional_escape(value)
+        return str(value)
+
+    def var(self, obj, attr):
+        return self.output(lookup(obj, attr))
+
+    def data_attrs(self, obj):
+        """Output ``{% if obj.data_attrs %}{{ obj.data_attrs }}{% endif %}``"""
+        value = lookup(obj, 'data_attrs')
+        if value is MISSING or not value:
+            return ''
+        return self.output(value)
+
+    def pk(self, obj, *attrs):
+        """Output ``{{ obj.attr1.attr2.pk }}``, for example."""
+        for attr in attrs + ('pk',):
+            obj = lookup(obj, attr)
+            if obj is MISSING:
+                break
+        return self.output(obj)
+
+    @staticmethod
+    def sub_menu(context, item, template=''):
+        # Imported here to avoid circular imports
+        from wagtailmenus.templatetags.menu_tags import sub_menu
+        return sub_menu(context, item, template=template)
+
+
+# ########################################################
+# Renderers
+# ########################################################
+
+def render_list_menu(helper, context, pass_current_template=False):
+    """
+    Renders 'menus/children_menu.html' or 'menus/sub_menu.html' (which only
+    differ in how they use the ``sub_menu`` tag).
+    """
+    menu_items = lookup(context, 'menu_items')
+    parts = ['\n']
+    if menu_items is not MISSING and menu_items:
+        sub_menu_template = context.get('current_template', '') if pass_current_template else ''
+        parts.append('\n\t<ul>\n\t')
+        for item in menu_items:
+            parts.extend((
+                '\n\t    <li class="', helper.var(item, 'active_class'), '"',
+                helper.data_attrs(item), '>\n\t        <a href="',
+                helper.var(item, 'href'), '">',
+                helper.var(item, 'text'), '</a>\n\t        ',
+            ))
+            if is_truthy(item, 'has_children_in_menu'):
+                parts.extend((
+                    '\n\t        \t',
+                    helper.sub_menu(context, item, sub_menu_template),
+                    '\n\t        ',
+                ))
+            parts.append('\n\t    </li>\n\t')
+        parts.append('\n\t</ul>\n')
+    parts.append('\n')
+    return parts
+
+
+def render_children_menu(helper, context):
+    return render_list_menu(helper, context)
+
+
+def render_sub_menu(helper, context):
+    return render_list_menu(helper, context, pass_current_template=True)
+
+
+def render_flat_menu(helper, context):
+    menu_heading = lookup(context, 'menu_heading')
+    has_heading = menu_heading is not MISSING and bool(menu_heading)
+    parts = [
+        '\n<div class="flat-menu ', helper.var(context, 'menu_handle'), ' ',
+        'with_heading' if has_heading else 'no_heading', '">\n    ',
+    ]
+    if has_heading:
+        # {{ menu_heading|safe }}
+        parts.extend(('<h4>', mark_safe(str(menu_heading)), '</h4>'))
+    parts.append('\n    ')
+    if is_truthy(context, 'menu_items'):
+        parts.append('\n    <ul>\n        ')
+        for item in context['menu_items']:
+            parts.extend((
+                '\n        <li class="', helper.var(item, 'active_class'), '"',
+                helper.data_attrs(item), '>\n            <a href="',
+                helper.var(item, 'href'), '">',
+                helper.var(item, 'text'), '</a>\n            ',
+            ))
+            if is_truthy(item, 'has_children_in_menu'):
+                parts.append(helper.sub_menu(context, item))
+            parts.append('\n        </li>\n        ')
+        parts.append('\n    </ul>\n    ')
+    parts.append('\n</div>\n')
+    return parts
+
+
+def render_section_menu(helper, context):
+    parts = ['\n']
+    if is_truthy(context, 'menu_items'):
+        parts.append('\n<nav class="nav-section" role="navigation">\n    ')
+        if is_truthy(context, 'show_section_root') and is_truthy(context, 'section_root'):
+            section_root = context['section_root']
+            parts.extend((
+                '\n        <a href="', helper.var(section_root, 'href'),
+                '" class="', helper.var(section_root, 'active_class'),
+                ' section_root"', helper.data_attrs(section_root), '>',
+                helper.var(section_root, 'text'),
+                '</a>\n    ',
+            ))
+        parts.append('\n    <ul>\n        ')
+        for item in context['menu_items']:
+            parts.extend((
+                '\n        <li class="', helper.var(item, 'active_class'), '"',
+                helper.data_attrs(item), '>\n            <a href="',
+                helper.var(item, 'href'), '">',
+                helper.var(item, 'text'), '</a>\n            ',
+            ))
+            if is_truthy(item, 'has_children_in_menu'):
+                parts.extend((
+                    '\n                 ', helper.sub_menu(context, item),
+                    '\n            ',
+                ))
+            parts.append('\n        </li>\n        ')
+        parts.append('\n    </ul>\n</nav>\n')
+    parts.append('\n')
+    return parts
+
+
+DROPDOWN_TOGGLE_ATTRS = (
+    ' class="dropdown-toggle" id="ddtoggle_%s" data-toggle="dropdown" '
+    'aria-haspopup="true" aria-expanded="false"'
+)
+
+HOVER_DROPDOWN_TOGGLE_ATTRS = (
+    ' class="dropdown-toggle" id="ddtoggle_%s" data-toggle="dropdown" '
+    'data-hover="dropdown" data-delay="{delay}" data-close-others="{close}" '
+    'aria-haspopup="true" aria-expanded="false"'
+)
+
+CARET = ' <span class="caret"></span>'
+
+
+def render_bootstrap3_main_menu(helper, context, hover=False):
+    if hover:
+        toggle_attrs = HOVER_DROPDOWN_TOGGLE_ATTRS.format(delay=200, close='true')
+        sub_menu_template = 'menus/bootstrap3/sub_menu_dropdown_hover.html'
+        sub_menu_indent = '\n            '
+    else:
+        toggle_attrs = DROPDOWN_TOGGLE_ATTRS
+        sub_menu_template = 'menus/bootstrap3/sub_menu_dropdown.html'
+        sub_menu_indent = '\n        \t'
+
+    parts = ['\n<ul class="nav navbar-nav">\n']
+    menu_items = lookup(context, 'menu_items')
+    for item in (menu_items if menu_items not in (MISSING, None) else ()):
+        has_children = is_truthy(item, 'has_children_in_menu')
+        parts.extend((
+            '\n    <li class="', helper.var(item, 'active_class'),
+            ' dropdown"' if has_children else '"', helper.data_attrs(item),
+            '>\n        <a href="', helper.var(item, 'href'), '"',
+        ))
+        if has_children:
+            parts.append(toggle_attrs % helper.pk(item, 'link_page'))
+        parts.extend(('>', helper.var(item, 'text')))
+        if has_children and not hover:
+            parts.append(CARET)
+        parts.append('</a>\n        ')
+        if has_children:
+            parts.extend((
+                sub_menu_indent,
+                helper.sub_menu(context, item, sub_menu_template),
+                '\n        ',
+            ))
+        parts.append('\n    </li>       \n')
+    parts.append('\n</ul>\n')
+    return parts
+
+
+def render_bootstrap3_main_menu_hover(helper, context):
+    return render_bootstrap3_main_menu(helper, context, hover=True)
+
+
+def render_bootstrap3_sub_menu(helper, context, hover=False):
+    if hover:
+        toggle_attrs = HOVER_DROPDOWN_TOGGLE_ATTRS.format(delay=400, close='false')
+    else:
+        toggle_attrs = DROPDOWN_TOGGLE_ATTRS
+
+    parts = ['\n']
+    if is_truthy(context, 'menu_items'):
+        parts.extend((
+            '\n\t<ul class="dropdown-menu" aria-labelledby="ddtoggle_',
+            helper.pk(context, 'parent_page'), '">\n\t',
+        ))
+        for item in context['menu_items']:
+            has_children = is_truthy(item, 'has_children_in_menu')
+            parts.extend((
+                '\n\t    <li class="', helper.var(item, 'active_class'),
+                ' dropdown"' if has_children else '"', helper.data_attrs(item),
+                '>\n\t        <a href="', helper.var(item, 'href'), '"',
+            ))
+            if has_children:
+                parts.append(toggle_attrs % helper.pk(item))
+            parts.extend(('>', helper.var(item, 'text')))
+            if has_children and not hover:
+                parts.append(CARET)
+            parts.append('</a>\n\t        ')
+            if has_children:
+                parts.extend((
+                    '\n\t            ',
+                    helper.sub_menu(context, item, context.get('current_template', '')),
+                    '\n\t        ',
+                ))
+            parts.append('\n\t    </li>\n\t')
+        parts.append('\n\t</ul>\n')
+    parts.append('\n')
+    return parts
+
+
+def render_bootstrap3_sub_menu_hover(helper, context):
+    return render_bootstrap3_sub_menu(helper, context, hover=True)
+
+
+# Maps the name of each bundled template to a function that can render it,
+# and any other templates that must also be 'stock' for the output to match
+# (e.g. because the template extends them)
+FAST_RENDERERS = {
+    'menus/children_menu.html': (render_children_menu, ()),
+    'menus/flat_menu.html': (render_flat_menu, ()),
+    'menus/main_menu.html': (
+        render_bootstrap3_main_menu,
+        ('menus/bootstrap3/main_menu_dropdown.html',)
+    ),
+    'menus/section_menu.html': (render_section_menu, ()),
+    'menus/sub_menu.html': (render_sub_menu, ()),
+    'menus/bootstrap3/main_menu_dropdown.html': (
+        render_bootstrap3_main_menu, ()
+    ),
+    'menus/bootstrap3/main_menu_dropdown_hover.html': (
+        render_bootstrap3_main_menu_hover, ()
+    ),
+    'menus/bootstrap3/sub_menu_dropdown.html': (
+        render_bootstrap3_sub_menu, ()
+    ),
+    'menus/bootstrap3/sub_menu_dropdown_hover.html': (
+        render_bootstrap3_sub_menu_hover, ()
+    ),
+}
+
+
+def is_stock_template(template):
+    """
+    Return a boolean indicating whether the supplied ``django.template.Template``
+    was loaded from wagtailmenus' own 'templates' directory.
+    """
+    origin = getattr(template, 'origin', None)
+    if origin is None or not origin.template_name:
+        return False
+    return origin.name == os.path.join(STOCK_TEMPLATES_DIR, origin.template_name)
+
+
+# Whether each template (by engine and name) is a stock template, so that
+# templates that fast renderers depend on aren't loaded again for every render
+# (which, without the cached template loader, means reading and parsing them)
+_stock_template_names = {}
+
+
+def is_stock_template_name(engine, template_name):
+    """
+    Return a boolean indicating whether the template that ``engine`` loads for
+    ``template_name`` is a stock wagtailmenus template. The result is cached
+    until settings are changed.
+    """
+    key = (engine, template_name)
+    try:
+        return _stock_template_names[key]
+    except KeyError:
+        pass
+    result = _stock_template_names[key] = is_stock_template(
+        engine.get_template(template_name)
+    )
+    return result
+
+
+def reset_stock_template_names(**kwargs):
+    _stock_template_names.clear()
+
+
+setting_changed.connect(
+    reset_stock_template_names,
+    dispatch_uid='wagtailmenus_reset_stock_template_names'
+)
+
+
+def get_fast_renderer(template):
+    """
+    Return a function capable of rendering the supplied template (as returned
+    by ``Menu.get_template()``) without using the template engine, or ``None``
+    if the template is not a stock wagtailmenus template.
+    """
+    if not isinstance(template, DjangoTemplate):
+        return None
+    django_template = template.template
+    if not is_stock_template(django_template):
+        return None
+    try:
+        render_func, dependencies = FAST_RENDERERS[django_template.origin.template_name]
+    except KeyError:
+        return None
+    engine = django_template.engine
+    for template_name in dependencies:
+        if not is_stock_template_name(engine, template_name):
+            return None
+    return render_func
+
+
+def render_fast(render_func, template, context_data):
+    """
+    Render ``context_data`` using ``render_func`` (as returned by
+    ``get_fast_renderer()``) and return a 'safe' string.
+    """
+    engine = template.template.engine
+    context = Context(context_data, autoescape=engine.autoescape)
+    return mark_safe(''.join(render_func(RenderHelper(engine), context)))
@@ -14,6 +14,22 @@ INSTALLED_APPS += (
     'wagtailmenus.tests',
 )
 
+TEMPLATES += [
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'extensions': [
+                'wagtail.core.jinja2tags.core',
+                'wagtailmenus.jinja2tags.menus',
+            ],
+            'context_processors': [
+                'wagtailmenus.context_processors.wagtailmenus',
+            ],
+        },
+    },
+]
+
 ROOT_URLCONF = 'wagtailmenus.tests.urls'
 WAGTAIL_SITE_NAME = 'Wagtailmenus Test'
 LOGIN_URL = 'wagtailadmin_login'
@@ -0,0 +1,101 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+from wagtail.core.models import Page, Site
+from wagtail.core.signals import page_published, page_unpublished
+
+from wagtailmenus.cache import get_flat_menu_dependency, get_main_menu_dependency
+from wagtailmenus.invalidation import collect_changes
+
+try:
+    from wagtail.core.signals import post_page_move, pre_page_move
+except ImportError:  # Wagtail < 2.10
+    post_page_move = pre_page_move = None
+
+
+def bump_versions_for_menu(menu):
+    from wagtailmenus.models import AbstractFlatMenu
+    if not isinstance(menu, AbstractFlatMenu):
+        with collect_changes() as batch:
+            batch.add_menu_change(
+                [(menu.site_id, '')], [get_main_menu_dependency(menu.site_id)]
+            )
+        return
+    keys = [(menu.site_id, ''), (menu.site_id, menu.handle)]
+    if menu.site.is_default_site:
+        # Other sites can fall back to using the default site's flat menus
+        for site_id in Site.objects.values_list('pk', flat=True):
+            keys.extend([(site_id, ''), (site_id, menu.handle)])
+    with collect_changes() as batch:
+        batch.add_menu_change(keys, [get_flat_menu_dependency(menu.handle)])
+
+
+def bump_versions_for_page(page):
+    # The sites (and cached menus) affected are worked out when the change is
+    # applied, which may be after several other pages have been changed
+    with collect_changes() as batch:
+        batch.add_page(page)
+
+
+# ########################################################
+# Signal handlers
+# ########################################################
+
+def handle_menu_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        # Ignore fixture loading
+        return
+    bump_versions_for_menu(instance)
+
+
+def handle_menu_item_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        menu = instance.menu
+    except instance._meta.get_field('menu').related_model.DoesNotExist:
+        # The menu itself is being deleted
+        return
+    bump_versions_for_menu(menu)
+
+
+def handle_page_change(sender, instance, **kwargs):
+    bump_versions_for_page(instance)
+
+
+def handle_page_deletion(sender, instance, **kwargs):
+    # Deleting a page that isn't live has no effect on menus
+    if instance.live:
+        bump_versions_for_page(instance)
+
+
+def handle_page_move(sender, instance, **kwargs):
+    # This is called before AND after moves, so that versions are bumped for
+    # the sites a page is moved from and to
+    if instance.live:
+        bump_versions_for_page(instance)
+
+
+def register_signal_handlers():
+    from wagtailmenus.models import (
+        AbstractFlatMenu, AbstractFlatMenuItem, AbstractMainMenu, AbstractMainMenuItem
+    )
+    # Handlers are connected to each concrete menu (and menu item) model,
+    # rather than to every model, so that saving other objects is unaffected
+    for model in apps.get_models():
+        if issubclass(model, (AbstractMainMenu, AbstractFlatMenu)):
+            handler = handle_menu_change
+        elif issubclass(model, (AbstractMainMenuItem, AbstractFlatMenuItem)):
+            handler = handle_menu_item_change
+        else:
+            continue
+        for signal in (post_save, post_delete):
+            signal.connect(handler, sender=model, dispatch_uid='%s_%s' % (
+                handler.__name__, model._meta.label_lower
+            ))
+    page_published.connect(handle_page_change, dispatch_uid='wagtailmenus_handle_page_publish')
+    page_unpublished.connect(handle_page_change, dispatch_uid='wagtailmenus_handle_page_unpublish')
+    # Only connected to 'Page', so that this only runs once per deletion
+    post_delete.connect(handle_page_deletion, sender=Page, dispatch_uid='wagtailmenus_handle_page_deletion')
+    if post_page_move is not None:
+        pre_page_move.connect(handle_page_move, dispatch_uid='wagtailmenus_handle_page_move_from')
+        post_page_move.connect(handle_page_move, dispatch_uid='wagtailmenus_handle_page_move_to')
@@ -0,0 +1,410 @@
+"""
+When a site is served by several worker processes, each would normally have
+to prepare its own copy of the same menus. Menu 'snapshots' allow that work to
+be done once per server instead: the main menu and flat menus for a site are
+'compiled' (using the same dictionary representation as the JSON API) and
+written to a single file in the ``WAGTAILMENUS_SNAPSHOT_DIR`` directory, which
+every worker then memory-maps and reads from. The operating system shares
+the mapped pages between processes, so memory use stays the same however
+many workers there are.
+
+Each snapshot records the site's menu version (see
+``wagtailmenus.versioning``) at the time it was compiled, along with the
+version of each menu in it (used for the ETags of API responses served from
+the snapshot). Workers check the
+current version at most once every ``WAGTAILMENUS_SNAPSHOT_CHECK_INTERVAL``
+seconds, and when it has changed, the first worker to notice rebuilds the
+file (while holding a lock, so that other workers on the same server don't
+repeat the work) and swaps it into place with an atomic rename. Other workers
+continue to read the previous file until the new one is ready.
+
+Snapshot file layout::
+
+    header (magic, format version, menu version, index length)
+    index (JSON object mapping menu keys to [offset, length, version] lists)
+    menu data (one packed menu per menu, see wagtailmenus.utils.packing)
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # File locking isn't available on Windows, where snapshots may
+    # occasionally be rebuilt by more than one process at the same time
+    fcntl = None
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpRequest
+from wagtail.core.models import Site
+
+from wagtailmenus.conf import settings
+from wagtailmenus.utils.packing import pack_menu, unpack_menu
+from wagtailmenus.versioning import get_flat_menu_version, get_site_version
+
+MAGIC = b'WMSNAP'
+FORMAT_VERSION = 3
+HEADER = struct.Struct('<6sHqI')
+
+MAIN_MENU_KEY = 'main'
+FLAT_MENU_KEY = 'flat:%s'
+
+
+def snapshots_enabled():
+    return bool(settings.SNAPSHOT_DIR)
+
+
+def get_snapshot_path(site_id):
+    return os.path.join(settings.SNAPSHOT_DIR, 'site-%s.menus' % site_id)
+
+
+def get_flat_menu_key(handle):
+    return FLAT_MENU_KEY % handle
+
+
+def get_menu_context(site):
+    """
+    Return a dictionary that can stand in for the template context usually
+    supplied to ``render_from_tag()``, for rendering menus for ``site``
+    without a 'current page', for an anonymous visitor.
+    """
+    request = HttpRequest()
+    request.site = site
+    request.user = AnonymousUser()
+    # Used by Wagtail's Site.find_for_request() when generating page URLs
+    request._wagtail_site = site
+    return {
+        'request': request,
+        'wagtailmenus_vals': {
+            'current_page': None,
+            'section_root': None,
+            'current_page_ancestor_ids': (),
+        },
+    }
+
+
+def get_flat_menu_handles(site):
+    site_ids = [site.pk]
+    if settings.FLAT_MENUS_FALL_BACK_TO_DEFAULT_SITE_MENUS:
+        site_ids.extend(
+            Site.objects.filter(is_default_site=True).values_list('pk', flat=True)
+        )
+    return sorted(set(
+        settings.models.FLAT_MENU_MODEL.objects.filter(
+            site_id__in=site_ids
+        ).values_list('handle', flat=True)
+    ))
+
+
+def prepare_menu(menu_class, site, context=None, **option_values):
+    """
+    Return a menu of type ``menu_class`` for ``site``, prepared for
+    rendering without any active classes applied, or ``None`` if no such
+    menu exists. ``context`` can be used to supply a context other than the
+    one returned by ``get_menu_context()``.
+    """
+    option_values.setdefault('max_levels', None)
+    option_values.update(
+        apply_active_classes=False,
+        allow_repeating_parents=True,
+        use_absolute_page_urls=False,
+        add_sub_menus_inline=False,
+    )
+    if context is None:
+        context = get_menu_context(site)
+    return menu_class._get_render_prepared_object(context, **option_values)
+
+
+def compile_menu(menu_class, site, context=None, **option_values):
+    """
+    Return a dictionary representation of a menu of type ``menu_class`` for
+    ``site`` (as returned by ``as_dict()``), without any active classes
+    applied, or ``None`` if no such menu exists (see ``prepare_menu()``).
+    """
+    menu = prepare_menu(menu_class, site, context, **option_values)
+    if menu is None:
+        return None
+    return menu.as_dict()
+
+
+def compile_site_menus(site):
+    """
+    Return a dictionary of compiled menus for ``site``, keyed by 'menu key'
+    (``MAIN_MENU_KEY`` for the main menu, or ``FLAT_MENU_KEY`` with the
+    relevant handle for flat menus).
+    """
+    menus = {MAIN_MENU_KEY: compile_menu(settings.models.MAIN_MENU_MODEL, site)}
+    for handle in get_flat_menu_handles(site):
+        data = compile_menu(
+            settings.models.FLAT_MENU_MODEL,
+            site,
+            handle=handle,
+            show_menu_heading=True,
+            fall_back_to_default_site_menus=settings.FLAT_MENUS_FALL_BACK_TO_DEFAULT_SITE_MENUS,
+        )
+        if data is not None:
+            menus[get_flat_menu_key(handle)] = data
+    return menus
+
+
+def get_site_menu_versions(site):
+    """
+    Return a dictionary of current version numbers for the menus included
+    in snapshots for ``site``, keyed by 'menu key'.
+    """
+    versions = {MAIN_MENU_KEY: get_site_version(site)}
+    for handle in get_flat_menu_handles(site):
+        versions[get_flat_menu_key(handle)] = get_flat_menu_version(site, handle)
+    return versions
+
+
+def encode_snapshot(version, menus, menu_versions=None):
+    """
+    Return the contents of a snapshot file for the supplied menu ``version``
+    and dictionary of compiled ``menus``, as bytes. ``menu_versions`` can be
+    used to supply version numbers for individual menus (by menu key), which
+    otherwise default to ``version``.
+    """
+    menu_versions = menu_versions or {}
+    index = {}
+    chunks = []
+    offset = 0
+    for key, data in menus.items():
+        chunk = pack_menu(data)
+        index[key] = [offset, len(chunk), menu_versions.get(key, version)]
+        chunks.append(chunk)
+        offset += len(chunk)
+    index = json.dumps(index, separators=(',', ':')).encode()
+    return b''.join([
+        HEADER.pack(MAGIC, FORMAT_VERSION, version, len(index)), index
+    ] + chunks)
+
+
+def write_site_snapshot(site):
+    """
+    Compile menus for ``site`` and write them to the site's snapshot file,
+    replacing any existing file atomically (so that processes reading it
+    never see a partially written file). Returns the new file's path.
+    """
+    # Versions are read before menus are compiled, so that changes made in
+    # the meantime are picked up by the next rebuild
+    menu_versions = get_site_menu_versions(site)
+    contents = encode_snapshot(
+        menu_versions[MAIN_MENU_KEY], compile_site_menus(site), menu_versions
+    )
+    path = get_snapshot_path(site.pk)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contents)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return path
+
+
+def read_snapshot_version(path):
+    """
+    Return the menu version recorded in the snapshot file at ``path``, or
+    ``None`` if the file is missing or incompatible.
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except FileNotFoundError:
+        return None
+    if len(header) < HEADER.size:
+        return None
+    magic, format_version, version, index_length = HEADER.unpack(header)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        return None
+    return version
+
+
+def rebuild_site_snapshot(site, version):
+    """
+    Rebuild the snapshot file for ``site`` if it predates ``version``. Returns
+    ``True`` if the file was rebuilt, or ``False`` if it was already up to
+    date, or another process on the same server is currently rebuilding it.
+    """
+    path = get_snapshot_path(site.pk)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'wb') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+        # Another process may have rebuilt the file since it was last checked
+        current_version = read_snapshot_version(path)
+        if current_version is not None and current_version >= version:
+            return False
+        write_site_snapshot(site)
+        return True
+
+
+def get_file_id(stat_result):
+    return (stat_result.st_dev, stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+
+class MappedSnapshot:
+    """
+    A read-only, memory-mapped snapshot file. Only the index is decoded
+    up-front; data for individual menus is decoded the first time it is
+    requested, and kept for as long as the snapshot is in use (snapshot
+    files are never modified in place, so each ``MappedSnapshot`` is only
+    ever used for a single version of a file).
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.file_id = get_file_id(os.fstat(f.fileno()))
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, self.version, index_length = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError("'%s' is not a compatible menu snapshot." % path)
+        index_start = HEADER.size
+        self.data_start = index_start + index_length
+        self.index = json.loads(self.buffer[index_start:self.data_start].decode())
+        self.menus = {}
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, key):
+        """
+        Return the compiled menu data for ``key``, or ``None`` if the
+        snapshot doesn't include a menu with that key. The same data is
+        returned every time, so mustn't be modified.
+        """
+        if key not in self.index:
+            return None
+        data = self.menus.get(key)
+        if data is None:
+            offset = self.index[key][0]
+            data = self.menus[key] = unpack_menu(self.buffer, self.data_start + offset)
+        return data
+
+    def get_version(self, key):
+        """
+        Return the version number of the menu for ``key`` at the time the
+        snapshot was compiled, or ``None`` if the snapshot doesn't include a
+        menu with that key.
+        """
+        if key not in self.index:
+            return None
+        return self.index[key][2]
+
+
+class SnapshotReader:
+    """
+    Keeps track of the most recent snapshot for each site within a single
+    process, checking for newer versions (and rebuilding snapshots where
+    necessary) at most once every ``WAGTAILMENUS_SNAPSHOT_CHECK_INTERVAL``
+    seconds.
+
+    Only one thread in the process checks (or rebuilds) the snapshot for a
+    site at any one time. The lock is only held while that is decided, so
+    other threads continue to use the previous snapshot in the meantime
+    (rather than waiting for it to be rebuilt).
+    """
+
+    def __init__(self):
+        self.snapshots = {}
+        self.last_checked = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.snapshots = {}
+            self.last_checked = {}
+            self.refreshing = set()
+
+    def get_menu_data(self, site, key):
+        """
+        Return a tuple of compiled menu data matching ``key`` for ``site``
+        and the menu's version number at the time it was compiled (which may
+        be older than the current version, while a newer snapshot is being
+        built), or ``(None, None)`` if no snapshot (or no matching menu) is
+        available.
+        """
+        snapshot = self.get_snapshot(site)
+        if snapshot is None or key not in snapshot:
+            return None, None
+        return snapshot.get(key), snapshot.get_version(key)
+
+    def get_snapshot(self, site):
+        snapshot = self.snapshots.get(site.pk)
+        now = time.monotonic()
+        if (
+            snapshot is not None and
+            now - self.last_checked[site.pk] < settings.SNAPSHOT_CHECK_INTERVAL
+        ):
+            return snapshot
+        with self.lock:
+            if site.pk in self.refreshing:
+                # Another thread is already checking the snapshot
+                return self.snapshots.get(site.pk)
+            self.refreshing.add(site.pk)
+            snapshot = self.snapshots.get(site.pk)
+        try:
+            snapshot = self.refresh(site, snapshot)
+        finally:
+            with self.lock:
+                self.refreshing.discard(site.pk)
+                if snapshot is not None:
+                    self.snapshots[site.pk] = snapshot
+                    self.last_checked[site.pk] = now
+        return snapshot
+
+    def refresh(self, site, snapshot):
+        version = get_site_version(site)
+        if snapshot is not None and snapshot.version >= version:
+            return snapshot
+        # Another process may have rebuilt the file already
+        snapshot = self.remap(site, snapshot)
+        if snapshot is None or snapshot.version < version:
+            if rebuild_site_snapshot(site, version):
+                snapshot = self.remap(site, snapshot)
+        # If another process is still rebuilding the file, the previous
+        # snapshot (if there is one) continues to be used in the meantime
+        return snapshot
+
+    def remap(self, site, snapshot):
+        path = get_snapshot_path(site.pk)
+        try:
+            file_id = get_file_id(os.stat(path))
+        except FileNotFoundError:
+            return snapshot
+        if snapshot is not None and snapshot.file_id == file_id:
+            return snapshot
+        try:
+            return MappedSnapshot(path)
+        except (OSError, ValueError, struct.error):
+            return snapshot
+
+
+reader = SnapshotReader()
+
+
+def get_snapshot_menu_data(site, key):
+    """
+    Return a tuple of compiled menu data matching ``key`` for ``site`` from
+    the site's snapshot file (building it first if necessary) and the
+    version number it was compiled for, or ``(None, None)`` if snapshots are
+    disabled, or the menu isn't available.
+    """
+    if not snapshots_enabled():
+        return None, None
+    return reader.get_menu_data(site, key)
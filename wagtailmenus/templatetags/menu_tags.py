@@ -1,12 +1,24 @@
+import json
+
 from django.template import Library
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
 from wagtail.core.models import Page
 
 from wagtailmenus.conf import constants, settings
 from wagtailmenus.errors import SubMenuUsageError
+from wagtailmenus.utils import loaders
 from wagtailmenus.utils.misc import validate_supplied_values
 
 register = Library()
 
+# Escape characters that could otherwise end the <script> element early
+JSON_SCRIPT_ESCAPES = {
+    ord('>'): '\\u003E',
+    ord('<'): '\\u003C',
+    ord('&'): '\\u0026',
+}
+
 
 def split_if_string(val, separator=','):
     if isinstance(val, str):
@@ -114,13 +126,14 @@ def children_menu(
     apply_active_classes=False,
     max_levels=settings.DEFAULT_CHILDREN_MENU_MAX_LEVELS,
     template='', sub_menu_template='', sub_menu_templates=None,
-    use_absolute_page_urls=False, add_sub_menus_inline=None,
-    **kwargs
+    use_absolute_page_urls=False, add_sub_menus_inline=None, limit=None,
+    order_by=None, page_types=None, show_more_item=False, **kwargs
 ):
     validate_supplied_values(
         'children_menu',
         max_levels=max_levels,
         parent_page=parent_page,
+        limit=limit,
     )
 
     menu_class = settings.objects.CHILDREN_MENU_CLASS
@@ -135,10 +148,28 @@ def children_menu(
         template_name=template,
         sub_menu_template_name=sub_menu_template,
         sub_menu_template_names=split_if_string(sub_menu_templates),
+        limit=limit,
+        order_by=split_if_string(order_by),
+        page_types=split_if_string(page_types),
+        show_more_item=show_more_item,
         **kwargs
     )
 
 
+@register.simple_tag(takes_context=True)
+def queue_children_menus(
+    context, pages, max_levels=settings.DEFAULT_CHILDREN_MENU_MAX_LEVELS
+):
+    """
+    Queue ``pages`` to have their children fetched together (in as few
+    queries as possible) the first time a ``{% children_menu %}`` is rendered
+    for any of them. Outputs nothing.
+    """
+    validate_supplied_values('queue_children_menus', max_levels=max_levels)
+    loaders.queue_children_menus(context.get('request'), pages, max_levels)
+    return ''
+
+
 @register.simple_tag(takes_context=True)
 def sub_menu(
     context, menuitem_or_page, allow_repeating_parents=None,
@@ -188,3 +219,31 @@ def sub_menu(
         template_name=template,
         **kwargs
     )
+
+
+@register.simple_tag(takes_context=True)
+def menu_active_state(context, template='', template_engine=None):
+    """
+    Render a small JSON object describing the current page's position in the
+    page tree, along with a script that uses it to apply active classes to
+    menus rendered with ``client_side_active_classes=True``.
+    """
+    request = context.get('request')
+    vals = context.get('wagtailmenus_vals') or {}
+    current_page = vals.get('current_page')
+    data = {
+        'page': current_page.pk if current_page else None,
+        'ancestors': list(vals.get('current_page_ancestor_ids', ())),
+        'path': request.path if request else '',
+        'activeClass': settings.ACTIVE_CLASS,
+        'ancestorClass': settings.ACTIVE_ANCESTOR_CLASS,
+    }
+    active_state_json = json.dumps(data, separators=(',', ':'))
+    template = get_template(
+        template or 'menus/active_state.html', using=template_engine
+    )
+    return template.render({
+        'active_state_json': mark_safe(
+            active_state_json.translate(JSON_SCRIPT_ESCAPES)
+        ),
+    })
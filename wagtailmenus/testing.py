@@ -0,0 +1,94 @@
+"""
+Helpers for projects' test suites.
+"""
+import json
+import os
+import sys
+import warnings
+from contextlib import contextmanager
+
+from wagtailmenus.query_budgets import queries_can_be_counted, record_menu_queries
+
+UPDATE_QUERY_COUNTS_ENV_VAR = 'WAGTAILMENUS_UPDATE_QUERY_COUNTS'
+
+
+class MenuQueryCountsMixin:
+    """
+    A mixin for ``TestCase`` classes, which adds an
+    ``assertMenuQueryCounts()`` method for comparing the number of queries
+    used to render each menu with those recorded in a JSON 'snapshot' file,
+    so that changes that add queries to menus (e.g. to menu templates) cause
+    tests to fail. For example:
+
+    .. code-block:: python
+
+        class TestHomePage(MenuQueryCountsMixin, TestCase):
+
+            def test_menus(self):
+                with self.assertMenuQueryCounts('home'):
+                    self.client.get('/')
+
+    Counts are added to the file the first time each assertion is run (and
+    whenever the ``WAGTAILMENUS_UPDATE_QUERY_COUNTS`` environment variable
+    is set), and the file should be committed along with the tests. Where
+    queries can't be counted (before Django 2.0), a warning is issued, and
+    counts are neither compared nor written.
+    """
+    # Defaults to 'menu_query_counts.json' in the test module's directory
+    menu_query_counts_file = None
+
+    def get_menu_query_counts_file(self):
+        if self.menu_query_counts_file:
+            return self.menu_query_counts_file
+        module_dir = os.path.dirname(os.path.abspath(sys.modules[self.__module__].__file__))
+        return os.path.join(module_dir, 'menu_query_counts.json')
+
+    def read_menu_query_counts(self):
+        try:
+            with open(self.get_menu_query_counts_file()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def write_menu_query_counts(self, snapshot):
+        with open(self.get_menu_query_counts_file(), 'w') as f:
+            json.dump(snapshot, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    @contextmanager
+    def assertMenuQueryCounts(self, name):
+        """
+        Record the number of queries used to render each menu within the
+        block (by tag name, followed by the handle for flat menus), and fail
+        if they differ from those recorded for ``name`` (for this class).
+        """
+        key = '%s.%s' % (self.__class__.__name__, name)
+        with record_menu_queries() as recorder:
+            yield recorder
+        if not queries_can_be_counted():
+            warnings.warn(
+                "Menu query counts for '%s' weren't checked, because database "
+                "execute wrappers require Django 2.0 or later." % key,
+                RuntimeWarning,
+            )
+            return
+        counts = dict(recorder)
+        snapshot = self.read_menu_query_counts()
+        if key not in snapshot or os.environ.get(UPDATE_QUERY_COUNTS_ENV_VAR):
+            snapshot[key] = counts
+            self.write_menu_query_counts(snapshot)
+            return
+        expected = snapshot[key]
+        if counts != expected:
+            differences = [
+                '%s: %s queries (expected %s)' % (label, counts.get(label, 0), expected.get(label, 0))
+                for label in sorted(set(counts) | set(expected))
+                if counts.get(label, 0) != expected.get(label, 0)
+            ]
+            self.fail(
+                "Menu query counts for '%s' have changed:\n%s\nIf this is "
+                "expected, run the tests with %s=1 set to update %s." % (
+                    key, '\n'.join(differences), UPDATE_QUERY_COUNTS_ENV_VAR,
+                    self.get_menu_query_counts_file(),
+                )
+            )
@@ -0,0 +1,131 @@
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from wagtailmenus.models import FlatMenu, MainMenu
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+
+
+class TestMenuAPIViews(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def get_json(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return json.loads(response.content.decode())
+
+    def find_item(self, items, page_id):
+        for item in items:
+            if item['page_id'] == page_id:
+                return item
+            found = self.find_item(item.get('children', ()), page_id)
+            if found:
+                return found
+
+    def test_main_menu(self):
+        data = self.get_json('/menus-api/main/?page=7')
+        self.assertEqual(data['type'], 'main_menu')
+        about_us = self.find_item(data['items'], 6)
+        self.assertEqual(about_us['text'], 'About')
+        self.assertEqual(about_us['href'], '/about-us/')
+        self.assertEqual(about_us['active_class'], 'ancestor')
+        self.assertEqual(self.find_item(about_us['children'], 7)['active_class'], 'active')
+
+    def test_main_menu_max_levels(self):
+        data = self.get_json('/menus-api/main/?max_levels=1')
+        for item in data['items']:
+            self.assertNotIn('children', item)
+
+    def test_flat_menu(self):
+        data = self.get_json('/menus-api/flat/footer/')
+        self.assertEqual(data['type'], 'flat_menu')
+        self.assertEqual(data['handle'], 'footer')
+        self.assertEqual(data['heading'], 'Important links')
+        self.assertEqual(
+            [item['text'] for item in data['items']],
+            ['Accessibility', 'Privacy policy', 'Terms and conditions', "Meet the team's pets"]
+        )
+
+    def test_flat_menu_with_unknown_handle(self):
+        response = self.client.get('/menus-api/flat/does-not-exist/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_section_menu(self):
+        data = self.get_json('/menus-api/section/?page=7')
+        self.assertEqual(data['type'], 'section_menu')
+        self.assertEqual(data['section_root']['page_id'], 6)
+        self.assertEqual(data['section_root']['active_class'], 'ancestor')
+        self.assertEqual(self.find_item(data['items'], 7)['active_class'], 'active')
+
+    def test_children_menu(self):
+        data = self.get_json('/menus-api/children/?page=6&max_levels=2')
+        self.assertEqual(data['type'], 'children_menu')
+        self.assertEqual(
+            [item['page_id'] for item in self.find_item(data['items'], 7)['children']],
+            [31, 32, 33]
+        )
+
+    def test_invalid_values(self):
+        self.assertEqual(self.client.get('/menus-api/section/').status_code, 400)
+        self.assertEqual(self.client.get('/menus-api/section/?page=x').status_code, 400)
+        self.assertEqual(self.client.get('/menus-api/main/?max_levels=6').status_code, 400)
+        self.assertEqual(self.client.get('/menus-api/section/?page=999').status_code, 404)
+        response = self.client.get('/menus-api/main/?max_levels=6')
+        self.assertFalse(response.has_header('ETag'))
+
+    @override_settings(
+        WAGTAILMENUS_API_CACHE_MAX_AGE=10,
+        WAGTAILMENUS_API_CACHE_SHARED_MAX_AGE=600,
+    )
+    def test_cache_control(self):
+        response = self.client.get('/menus-api/main/')
+        cache_control = set(response['Cache-Control'].split(', '))
+        self.assertEqual(cache_control, {'public', 'max-age=10', 's-maxage=600'})
+
+    def test_conditional_requests_do_not_touch_the_page_tree(self):
+        etag = self.client.get('/menus-api/main/')['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/menus-api/main/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('s-maxage', response['Cache-Control'])
+        # Identifying the site is the only work done
+        for query in ctx.captured_queries:
+            self.assertIn('FROM "wagtailcore_site"', query['sql'])
+
+    def test_etag_changes_when_a_menu_changes(self):
+        etag = self.client.get('/menus-api/main/')['ETag']
+        menu = MainMenu.objects.get(site_id=1)
+        item = menu.get_menu_items_manager().first()
+        item.link_text = 'Changed'
+        item.save()
+        utils.run_on_commit_callbacks()
+
+        response = self.client.get('/menus-api/main/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        FlatMenu.objects.get(site_id=1, handle='footer').save()
+        utils.run_on_commit_callbacks()
+        self.assertNotEqual(self.client.get('/menus-api/main/')['ETag'], etag)
+
+    def test_etag_changes_when_a_page_is_published(self):
+        etag = self.client.get('/menus-api/main/')['ETag']
+        page = Page.objects.get(url_path='/home/about-us/')
+        page.title = 'About us (updated)'
+        page.save_revision().publish()
+        utils.run_on_commit_callbacks()
+
+        response = self.client.get('/menus-api/main/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
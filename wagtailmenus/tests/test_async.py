@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.template import Context
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.test.client import RequestFactory
+
+from wagtailmenus.models import ChildrenMenu, FlatMenu, MainMenu
+from wagtailmenus.tests import utils
+
+try:
+    from asgiref.sync import async_to_sync
+except ImportError:  # Django < 3.0
+    async_to_sync = None
+
+Page = utils.get_page_model()
+
+
+@skipIf(async_to_sync is None, 'asgiref is not installed')
+class TestAsyncRendering(TestCase):
+    fixtures = ['test.json']
+
+    def get_context(self, url='/about-us/'):
+        request = RequestFactory().get(url)
+        page = Page.objects.get(url_path='/home' + url).specific
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = page
+        return Context({'request': request})
+
+    def test_arender_from_tag_output_matches_render_from_tag(self):
+        context = self.get_context()
+        expected = MainMenu.render_from_tag(context, max_levels=3)
+        result = async_to_sync(MainMenu.arender_from_tag)(context, max_levels=3)
+        self.assertEqual(result, expected)
+
+    def test_arender_from_tag_passes_positional_args(self):
+        context = self.get_context()
+        expected = FlatMenu.render_from_tag(context, 'contact', max_levels=2, show_menu_heading=True)
+        result = async_to_sync(FlatMenu.arender_from_tag)(context, 'contact', max_levels=2, show_menu_heading=True)
+        self.assertEqual(result, expected)
+
+        parent_page = Page.objects.get(url_path='/home/about-us/')
+        expected = ChildrenMenu.render_from_tag(context, parent_page, max_levels=2)
+        result = async_to_sync(ChildrenMenu.arender_from_tag)(context, parent_page, max_levels=2)
+        self.assertEqual(result, expected)
+
+    def test_independent_menus_can_be_rendered_together(self):
+        context = self.get_context()
+
+        async def render_menus():
+            return await asyncio.gather(
+                MainMenu.arender_from_tag(context),
+                FlatMenu.arender_from_tag(context, 'footer', show_menu_heading=False),
+            )
+
+        main_menu_html, footer_menu_html = async_to_sync(render_menus)()
+        self.assertEqual(main_menu_html, MainMenu.render_from_tag(context))
+        self.assertEqual(footer_menu_html, FlatMenu.render_from_tag(context, 'footer', show_menu_heading=False))
+
+    def test_aget_top_level_items_caches_result(self):
+        menu = MainMenu.objects.get(pk=1)
+        menu._option_vals = utils.make_optionvals_instance()
+        items = async_to_sync(menu.aget_top_level_items)()
+        with self.assertNumQueries(0):
+            self.assertIs(menu.top_level_items, items)
+            menu.pages_for_display
+
+    def test_aget_pages_for_display_caches_result(self):
+        menu = MainMenu.objects.get(pk=1)
+        menu._option_vals = utils.make_optionvals_instance()
+        pages = async_to_sync(menu.aget_pages_for_display)()
+        with self.assertNumQueries(0):
+            self.assertEqual(pages, list(menu.pages_for_display.values()))
+        self.assertEqual(
+            set(p.id for p in pages),
+            set(p.id for p in menu.get_pages_for_display())
+        )
+
+
+@skipIf(async_to_sync is None, 'asgiref is not installed')
+class TestConcurrentAsyncRendering(TransactionTestCase):
+    # Menus are rendered using separate connections, which can't see data
+    # added within a TestCase's transaction
+    fixtures = ['test.json']
+    # Leave permissions and content types alone when the database is flushed
+    # afterwards, so that their ids don't change for later tests
+    available_apps = [
+        app for app in settings.INSTALLED_APPS
+        if app not in ('django.contrib.auth', 'django.contrib.contenttypes')
+    ]
+
+    def test_menus_rendered_in_separate_threads(self):
+        request = RequestFactory().get('/about-us/')
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(
+            url_path='/home/about-us/').specific
+        context = Context({'request': request})
+        closed_in_threads = []
+        close_all = connections.close_all
+
+        def record_close_all():
+            closed_in_threads.append(threading.get_ident())
+            close_all()
+
+        async def render_menus():
+            return await asyncio.gather(
+                MainMenu.arender_from_tag(context, thread_sensitive=False),
+                FlatMenu.arender_from_tag(
+                    context, 'footer', show_menu_heading=False, thread_sensitive=False
+                ),
+            )
+
+        with mock.patch.object(connections, 'close_all', record_close_all):
+            main_menu_html, footer_menu_html = async_to_sync(render_menus)()
+        self.assertEqual(main_menu_html, MainMenu.render_from_tag(context))
+        self.assertEqual(
+            footer_menu_html,
+            FlatMenu.render_from_tag(context, 'footer', show_menu_heading=False)
+        )
+        # Connections are closed in each of the worker threads
+        self.assertEqual(len(closed_in_threads), 2)
+        self.assertNotIn(threading.get_ident(), closed_in_threads)
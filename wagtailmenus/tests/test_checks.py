@@ -0,0 +1,48 @@
+from django.test import SimpleTestCase, override_settings
+from wagtail.core import hooks
+
+from wagtailmenus.checks import check_page_fields_for_menus
+from wagtailmenus.models import ChildrenMenu
+
+
+class TestCheckPageFieldsForMenus(SimpleTestCase):
+
+    def get_error_ids(self):
+        return [error.id for error in check_page_fields_for_menus(None)]
+
+    def test_no_errors_by_default(self):
+        self.assertEqual(self.get_error_ids(), [])
+
+    @override_settings(WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS=['title_de', 'publish_date'])
+    def test_valid_fields(self):
+        self.assertEqual(self.get_error_ids(), [])
+
+    @override_settings(WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS='title_de')
+    def test_invalid_setting_value(self):
+        self.assertEqual(self.get_error_ids(), ['wagtailmenus.E001'])
+
+    @override_settings(WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS=['not_a_field'])
+    def test_unknown_field(self):
+        self.assertEqual(self.get_error_ids(), ['wagtailmenus.E002'])
+
+    @override_settings(WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS=[])
+    def test_unknown_hook_field(self):
+        hooks.register('menus_page_fields', lambda: ['not_a_field'])
+        try:
+            self.assertEqual(self.get_error_ids(), ['wagtailmenus.E002'])
+        finally:
+            hooks._hooks.pop('menus_page_fields')
+
+    def test_unknown_menu_class_field(self):
+        ChildrenMenu.page_fields_for_display = ['not_a_field']
+        try:
+            self.assertEqual(self.get_error_ids(), ['wagtailmenus.E002'])
+        finally:
+            ChildrenMenu.page_fields_for_display = None
+
+    @override_settings(
+        WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS=[],
+        WAGTAILMENUS_PAGE_FIELD_FOR_MENU_ITEM_TEXT='translated_title',
+    )
+    def test_text_field_is_not_a_field(self):
+        self.assertEqual(self.get_error_ids(), ['wagtailmenus.W001'])
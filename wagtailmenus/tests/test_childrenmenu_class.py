@@ -1,7 +1,13 @@
+from unittest import mock
+
+from django.db import connection
+from django.template import engines
 from django.test import TestCase
+from django.test.client import RequestFactory
 
 from wagtailmenus.models import ChildrenMenu
 from wagtailmenus.tests import base, utils
+from wagtailmenus.tests.models import ContactPage
 
 Page = utils.get_page_model()
 
@@ -30,3 +36,127 @@ class TestGetTemplateNames(
     base.GetTemplateNamesMethodTestCase
     """
     expected_default_result_length = 3
+
+
+class TestBoundedChildrenMenus(TestCase):
+    fixtures = ['test.json']
+
+    def get_prepared_menu(self, max_levels=2, **kwargs):
+        home_page = Page.objects.get(url_path='/home/')
+        menu = ChildrenMenu(parent_page=home_page, max_levels=max_levels, **kwargs)
+        menu._contextual_vals = utils.make_contextualvals_instance(
+            url='/', current_page=home_page,
+        )
+        menu._option_vals = utils.make_optionvals_instance(max_levels=max_levels)
+        menu.set_request(menu._contextual_vals.request)
+        return menu
+
+    def get_displayed_ids(self, menu):
+        return [page.id for page in menu.pages_for_display.values()]
+
+    def test_pages_are_fetched_one_level_at_a_time(self):
+        menu = self.get_prepared_menu(order_by=('path',))
+        self.assertEqual(
+            self.get_displayed_ids(menu),
+            [6, 14, 18, 19, 7, 8, 9, 15, 16, 17, 20, 21, 22]
+        )
+        # Children are unaffected
+        unbounded_menu = self.get_prepared_menu()
+        for page in menu.pages_for_display.values():
+            self.assertEqual(
+                menu.get_children_for_page(page),
+                unbounded_menu.get_children_for_page(page)
+            )
+
+    def test_limit_is_applied_to_each_parent(self):
+        menu = self.get_prepared_menu(limit=2)
+        self.assertEqual(self.get_displayed_ids(menu), [6, 14, 7, 8, 15, 16])
+        about_us = menu.pages_for_display[6]
+        self.assertEqual(
+            [page.id for page in menu.get_children_for_page(about_us)], [7, 8]
+        )
+
+    def test_limit_without_sliced_subquery_support(self):
+        menu = self.get_prepared_menu(limit=2)
+        with mock.patch.object(
+            connection.features, 'allow_sliced_subqueries_with_in', False
+        ):
+            self.assertEqual(self.get_displayed_ids(menu), [6, 14, 7, 8, 15, 16])
+
+    def test_order_by(self):
+        menu = self.get_prepared_menu(max_levels=1, order_by=('-title',))
+        self.assertEqual(self.get_displayed_ids(menu), [14, 19, 18, 6])
+
+        menu = self.get_prepared_menu(limit=1, order_by=('-title',))
+        self.assertEqual(self.get_displayed_ids(menu), [14, 16])
+
+    def test_order_by_page_type_fields(self):
+        # A field on a single page type
+        menu = self.get_prepared_menu(
+            max_levels=1, page_types=('tests.TopLevelPage',), order_by=('title_de',)
+        )
+        self.assertEqual(self.get_displayed_ids(menu), [14, 19, 6])
+
+        # A field on several page types
+        ContactPage.objects.filter(pk=18).update(repeated_item_text='Zzz')
+        menu = self.get_prepared_menu(
+            max_levels=1, page_types=('tests.TopLevelPage', 'tests.ContactPage'),
+            order_by=('-repeated_item_text',)
+        )
+        self.assertEqual(self.get_displayed_ids(menu), [18, 6, 14, 19])
+        menu = self.get_prepared_menu(
+            max_levels=2, limit=1, page_types=('tests.TopLevelPage', 'tests.ContactPage'),
+            order_by=('-repeated_item_text',)
+        )
+        self.assertEqual(self.get_displayed_ids(menu), [18])
+
+    def test_order_by_unknown_field(self):
+        menu = self.get_prepared_menu(order_by=('-not_a_field',))
+        with self.assertRaisesMessage(ValueError, "Pages can't be ordered by 'not_a_field'"):
+            menu.get_pages_for_display()
+        # Fields on page types are only used if 'page_types' is specified
+        menu = self.get_prepared_menu(order_by=('title_de',))
+        with self.assertRaises(ValueError):
+            menu.get_pages_for_display()
+
+    def test_page_types(self):
+        menu = self.get_prepared_menu(page_types=('tests.ContactPage',))
+        self.assertEqual(self.get_displayed_ids(menu), [18])
+
+        menu = self.get_prepared_menu(page_types=('tests.NotAModel',))
+        with self.assertRaises(ValueError):
+            menu.get_pages_for_display()
+
+    def test_remaining_children_counts(self):
+        menu = self.get_prepared_menu(limit=2, show_more_item=True)
+        menu.pages_for_display
+        self.assertEqual(menu.remaining_children_counts, {
+            '00010002': 2,
+            '000100020001': 1,
+            '000100020003': 1,
+        })
+
+        menu = self.get_prepared_menu(limit=2)
+        menu.pages_for_display
+        self.assertEqual(menu.remaining_children_counts, {})
+
+    def test_rendering_more_items(self):
+        request = RequestFactory().get('/')
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(url_path='/home/')
+        template = engines['django'].from_string(
+            '{% load menu_tags %}{% children_menu max_levels=2 limit=2 '
+            'order_by="title" show_more_item=True '
+            'template="menus/children_menu.html" %}'
+        )
+        html = template.render({}, request)
+        self.assertInHTML('<li class=""><a href="/">2 more</a></li>', html)
+        self.assertNotIn('Legal', html)
+        self.assertNotIn('Our mission and values', html)
+        self.assertInHTML('<li class=""><a href="/about-us/">1 more</a></li>', html)
+
+    def test_invalid_limit(self):
+        template = engines['django'].from_string(
+            '{% load menu_tags %}{% children_menu limit=0 %}'
+        )
+        with self.assertRaises(ValueError):
+            template.render({}, RequestFactory().get('/'))
@@ -0,0 +1,87 @@
+import json
+import re
+
+from django.template import engines
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from wagtailmenus.tests import utils
+from wagtailmenus.utils.misc import derive_section_root
+
+Page = utils.get_page_model()
+
+
+class TestClientSideActiveClasses(TestCase):
+    fixtures = ['test.json']
+
+    def render_template_string(self, template_string, url, path=None):
+        request = RequestFactory().get(path or url)
+        page = Page.objects.get(url_path='/home' + url).specific
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = page
+        request.META['WAGTAILMENUS_CURRENT_SECTION_ROOT'] = derive_section_root(page)
+        template = engines['django'].from_string(
+            '{% load menu_tags %}' + template_string
+        )
+        return template.render({}, request)
+
+    def test_main_menu_output_does_not_vary_by_page(self):
+        template_string = (
+            '{% main_menu max_levels=3 template="menus/main_menu.html" '
+            'sub_menu_template="menus/sub_menu.html" client_side_active_classes=True %}'
+        )
+        output = self.render_template_string(template_string, '/about-us/')
+        for url in ('/', '/about-us/meet-the-team/', '/superheroes/marvel-comics/'):
+            self.assertEqual(self.render_template_string(template_string, url), output)
+        self.assertNotIn('class="active', output)
+        self.assertNotIn('class="ancestor', output)
+
+    def test_data_attributes(self):
+        output = self.render_template_string(
+            '{% main_menu max_levels=3 template="menus/main_menu.html" '
+            'sub_menu_template="menus/sub_menu.html" client_side_active_classes=True %}'
+            "{% flat_menu 'footer' template='menus/flat_menu.html' client_side_active_classes=True %}",
+            '/about-us/',
+        )
+        about_us = Page.objects.get(url_path='/home/about-us/')
+        # 'About us' is repeated in its sub menu, so has 'data-wm-repeats'
+        # at the top level only
+        self.assertIn('<li class=" dropdown" data-wm-page="%s" data-wm-repeats>' % about_us.pk, output)
+        self.assertIn('<li class="" data-wm-page="%s">' % about_us.pk, output)
+        # Custom URLs are identified by their path (unless external)
+        self.assertIn('<li class="" data-wm-url="/about-us/meet-the-team/custom-url/">', output)
+        self.assertIn('<li class="">\n        <a href="http://google.co.uk">', output)
+
+    def test_section_root_data_attributes(self):
+        output = self.render_template_string(
+            '{% section_menu client_side_active_classes=True %}',
+            '/about-us/meet-the-team/',
+        )
+        about_us = Page.objects.get(url_path='/home/about-us/')
+        self.assertIn('class=" section_root" data-wm-page="%s"' % about_us.pk, output)
+
+    def test_attributes_are_not_added_by_default(self):
+        output = self.render_template_string(
+            '{% main_menu max_levels=3 template="menus/main_menu.html" %}', '/about-us/'
+        )
+        self.assertNotIn('data-wm-', output)
+
+    def test_menu_active_state(self):
+        output = self.render_template_string('{% menu_active_state %}', '/about-us/meet-the-team/')
+        match = re.search(
+            r'<script type="application/json" id="wagtailmenus-active-state">(.*?)</script>',
+            output
+        )
+        data = json.loads(match.group(1))
+        about_us = Page.objects.get(url_path='/home/about-us/')
+        meet_the_team = Page.objects.get(url_path='/home/about-us/meet-the-team/')
+        self.assertEqual(data['page'], meet_the_team.pk)
+        self.assertEqual(data['ancestors'], [about_us.pk, meet_the_team.pk])
+        self.assertEqual(data['path'], '/about-us/meet-the-team/')
+        self.assertEqual(data['activeClass'], 'active')
+        self.assertEqual(data['ancestorClass'], 'ancestor')
+
+    def test_menu_active_state_escapes_path(self):
+        output = self.render_template_string(
+            '{% menu_active_state %}', '/about-us/', path='/about-us/</script>/'
+        )
+        self.assertIn('"path":"/about-us/\\u003C/script\\u003E/"', output)
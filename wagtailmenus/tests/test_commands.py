@@ -1,6 +1,15 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from wagtail.core.models import Site
+from wagtailmenus import warming
+from wagtailmenus.cache import menu_cache
 from wagtailmenus.conf import settings
 
 
@@ -50,3 +59,84 @@ class TestAutoPopulateMainMenus(TestCase):
         menu = self.model.get_for_site(site)
         menu_items2 = menu.get_menu_items_manager()
         self.assertEqual(list(menu_items.all()), list(menu_items2.all()))
+
+
+class TestWarmMenus(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.local.clear()
+        settings_override = override_settings(WAGTAILMENUS_USE_MENU_CACHE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_page_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len([q for q in queries if 'FROM "wagtailcore_page"' in q['sql']])
+
+    def test_menus_are_cached(self):
+        stdout = StringIO()
+        call_command('warm_menus', section_menus=True, verbosity=2, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn("site 1: main_menu", output)
+        self.assertIn("site 1: flat_menu 'footer'", output)
+        self.assertIn("site 1: section_menu (page 6)", output)
+        self.assertIn("site 1: section_menu (page 31)", output)
+        self.assertIn("Warmed 59 of 59 menus for 2 sites", output)
+        for url in (
+            '/menus-api/main/',
+            '/menus-api/flat/footer/',
+            '/menus-api/flat/contact/',
+        ):
+            self.assertEqual(self.get_page_query_count(url), 0, "%s was not cached" % url)
+        # The section menu view always fetches the requested page, but
+        # menus for every page in each section are cached
+        for page_id in (6, 7, 31):
+            self.assertIsNotNone(menu_cache.get('1:section_menu:%s:2:0' % page_id))
+
+    def test_sites_can_be_specified(self):
+        sites = Site.objects.filter(pk=1)
+        tasks = warming.get_warming_tasks(sites)
+        self.assertEqual(set(task.site_id for task in tasks), {1})
+        stdout = StringIO()
+        call_command('warm_menus', site_ids=[1], stdout=stdout)
+        self.assertIn("for 1 sites", stdout.getvalue())
+
+    def test_failures_are_reported(self):
+        stderr = StringIO()
+        with mock.patch('wagtailmenus.api.views.MenuAPIView.get_menu_data', side_effect=ValueError('Oops')):
+            with self.assertRaises(CommandError):
+                call_command('warm_menus', site_ids=[1], stdout=StringIO(), stderr=stderr)
+        self.assertIn("site 1: main_menu failed: ValueError: Oops", stderr.getvalue())
+
+    def test_nothing_to_warm(self):
+        stdout = StringIO()
+        with override_settings(WAGTAILMENUS_USE_MENU_CACHE=False):
+            call_command('warm_menus', stdout=stdout)
+        self.assertIn("Nothing to warm", stdout.getvalue())
+
+    def test_warming_after_migrate(self):
+        with mock.patch.object(warming, 'warm_menu', wraps=warming.warm_menu) as warm_menu:
+            warming.warm_menus_after_migrate()
+            self.assertFalse(warm_menu.called)
+            with override_settings(WAGTAILMENUS_WARM_MENUS_AFTER_MIGRATE=True):
+                warming.warm_menus_after_migrate()
+            self.assertTrue(warm_menu.called)
+        self.assertEqual(self.get_page_query_count('/menus-api/main/'), 0)
+
+
+class TestWarmMenusInParallel(TransactionTestCase):
+    fixtures = ['test.json']
+
+    @override_settings(WAGTAILMENUS_USE_MENU_CACHE=True)
+    def test_menus_are_warmed_by_threads(self):
+        cache.clear()
+        menu_cache.local.clear()
+        results = list(warming.warm_menus(
+            warming.get_warming_tasks(Site.objects.all()), workers=4
+        ))
+        self.assertEqual([result.error for result in results], [None] * len(results))
+        self.assertIsNotNone(menu_cache.get('1:main_menu:::0'))
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+from io import StringIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+
+from wagtailmenus import export
+from wagtailmenus.conf import settings
+from wagtailmenus.tests import utils
+from wagtailmenus.utils.misc import derive_section_root
+
+Page = utils.get_page_model()
+Site = utils.get_site_model()
+
+
+class TestMenuExport(TestCase):
+    fixtures = ['test.json']
+    maxDiff = None
+
+    def setUp(self):
+        self.site = Site.objects.get(is_default_site=True)
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def render_live_menu(self, tag, page):
+        """
+        Return the output of a menu tag (with its default options) for
+        ``page``, rendered in the usual way.
+        """
+        request = RequestFactory().get(page.relative_url(self.site))
+        request.site = self.site
+        request._wagtail_site = self.site
+        request.user = AnonymousUser()
+        section_root_depth = settings.SECTION_ROOT_DEPTH
+        ancestor_ids = ()
+        if page.depth >= section_root_depth:
+            ancestor_ids = page.get_ancestors(inclusive=True).filter(
+                depth__gte=section_root_depth).values_list('id', flat=True)
+        context = Context({
+            'request': request,
+            'wagtailmenus_vals': {
+                'current_page': page,
+                'section_root': derive_section_root(page),
+                'current_page_ancestor_ids': ancestor_ids,
+            },
+        })
+        return Template('{%% load menu_tags %%}{%% %s %%}' % tag).render(context)
+
+    def read_menu(self, page, file_name):
+        path = page.relative_url(self.site).strip('/')
+        file_path = os.path.join(self.output_dir, self.site.hostname, path, file_name)
+        if not os.path.exists(file_path):
+            return ''
+        with open(file_path, encoding='utf-8') as f:
+            return f.read()
+
+    def assertExportedMenusMatchLiveMenus(self):
+        count = export.SiteExporter(self.site).export(self.output_dir)
+        pages = list(Page.objects.live().descendant_of(
+            self.site.root_page, inclusive=True).specific())
+        self.assertEqual(count, len(pages))
+        for page in pages:
+            self.assertHTMLEqual(
+                self.read_menu(page, export.MAIN_MENU_FILE_NAME),
+                self.render_live_menu('main_menu', page),
+                "Main menu differs for page %s" % page.pk
+            )
+            self.assertHTMLEqual(
+                self.read_menu(page, export.SECTION_MENU_FILE_NAME),
+                self.render_live_menu('section_menu', page),
+                "Section menu differs for page %s" % page.pk
+            )
+            self.assertHTMLEqual(
+                self.read_menu(page, export.FLAT_MENU_FILE_NAME % 'footer'),
+                self.render_live_menu("flat_menu 'footer'", page),
+                "Flat menu differs for page %s" % page.pk
+            )
+
+    def test_exported_menus_match_live_menus_for_every_page(self):
+        self.assertExportedMenusMatchLiveMenus()
+
+    @override_settings(WAGTAILMENUS_USE_FAST_RENDERER=True)
+    def test_exported_menus_match_live_menus_using_fast_renderer(self):
+        self.assertExportedMenusMatchLiveMenus()
+
+    def test_flat_menus_have_no_active_classes(self):
+        exporter = export.SiteExporter(self.site)
+        for page, ancestor_ids, section_root in exporter.get_pages():
+            if page.pk == 7:
+                break
+        menus = exporter.get_menus_for_page(
+            page, ancestor_ids, section_root, page.relative_url(self.site)
+        )
+        self.assertIn('class="ancestor', menus['main_menu'])
+        for html in menus['flat_menus'].values():
+            self.assertNotIn('class="active', html)
+            self.assertNotIn('class="ancestor', html)
+
+    def test_menus_are_compiled_once_per_site(self):
+        exporter = export.SiteExporter(self.site)
+        pages = list(exporter.get_pages())
+        page, ancestor_ids, section_root = pages[-1]
+        path = page.relative_url(self.site)
+        exporter.get_menus_for_page(page, ancestor_ids, section_root, path)
+        with self.assertNumQueries(0):
+            for page, ancestor_ids, section_root in pages[-3:]:
+                exporter.get_menus_for_page(page, ancestor_ids, section_root, path)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('export_menus', self.output_dir, site_ids=[1], verbosity=2, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('site 1: ', output)
+        self.assertIn('pages per second', output)
+        html = self.read_menu(Page.objects.get(pk=7), export.MAIN_MENU_FILE_NAME)
+        self.assertInHTML(
+            '<a href="/about-us/" class="dropdown-toggle" id="ddtoggle_6" '
+            'data-toggle="dropdown" aria-haspopup="true" aria-expanded="false">'
+            'About <span class="caret"></span></a>', html
+        )
+        self.assertIn('<li class="ancestor dropdown">', html)
+
+    @unittest.skipUnless(
+        multiprocessing.get_start_method() == 'fork',
+        "Processes must be forked to share the test database"
+    )
+    def test_sites_exported_by_pool_of_processes(self):
+        site_ids = list(Site.objects.values_list('pk', flat=True))
+        results = list(export.export_sites(site_ids, self.output_dir, workers=2))
+        self.assertEqual([result.site_id for result in results], site_ids)
+        for result in results:
+            self.assertIsNone(result.error)
+            self.assertGreater(result.page_count, 0)
+        self.assertHTMLEqual(
+            self.read_menu(Page.objects.get(pk=7), export.MAIN_MENU_FILE_NAME),
+            self.render_live_menu('main_menu', Page.objects.get(pk=7).specific),
+        )
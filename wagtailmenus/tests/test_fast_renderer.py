@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from wagtail.core.models import Page
+
+from wagtailmenus import renderers
+from wagtailmenus.utils.misc import derive_section_root
+
+
+class TestFastRenderer(TestCase):
+    fixtures = ['test.json']
+    maxDiff = None
+
+    urls = (
+        '/',
+        '/about-us/',
+        '/about-us/meet-the-team/',
+        '/about-us/meet-the-team/staff-member-one/',
+        '/superheroes/',
+        '/superheroes/marvel-comics/',
+        '/news-and-events/',
+        '/legal/privacy-policy/',
+    )
+
+    def render_template_string(self, template_string, url):
+        request = RequestFactory().get(url)
+        page = Page.objects.get(url_path='/home' + url).specific
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = page
+        request.META['WAGTAILMENUS_CURRENT_SECTION_ROOT'] = derive_section_root(page)
+        template = engines['django'].from_string(
+            '{% load menu_tags %}' + template_string
+        )
+        return template.render({}, request)
+
+    def assertFastOutputMatches(self, template_string):
+        for url in self.urls:
+            with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=False):
+                expected = self.render_template_string(template_string, url)
+            with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=True):
+                result = self.render_template_string(template_string, url)
+            self.assertEqual(result, expected)
+
+    def test_full_page_output_is_identical(self):
+        for url in self.urls:
+            with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=False):
+                expected = self.client.get(url).content
+            with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=True):
+                result = self.client.get(url).content
+            self.assertEqual(result, expected)
+
+    def test_main_menu_templates(self):
+        self.assertFastOutputMatches(
+            '{% main_menu max_levels=3 template="menus/main_menu.html" %}'
+            '{% main_menu max_levels=3 template="menus/bootstrap3/main_menu_dropdown_hover.html" %}'
+            '{% main_menu max_levels=3 template="menus/main_menu.html" use_absolute_page_urls=True %}'
+        )
+
+    def test_flat_menu_templates(self):
+        self.assertFastOutputMatches(
+            "{% flat_menu 'footer' max_levels=2 apply_active_classes=True template='menus/flat_menu.html' %}"
+            "{% flat_menu 'contact' show_menu_heading=True template='menus/flat_menu.html' %}"
+            "{% flat_menu 'contact' show_menu_heading=True template='menus/flat_menu.html' sub_menu_template='menus/sub_menu.html' max_levels=3 %}"
+        )
+
+    def test_section_and_children_menu_templates(self):
+        self.assertFastOutputMatches(
+            '{% section_menu max_levels=3 template="menus/section_menu.html" sub_menu_template="menus/sub_menu.html" %}'
+            '{% section_menu show_section_root=False template="menus/section_menu.html" %}'
+            '{% children_menu max_levels=3 template="menus/children_menu.html" %}'
+            '{% children_menu max_levels=3 template="menus/children_menu.html" sub_menu_template="menus/bootstrap3/sub_menu_dropdown.html" %}'
+            '{% children_menu max_levels=3 template="menus/children_menu.html" sub_menu_template="menus/bootstrap3/sub_menu_dropdown_hover.html" %}'
+        )
+
+    def test_client_side_active_classes(self):
+        self.assertFastOutputMatches(
+            '{% main_menu max_levels=3 template="menus/main_menu.html" client_side_active_classes=True %}'
+            '{% main_menu max_levels=3 template="menus/bootstrap3/main_menu_dropdown.html" client_side_active_classes=True %}'
+            "{% flat_menu 'contact' show_menu_heading=True template='menus/flat_menu.html' client_side_active_classes=True %}"
+            '{% section_menu max_levels=3 template="menus/section_menu.html" sub_menu_template="menus/sub_menu.html" client_side_active_classes=True %}'
+        )
+
+    def test_escaping(self):
+        page = Page.objects.get(url_path='/home/about-us/')
+        page.title = 'About <us> & "them"'
+        page.save()
+        self.assertFastOutputMatches(
+            '{% main_menu template="menus/main_menu.html" %}'
+            '{% section_menu template="menus/section_menu.html" %}'
+        )
+
+    def test_get_fast_renderer_ignores_overridden_templates(self):
+        django_engine = engines['django']
+        # 'menus/main/menu.html' is defined in the test app's templates
+        overridden = django_engine.get_template('menus/main/menu.html')
+        self.assertIsNone(renderers.get_fast_renderer(overridden))
+        stock = django_engine.get_template('menus/main_menu.html')
+        self.assertIs(
+            renderers.get_fast_renderer(stock),
+            renderers.render_bootstrap3_main_menu
+        )
+        # Templates that aren't mapped to a renderer are also ignored
+        heirarchical = django_engine.get_template('menus/section_menu_heirarchical.html')
+        self.assertIsNone(renderers.get_fast_renderer(heirarchical))
+
+    def test_dependencies_are_only_loaded_once(self):
+        django_engine = engines['django']
+        stock = django_engine.get_template('menus/main_menu.html')
+        renderers.get_fast_renderer(stock)
+        with mock.patch.object(
+            django_engine.engine, 'get_template', wraps=django_engine.engine.get_template
+        ) as get_template:
+            for i in range(3):
+                renderers.get_fast_renderer(stock)
+        self.assertFalse(get_template.called)
+
+        # Overriding settings (e.g. for template directories) clears the cache
+        with override_settings(WAGTAILMENUS_USE_FAST_RENDERER=True):
+            with mock.patch.object(
+                django_engine.engine, 'get_template', wraps=django_engine.engine.get_template
+            ) as get_template:
+                renderers.get_fast_renderer(stock)
+            self.assertEqual(get_template.call_count, 1)
@@ -0,0 +1,128 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+
+from wagtailmenus import invalidation, versioning
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+
+
+class TestInvalidationBatches(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def publish(self, page_id):
+        Page.objects.get(pk=page_id).specific.save_revision().publish()
+
+    def test_changes_are_applied_once_on_commit(self):
+        version = versioning.get_site_version(1)
+        with mock.patch.object(
+            invalidation, 'bump_versions', wraps=versioning.bump_versions
+        ) as bump_versions:
+            for page_id in (6, 7, 8, 18):
+                self.publish(page_id)
+            self.assertEqual(versioning.get_site_version(1), version)
+            self.assertFalse(bump_versions.called)
+
+            utils.run_on_commit_callbacks()
+            self.assertEqual(bump_versions.call_count, 1)
+        self.assertEqual(versioning.get_site_version(1), version + 1)
+
+    def test_changes_are_discarded_on_rollback(self):
+        version = versioning.get_site_version(1)
+        try:
+            with transaction.atomic():
+                self.publish(18)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        utils.run_on_commit_callbacks()
+        self.assertEqual(versioning.get_site_version(1), version)
+
+        # Changes made after the rollback are collected in a new batch
+        self.publish(18)
+        utils.run_on_commit_callbacks()
+        self.assertEqual(versioning.get_site_version(1), version + 1)
+
+    def test_snapshots_are_rebuilt_when_changes_are_applied(self):
+        with mock.patch.object(invalidation, 'rebuild_snapshots') as rebuild_snapshots:
+            self.publish(18)
+            utils.run_on_commit_callbacks()
+        rebuild_snapshots.assert_called_once()
+        self.assertIn(1, rebuild_snapshots.call_args[0][0])
+
+    def test_pages_outside_of_any_site_are_ignored(self):
+        batch = invalidation.InvalidationBatch()
+        batch.add_page(Page.objects.get(pk=1))
+        self.assertEqual(batch.apply(), set())
+
+
+class TestInvalidationOutsideTransactions(TransactionTestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def test_changes_are_applied_immediately(self):
+        version = versioning.get_site_version(1)
+        page = Page.objects.get(pk=18)
+        with invalidation.collect_changes() as batch:
+            batch.add_page(page)
+        self.assertEqual(versioning.get_site_version(1), version + 1)
+
+
+class TestInvalidationWorker(TestCase):
+
+    def setUp(self):
+        self.worker = invalidation.InvalidationWorker()
+        self.applied = []
+        self.done = threading.Event()
+
+        def apply(batch):
+            self.applied.append(batch)
+            self.done.set()
+            return set()
+
+        patcher = mock.patch.object(invalidation.InvalidationBatch, 'apply', apply)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_batch(self, site_id):
+        batch = invalidation.InvalidationBatch()
+        batch.add_menu_change([(site_id, '')], ['menu:main:%s' % site_id])
+        return batch
+
+    def test_batches_submitted_during_the_delay_are_combined(self):
+        self.worker.submit(self.make_batch(1), delay=0.2)
+        self.worker.submit(self.make_batch(2), delay=0.2)
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(len(self.applied), 1)
+        self.assertEqual(self.applied[0].version_keys, {(1, ''), (2, '')})
+        self.assertEqual(
+            self.applied[0].dependencies, {'menu:main:1', 'menu:main:2'}
+        )
+
+    def test_each_batch_postpones_processing_up_to_max_delay(self):
+        now = [100.0]
+        self.addCleanup(self.worker.flush)
+        with mock.patch.object(invalidation.time, 'monotonic', lambda: now[0]):
+            self.worker.submit(self.make_batch(1), delay=10, max_delay=25)
+            self.assertEqual(self.worker.deadline, 110)
+            now[0] = 108
+            self.worker.submit(self.make_batch(2), delay=10, max_delay=25)
+            self.assertEqual(self.worker.deadline, 118)
+            now[0] = 117
+            self.worker.submit(self.make_batch(3), delay=10, max_delay=25)
+            self.assertEqual(self.worker.deadline, 125)
+
+    def test_flush_applies_pending_changes_immediately(self):
+        self.worker.submit(self.make_batch(1), delay=60)
+        self.worker.flush()
+        self.assertEqual(len(self.applied), 1)
+        self.assertIsNone(self.worker.pending)
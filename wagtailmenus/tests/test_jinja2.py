@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+from bs4 import BeautifulSoup
+from django.template import engines
+from django.test import TestCase
+from django.test.client import RequestFactory
+from wagtail.core.models import Page
+
+from wagtailmenus.models import MainMenu
+
+from wagtailmenus.utils.misc import derive_section_root
+
+
+class TestJinja2Extension(TestCase):
+    fixtures = ['test.json']
+
+    def get_request(self, url):
+        request = RequestFactory().get(url)
+        page = Page.objects.get(url_path='/home' + url).specific
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = page
+        request.META['WAGTAILMENUS_CURRENT_SECTION_ROOT'] = derive_section_root(page)
+        return request
+
+    def render_django(self, template_string, url):
+        template = engines['django'].from_string(
+            '{% load menu_tags %}' + template_string)
+        return template.render({}, self.get_request(url))
+
+    def render_jinja2(self, template_string, url):
+        template = engines['jinja2'].from_string(template_string)
+        return template.render({}, self.get_request(url))
+
+    @staticmethod
+    def get_links(html):
+        """Return a summary of the links in some HTML, ignoring whitespace."""
+        soup = BeautifulSoup(html, 'html5lib')
+        return [
+            (link.parent.get('class'), link.get('href'), link.get_text())
+            for link in soup.find_all('a')
+        ]
+
+    def assertMenusMatch(self, django_template_string, jinja2_template_string):
+        link_count = 0
+        for url in ('/', '/about-us/', '/about-us/meet-the-team/', '/superheroes/marvel-comics/'):
+            expected = self.get_links(self.render_django(django_template_string, url))
+            result = self.get_links(self.render_jinja2(jinja2_template_string, url))
+            self.assertEqual(result, expected)
+            link_count += len(expected)
+        self.assertTrue(link_count)
+
+    def test_main_menu(self):
+        self.assertMenusMatch(
+            '{% main_menu max_levels=3 template="menus/main_menu.html" %}',
+            '{{ main_menu(max_levels=3, template="menus/main_menu.html") }}',
+        )
+
+    def test_flat_menu(self):
+        self.assertMenusMatch(
+            "{% flat_menu 'footer' max_levels=2 apply_active_classes=True template='menus/flat_menu.html' %}",
+            "{{ flat_menu('footer', max_levels=2, apply_active_classes=True, template='menus/flat_menu.html') }}",
+        )
+
+    def test_section_menu(self):
+        self.assertMenusMatch(
+            '{% section_menu max_levels=3 template="menus/section_menu.html" sub_menu_template="menus/sub_menu.html" %}',
+            '{{ section_menu(max_levels=3, template="menus/section_menu.html", sub_menu_template="menus/sub_menu.html") }}',
+        )
+
+    def test_children_menu(self):
+        self.assertMenusMatch(
+            '{% children_menu max_levels=3 template="menus/children_menu.html" %}',
+            '{{ children_menu(max_levels=3, template="menus/children_menu.html") }}',
+        )
+
+    def test_menus_are_rendered_using_jinja2_templates(self):
+        html = self.render_jinja2(
+            '{{ main_menu(max_levels=2, template="menus/main_menu.html") }}', '/')
+        # The Django versions of the bundled templates begin with a blank line
+        # (left by '{% load menu_tags %}'), whereas the Jinja2 versions do not
+        self.assertTrue(html.startswith('<ul class="nav navbar-nav">'))
+
+    def test_menu_active_state(self):
+        self.assertEqual(
+            self.render_jinja2('{{ menu_active_state() }}', '/about-us/').strip(),
+            self.render_django('{% menu_active_state %}', '/about-us/').strip(),
+        )
+
+    def test_menu_instance_key_is_removed_for_jinja2_templates(self):
+        menu = MainMenu()
+        template = engines['jinja2'].from_string('')
+        template.template.name = 'menus/main_menu.html'
+        context_data = {'main_menu': menu, 'menu_instance': menu}
+        menu.render_template(template, context_data)
+        self.assertNotIn('main_menu', context_data)
+        self.assertIs(context_data['menu_instance'], menu)
+
+    def test_menu_instance_key_is_kept_for_other_template_backends(self):
+        class Template:
+            template = SimpleNamespace(name='menus/main_menu.html')
+
+            def render(self, context=None, request=None):
+                return ''
+
+        menu = MainMenu()
+        context_data = {'main_menu': menu, 'menu_instance': menu}
+        menu.render_template(Template(), context_data)
+        self.assertIs(context_data['main_menu'], menu)
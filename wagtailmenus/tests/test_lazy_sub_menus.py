@@ -0,0 +1,100 @@
+import re
+
+from django.core.cache import cache
+from django.template import engines
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+
+
+class TestLazySubMenus(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+
+    def render_template_string(self, template_string, url):
+        request = RequestFactory().get(url)
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(url_path='/home' + url).specific
+        template = engines['django'].from_string(
+            '{% load menu_tags %}' + template_string
+        )
+        return template.render({}, request)
+
+    @staticmethod
+    def get_placeholder_urls(html):
+        return [
+            url.replace('&amp;', '&') for url in
+            re.findall(r'<div class="sub-menu-placeholder" data-wm-sub-menu-url="([^"]+)"></div>', html)
+        ]
+
+    def test_sub_menus_outside_of_the_active_trail_are_replaced(self):
+        html = self.render_template_string(
+            '{% main_menu max_levels=3 template="menus/bootstrap3/main_menu_dropdown.html" lazy_sub_menus=True %}',
+            '/about-us/',
+        )
+        # The 'About us' sub menu is rendered in full
+        self.assertIn('<ul class="dropdown-menu" aria-labelledby="ddtoggle_6">', html)
+        self.assertEqual(
+            [url.split('?')[0] for url in self.get_placeholder_urls(html)],
+            ['/menus-api/main/sub-menu/7/', '/menus-api/main/sub-menu/14/', '/menus-api/main/sub-menu/18/']
+        )
+
+    def test_placeholder_urls_do_not_vary(self):
+        template_string = (
+            '{% main_menu max_levels=3 template="menus/bootstrap3/main_menu_dropdown.html" '
+            'lazy_sub_menus=True client_side_active_classes=True %}'
+        )
+        html = self.render_template_string(template_string, '/about-us/')
+        # All sub menus are replaced when active classes are applied client-side
+        self.assertEqual(len(self.get_placeholder_urls(html)), 3)
+        self.assertNotIn('dropdown-menu', html)
+        self.assertEqual(self.render_template_string(template_string, '/superheroes/'), html)
+
+    def test_sub_menu_view_output_matches_inline_sub_menus(self):
+        for template_string in (
+            '{% main_menu max_levels=3 template="menus/bootstrap3/main_menu_dropdown.html" %}',
+            "{% flat_menu 'header-secondary' max_levels=3 template='menus/flat_menu.html' sub_menu_template='menus/sub_menu.html' %}",
+        ):
+            expected = self.render_template_string(template_string, '/')
+            html = self.render_template_string(
+                template_string.replace(' %}', ' lazy_sub_menus=True %}'), '/'
+            )
+            urls = self.get_placeholder_urls(html)
+            self.assertTrue(urls)
+            for url in urls:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('ETag'))
+                fragment = response.content.decode()
+                self.assertIn(fragment, expected)
+                html = html.replace(
+                    '<div class="sub-menu-placeholder" data-wm-sub-menu-url="%s"></div>' % url.replace('&', '&amp;'),
+                    fragment
+                )
+            self.assertEqual(html, expected)
+
+    def test_sub_menu_view_with_invalid_values(self):
+        html = self.render_template_string(
+            '{% main_menu max_levels=3 lazy_sub_menus=True %}', '/about-us/'
+        )
+        url = self.get_placeholder_urls(html)[0]
+        path, options = url.split('?options=')
+        self.assertEqual(self.client.get(path).status_code, 400)
+        self.assertEqual(self.client.get(path + '?options=x' + options).status_code, 400)
+        self.assertEqual(self.client.get('/menus-api/main/sub-menu/999/?options=' + options).status_code, 404)
+
+    def test_jinja2_templates_are_used_for_jinja2_menus(self):
+        request = RequestFactory().get('/')
+        template = engines['jinja2'].from_string(
+            '{{ main_menu(max_levels=3, template="menus/main_menu.html", lazy_sub_menus=True) }}'
+        )
+        urls = self.get_placeholder_urls(template.render({}, request))
+        self.assertTrue(urls)
+        response = self.client.get(urls[0])
+        # The Django version of the template begins with an extra blank line
+        # (left by '{% load menu_tags %}')
+        self.assertTrue(response.content.decode().startswith('\n\t<ul class="dropdown-menu"'))
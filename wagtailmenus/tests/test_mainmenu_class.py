@@ -1,7 +1,8 @@
 from django.test import TestCase
 
 from wagtailmenus.conf import constants
-from wagtailmenus.models import MainMenu
+from wagtailmenus.models import MainMenu, MainMenuItem
+from wagtailmenus.models.menus import get_deferred_link_page_fields
 from wagtailmenus.tests import base, utils
 
 Page = utils.get_page_model()
@@ -31,6 +32,19 @@ class TestMainMenuGeneralMethods(MainMenuTestCase):
         with self.assertRaises(NotImplementedError):
             menu.create_from_collected_values(None, None)
 
+    def test_get_base_menuitem_queryset_defers_link_page_fields(self):
+        menu = self.get_test_menu_instance()
+        deferred_fields = get_deferred_link_page_fields(MainMenuItem)
+        self.assertIs(get_deferred_link_page_fields(MainMenuItem), deferred_fields)
+        self.assertIn('link_page__title', deferred_fields)
+        for name in ('id', 'path', 'depth'):
+            self.assertNotIn('link_page__' + name, deferred_fields)
+
+        item = menu.get_base_menuitem_queryset().exclude(link_page=None).first()
+        with self.assertNumQueries(0):
+            item.link_page.path
+        self.assertIn('title', item.link_page.get_deferred_fields())
+
 
 class TestTopLevelItems(MainMenuTestCase):
 
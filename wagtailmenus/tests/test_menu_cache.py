@@ -0,0 +1,480 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from wagtail.core import hooks
+
+from wagtailmenus import cache as menu_cache_module, versioning
+from wagtailmenus.cache import menu_cache
+from wagtailmenus.models import ChildrenMenu, FlatMenu, MainMenu, MainMenuItem
+from wagtailmenus.snapshots import get_menu_context
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+Site = utils.get_site_model()
+
+
+def get_prepared_menu(menu_class, site, **option_values):
+    values = dict(
+        max_levels=None,
+        apply_active_classes=False,
+        allow_repeating_parents=True,
+        use_absolute_page_urls=False,
+        add_sub_menus_inline=False,
+    )
+    values.update(option_values)
+    return menu_class._get_render_prepared_object(get_menu_context(site), **values)
+
+
+class TestMenuCacheDependencies(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        self.site = Site.objects.get(is_default_site=True)
+
+    def test_main_menu_dependencies(self):
+        menu = get_prepared_menu(MainMenu, self.site)
+        dependencies = menu.get_cache_dependencies()
+        self.assertIn('menu:main:%s' % self.site.pk, dependencies)
+        # 'Home' is above the section root depth, so only the page matters
+        self.assertIn('page:5', dependencies)
+        self.assertNotIn('tree:00010002', dependencies)
+        # Items with 'allow_subnav' depend on their whole branch (including
+        # 'Superheroes', which isn't currently shown)
+        for path in ('000100020001', '000100020002', '000100020003', '000100020004'):
+            self.assertIn('tree:%s' % path, dependencies)
+        self.assertIn('below:00010002', dependencies)
+        # 'Legal' isn't in the main menu
+        self.assertNotIn('tree:000100020005', dependencies)
+        self.assertNotIn('page:19', dependencies)
+
+    def test_flat_menu_dependencies(self):
+        menu = get_prepared_menu(
+            FlatMenu, self.site, handle='footer', show_menu_heading=True,
+            fall_back_to_default_site_menus=False,
+        )
+        dependencies = menu.get_cache_dependencies()
+        self.assertIn('menu:flat:footer', dependencies)
+        for page_id in (20, 21, 22):
+            self.assertIn('page:%s' % page_id, dependencies)
+        self.assertIn('below:000100020005', dependencies)
+        self.assertNotIn('tree:000100020005', dependencies)
+
+    def test_children_menu_dependencies(self):
+        menu = get_prepared_menu(
+            ChildrenMenu, self.site, parent_page=Page.objects.get(pk=6), max_levels=2,
+        )
+        self.assertEqual(menu.get_cache_dependencies(), {
+            'tree:000100020001', 'below:0001', 'below:00010002',
+        })
+
+    def test_active_classes_depend_on_the_current_page(self):
+        context = get_menu_context(self.site)
+        context['wagtailmenus_vals']['current_page'] = Page.objects.get(pk=7)
+        menu = MainMenu._get_render_prepared_object(
+            context, max_levels=None, apply_active_classes=True,
+            allow_repeating_parents=True, use_absolute_page_urls=False,
+        )
+        self.assertIn('page:7', menu.get_cache_dependencies())
+
+    def test_page_change_dependencies(self):
+        page = Page.objects.get(pk=31)
+        self.assertEqual(menu_cache_module.get_page_change_dependencies(page), {
+            'page:31',
+            'below:00010002000100010001',
+            'tree:0001',
+            'tree:00010002',
+            'tree:000100020001',
+            'tree:0001000200010001',
+            'tree:00010002000100010001',
+        })
+
+
+class TestMenuCache(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.local.clear()
+        self.site = Site.objects.get(is_default_site=True)
+        settings_override = override_settings(WAGTAILMENUS_USE_MENU_CACHE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())
+
+    def get_page_query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_json(url)
+        return len([q for q in queries if 'FROM "wagtailcore_page"' in q['sql']])
+
+    def assertCached(self, url):
+        self.assertEqual(self.get_page_query_count(url), 0, "%s was not cached" % url)
+
+    def assertNotCached(self, url):
+        self.assertGreater(self.get_page_query_count(url), 0, "%s was cached" % url)
+
+    def publish(self, page_id, title):
+        page = Page.objects.get(pk=page_id).specific
+        page.title = title
+        page.save_revision().publish()
+        utils.run_on_commit_callbacks()
+
+    def test_cached_responses_match_live_responses(self):
+        for url in ('/menus-api/main/', '/menus-api/flat/footer/'):
+            live = self.get_json(url)
+            self.assertEqual(self.get_json(url), live)
+            self.assertCached(url)
+
+        live = self.get_json('/menus-api/section/?page=7')
+        self.assertEqual(
+            menu_cache.get('%s:section_menu:7:2:0' % self.site.pk), live
+        )
+        self.assertEqual(self.get_json('/menus-api/section/?page=7'), live)
+
+    def test_stale_responses_have_no_etag(self):
+        etag = self.client.get('/menus-api/main/')['ETag']
+        self.publish(8, 'Our history')
+        # Another process is rebuilding the menu
+        menu_cache.acquire_lock('%s:main_menu:::0' % self.site.pk)
+        response = self.client.get('/menus-api/main/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Our history', response.content.decode())
+        self.assertFalse(response.has_header('ETag'))
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    def test_publishing_a_page_in_no_menu_leaves_menus_cached(self):
+        self.get_json('/menus-api/main/')
+        self.get_json('/menus-api/flat/footer/')
+        self.publish(2, 'Non-routable')
+        self.assertCached('/menus-api/main/')
+        self.assertCached('/menus-api/flat/footer/')
+
+    def test_publishing_a_parent_page_invalidates_menus_that_include_its_descendants(self):
+        self.get_json('/menus-api/main/')
+        self.get_json('/menus-api/flat/footer/')
+        # 'Legal' only appears as the parent of pages in the footer menu, but
+        # publishing it could change their URLs
+        self.publish(19, 'Legal stuff')
+        self.assertCached('/menus-api/main/')
+        self.assertNotCached('/menus-api/flat/footer/')
+
+    def test_publishing_a_page_invalidates_menus_that_include_it(self):
+        self.get_json('/menus-api/main/')
+        self.get_json('/menus-api/flat/footer/')
+        self.publish(21, 'Privacy')
+        self.assertCached('/menus-api/main/')
+        data = self.get_json('/menus-api/flat/footer/')
+        self.assertIn('Privacy', [item['text'] for item in data['items']])
+
+    def test_publishing_a_page_in_a_branch_invalidates_menus_that_include_it(self):
+        self.get_json('/menus-api/main/')
+        self.get_json('/menus-api/flat/footer/')
+        # 'Staff vacancies' isn't shown in menus, but is below 'About us'
+        self.publish(10, 'Jobs')
+        self.assertNotCached('/menus-api/main/')
+        self.assertCached('/menus-api/flat/footer/')
+
+    def test_unpublishing_a_page_invalidates_menus_that_include_its_descendants(self):
+        self.get_json('/menus-api/flat/footer/')
+        Page.objects.get(pk=19).specific.unpublish()
+        utils.run_on_commit_callbacks()
+        self.assertNotCached('/menus-api/flat/footer/')
+
+    def test_moving_a_page_invalidates_menus_for_both_locations(self):
+        self.get_json('/menus-api/main/')
+        self.get_json('/menus-api/flat/footer/')
+        self.get_json('/menus-api/section/?page=7')
+        Page.objects.get(pk=21).move(Page.objects.get(pk=6), pos='last-child')
+        utils.run_on_commit_callbacks()
+        self.assertNotCached('/menus-api/flat/footer/')
+        self.assertNotCached('/menus-api/main/')
+        self.assertNotCached('/menus-api/section/?page=7')
+
+    def test_changing_menu_items_invalidates_the_menu(self):
+        self.get_json('/menus-api/main/')
+        self.get_json('/menus-api/flat/footer/')
+        MainMenuItem.objects.filter(link_page_id=18).update(link_text='Contact')
+        MainMenuItem.objects.get(link_page_id=18).save()
+        utils.run_on_commit_callbacks()
+        data = self.get_json('/menus-api/main/')
+        self.assertIn('Contact', [item['text'] for item in data['items']])
+        self.assertCached('/menus-api/flat/footer/')
+
+    def test_menus_built_while_the_site_changes_are_not_stored(self):
+        def build():
+            # Simulate a page being published while the menu is being built
+            self.publish(8, 'Our history')
+            return {'type': 'main_menu', 'items': []}, {'page:8'}
+
+        menu_cache.get_or_build('test', self.site, build)
+        self.assertIsNone(menu_cache.get('test'))
+        menu_cache.get_or_build('test', self.site, build)
+        self.assertIsNone(menu_cache.get('test'))
+
+    def test_entries_are_invalidated_when_dependency_tokens_are_lost(self):
+        data = {'type': 'main_menu', 'items': []}
+        menu_cache.set('test', data, {'page:8'})
+        self.assertEqual(menu_cache.get('test'), data)
+        cache.delete(menu_cache_module.DEPENDENCY_CACHE_KEY % 'page:8')
+        self.assertIsNone(menu_cache.get('test'))
+
+    def test_cache_is_not_used_by_default(self):
+        with override_settings(WAGTAILMENUS_USE_MENU_CACHE=False):
+            self.get_json('/menus-api/main/')
+            self.assertNotCached('/menus-api/main/')
+
+
+class TestMenuCacheRebuilds(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.local.clear()
+        menu_cache.reset_stats()
+        self.site = Site.objects.get(is_default_site=True)
+        self.old_data = {'type': 'main_menu', 'items': []}
+        self.new_data = {'type': 'main_menu', 'items': [], 'updated': True}
+
+    def build(self):
+        return self.new_data, {'page:8'}
+
+    def fail_to_build(self):
+        self.fail("The menu should not have been rebuilt")
+
+    def set_stale_entry(self):
+        menu_cache.set('test', self.old_data, {'page:8'})
+        menu_cache_module.invalidate_dependencies(['page:8'])
+
+    def test_stale_data_is_used_while_another_process_rebuilds_the_menu(self):
+        self.set_stale_entry()
+        lock = menu_cache.acquire_lock('test')
+        self.assertIsNotNone(lock)
+        self.assertEqual(
+            menu_cache.get_or_build('test', self.site, self.fail_to_build), (self.old_data, False)
+        )
+        menu_cache.release_lock('test', lock)
+        self.assertEqual(menu_cache.get_or_build('test', self.site, self.build), (self.new_data, True))
+        self.assertEqual(menu_cache.get_or_build('test', self.site, self.fail_to_build), (self.new_data, True))
+        self.assertEqual(menu_cache.get_stats(), {
+            'local_hits': 1, 'hits': 0, 'misses': 1, 'stale': 1,
+        })
+
+    def test_expired_data_is_used_while_another_process_rebuilds_the_menu(self):
+        with override_settings(WAGTAILMENUS_MENU_CACHE_TIMEOUT=0):
+            menu_cache.set('test', self.old_data, {'page:8'})
+        self.assertIsNone(menu_cache.get('test'))
+        menu_cache.acquire_lock('test')
+        self.assertEqual(
+            menu_cache.get_or_build('test', self.site, self.fail_to_build), (self.old_data, False)
+        )
+
+    def test_tokens_are_read_before_rebuilding(self):
+        self.set_stale_entry()
+
+        def build():
+            # Simulate the page being changed while the menu is being built
+            menu_cache_module.invalidate_dependencies(['page:8'])
+            return self.build()
+
+        self.assertEqual(menu_cache.get_or_build('test', self.site, build), (self.new_data, True))
+        self.assertIsNone(menu_cache.get('test'))
+
+    def test_supplied_tokens_are_stored(self):
+        tokens = menu_cache.get_tokens({'page:8'})
+        menu_cache_module.invalidate_dependencies(['page:8'])
+        menu_cache.set('test', self.new_data, {'page:8', 'page:9'}, tokens)
+        self.assertIsNone(menu_cache.get('test'))
+        menu_cache.set('test', self.new_data, {'page:8', 'page:9'})
+        self.assertEqual(menu_cache.get('test'), self.new_data)
+
+    def test_locks_are_released_after_rebuilding(self):
+        self.set_stale_entry()
+
+        def build():
+            self.assertIsNone(menu_cache.acquire_lock('test'))
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            menu_cache.get_or_build('test', self.site, build)
+        self.assertIsNotNone(menu_cache.acquire_lock('test'))
+
+    def test_uncached_menus_are_built_if_another_process_takes_too_long(self):
+        menu_cache.acquire_lock('test')
+        with mock.patch.object(menu_cache_module, 'LOCK_WAIT', 0.1):
+            self.assertEqual(menu_cache.get_or_build('test', self.site, self.build), (self.new_data, True))
+        self.assertEqual(menu_cache.get_stats(), {
+            'local_hits': 0, 'hits': 0, 'misses': 1, 'stale': 0,
+        })
+
+    @override_settings(WAGTAILMENUS_MENU_CACHE_MAX_REBUILDS=1)
+    def test_stale_data_is_used_when_too_many_menus_are_being_rebuilt(self):
+        self.set_stale_entry()
+        semaphore = menu_cache.get_rebuild_semaphore()
+        semaphore.acquire()
+        try:
+            self.assertEqual(
+                menu_cache.get_or_build('test', self.site, self.fail_to_build), (self.old_data, False)
+            )
+        finally:
+            semaphore.release()
+        # The lock isn't held on to
+        self.assertEqual(menu_cache.get_or_build('test', self.site, self.build), (self.new_data, True))
+
+
+class TestLocalMenuCache(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.local.clear()
+        menu_cache.reset_stats()
+        self.site = Site.objects.get(is_default_site=True)
+        self.data = {'type': 'main_menu', 'items': []}
+
+    def build(self):
+        return self.data, {'page:8'}
+
+    def fail_to_build(self):
+        self.fail("The menu should not have been rebuilt")
+
+    def test_menus_are_reused_from_memory(self):
+        menu_cache.get_or_build('test', self.site, self.build)
+        cache.delete(menu_cache_module.MENU_CACHE_KEY % 'test')
+        self.assertIs(menu_cache.get_or_build('test', self.site, self.fail_to_build)[0], self.data)
+        self.assertEqual(menu_cache.get_stats()['local_hits'], 1)
+
+    def test_menus_in_memory_are_not_used_once_the_site_version_changes(self):
+        menu_cache.get_or_build('test', self.site, self.build)
+        versioning.bump_site_version(self.site)
+        self.assertEqual(
+            menu_cache.get_or_build('test', self.site, self.fail_to_build), (self.data, True)
+        )
+        self.assertEqual(menu_cache.get_stats(), {
+            'local_hits': 0, 'hits': 1, 'misses': 1, 'stale': 0,
+        })
+
+    @override_settings(WAGTAILMENUS_MENU_CACHE_LOCAL_SIZE=2)
+    def test_least_recently_used_menus_are_discarded(self):
+        local = menu_cache.local
+        for key in ('a', 'b'):
+            local.set(key, 1, self.data)
+        local.get('a', 1)
+        local.set('c', 1, self.data)
+        self.assertEqual(list(local.entries), ['a', 'c'])
+
+    @override_settings(WAGTAILMENUS_MENU_CACHE_LOCAL_TIMEOUT=0)
+    def test_menus_in_memory_expire(self):
+        menu_cache.local.set('test', 1, self.data)
+        self.assertIsNone(menu_cache.local.get('test', 1))
+
+    @override_settings(WAGTAILMENUS_MENU_CACHE_LOCAL_SIZE=0)
+    def test_menus_are_not_kept_in_memory_if_size_is_zero(self):
+        menu_cache.get_or_build('test', self.site, self.build)
+        self.assertFalse(menu_cache.local.entries)
+
+
+class TestMenuCacheVaryOn(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        menu_cache.local.clear()
+        menu_cache.reset_stats()
+        settings_override = override_settings(WAGTAILMENUS_USE_MENU_CACHE=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        @hooks.register('menus_modify_primed_menu_items')
+        def add_bucket_to_text(menu_items, request, current_level, **kwargs):
+            if current_level == 1:
+                bucket = request.META.get('HTTP_X_BUCKET', 'a')
+                for item in menu_items:
+                    item.text = '%s (%s)' % (item.text, bucket)
+            return menu_items
+
+        self.addCleanup(hooks._hooks.pop, 'menus_modify_primed_menu_items')
+        self.addCleanup(hooks._hooks.pop, 'menus_cache_vary_on', None)
+
+    def get_texts(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return [item['text'] for item in json.loads(response.content.decode())['items']]
+
+    def test_menus_are_cached_separately_for_each_value(self):
+        calls = []
+
+        @hooks.register('menus_cache_vary_on')
+        def vary_on_bucket(request, menu_tag, **kwargs):
+            calls.append(menu_tag)
+            return request.META.get('HTTP_X_BUCKET', 'a')
+
+        self.assertIn('Home (a)', self.get_texts('/menus-api/main/'))
+        self.assertIn('Home (b)', self.get_texts('/menus-api/main/', HTTP_X_BUCKET='b'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn('Home (a)', self.get_texts('/menus-api/main/'))
+            self.assertIn('Home (b)', self.get_texts('/menus-api/main/', HTTP_X_BUCKET='b'))
+        self.assertFalse([q for q in queries if 'FROM "wagtailcore_page"' in q['sql']])
+        self.assertEqual(calls, ['main_menu'] * 4)
+
+    def test_menus_are_not_cached_when_a_hook_returns_false(self):
+        @hooks.register('menus_cache_vary_on')
+        def do_not_cache(request, **kwargs):
+            return False
+
+        self.assertIn('Home (a)', self.get_texts('/menus-api/main/'))
+        self.assertIn('Home (b)', self.get_texts('/menus-api/main/', HTTP_X_BUCKET='b'))
+        self.assertEqual(menu_cache.get_stats()['misses'], 0)
+        self.assertEqual(menu_cache.get_stats()['local_hits'], 0)
+
+    def test_responses_that_vary_have_private_etags(self):
+        @hooks.register('menus_cache_vary_on')
+        def vary_on_bucket(request, **kwargs):
+            return request.META.get('HTTP_X_BUCKET', 'a')
+
+        response_a = self.client.get('/menus-api/main/')
+        response_b = self.client.get('/menus-api/main/', HTTP_X_BUCKET='b')
+        self.assertNotEqual(response_a['ETag'], response_b['ETag'])
+        for response in (response_a, response_b):
+            cache_control = set(response['Cache-Control'].split(', '))
+            self.assertIn('private', cache_control)
+            self.assertFalse([value for value in cache_control if 's-maxage' in value])
+
+        response = self.client.get(
+            '/menus-api/main/', HTTP_X_BUCKET='b', HTTP_IF_NONE_MATCH=response_a['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Home (b)', [item['text'] for item in json.loads(response.content.decode())['items']])
+        response = self.client.get(
+            '/menus-api/main/', HTTP_X_BUCKET='b', HTTP_IF_NONE_MATCH=response_b['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_responses_are_not_stored_when_a_hook_returns_false(self):
+        @hooks.register('menus_cache_vary_on')
+        def do_not_cache(request, **kwargs):
+            return False
+
+        response = self.client.get('/menus-api/main/')
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_vary_on_values(self):
+        site = Site.objects.get(is_default_site=True)
+        request = utils.RequestFactory().get('/')
+        self.assertEqual(menu_cache_module.get_cache_vary_on(MainMenu, request, site, {}), [])
+
+        hooks.register('menus_cache_vary_on', lambda **kwargs: None)
+        hooks.register('menus_cache_vary_on', lambda **kwargs: ['en', 2])
+        hooks.register('menus_cache_vary_on', lambda **kwargs: 'staff')
+        self.assertEqual(
+            menu_cache_module.get_cache_vary_on(MainMenu, request, site, {}),
+            ['en', '2', 'staff']
+        )
@@ -0,0 +1,153 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from wagtailmenus.errors import QueryBudgetExceeded
+from wagtailmenus.models import FlatMenu, MainMenu, SectionMenu, SubMenu
+from wagtailmenus.query_budgets import get_query_budget, record_menu_queries
+from wagtailmenus.testing import MenuQueryCountsMixin, UPDATE_QUERY_COUNTS_ENV_VAR
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+
+
+class TestQueryBudgets(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        # Some values are cached during the first request
+        self.client.get('/')
+
+    def get_home_page_counts(self):
+        with record_menu_queries() as counts:
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        return counts
+
+    def test_queries_are_recorded_by_tag(self):
+        counts = self.get_home_page_counts()
+        self.assertGreater(counts['main_menu'], 0)
+        self.assertIn('flat_menu:footer', counts)
+        # Queries for sub menus are counted for the menus they belong to
+        self.assertNotIn('sub_menu', counts)
+
+    @override_settings(WAGTAILMENUS_QUERY_BUDGET={
+        'wagtailmenus.models.menus.SectionMenu': 1,
+        'wagtailmenus.MainMenu': 2,
+        'flat_menu': 3,
+    })
+    def test_budgets_for_menu_classes_and_tags(self):
+        self.assertEqual(get_query_budget(SectionMenu), 1)
+        self.assertEqual(get_query_budget(MainMenu), 2)
+        self.assertEqual(get_query_budget(FlatMenu), 3)
+
+    @override_settings(WAGTAILMENUS_QUERY_BUDGET=5)
+    def test_budget_for_every_menu(self):
+        self.assertEqual(get_query_budget(SectionMenu), 5)
+        self.assertEqual(get_query_budget(MainMenu), 5)
+
+    def test_exceeding_budget_logs_queries(self):
+        with override_settings(
+            WAGTAILMENUS_QUERY_BUDGET={'main_menu': 0},
+            WAGTAILMENUS_QUERY_BUDGET_RAISE=False,
+        ):
+            with self.assertLogs('wagtailmenus.query_budgets', 'WARNING') as logs:
+                response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        # The main menu is rendered several times by the fixture templates
+        self.assertGreater(len(logs.output), 1)
+        for output in logs.output:
+            self.assertRegex(output, r'main_menu menu rendered using \d+ queries \(budget: 0\)')
+            self.assertIn('SELECT', output)
+
+    def test_exceeding_budget_raises_when_debug_is_true(self):
+        with override_settings(DEBUG=True, WAGTAILMENUS_QUERY_BUDGET={'main_menu': 0}):
+            with self.assertRaises(QueryBudgetExceeded), self.assertLogs('django.request'):
+                self.client.get('/')
+
+    def test_queries_for_sub_menus(self):
+        main_menu_count = self.get_home_page_counts()['main_menu']
+        original_prepare_to_render = SubMenu.prepare_to_render
+
+        def prepare_to_render(menu, *args, **kwargs):
+            # An extra query for every sub menu
+            Page.objects.count()
+            return original_prepare_to_render(menu, *args, **kwargs)
+
+        with mock.patch.object(SubMenu, 'prepare_to_render', prepare_to_render):
+            self.assertGreater(self.get_home_page_counts()['main_menu'], main_menu_count)
+            with override_settings(
+                WAGTAILMENUS_QUERY_BUDGET={'sub_menu': 0},
+                WAGTAILMENUS_QUERY_BUDGET_RAISE=True,
+            ):
+                with self.assertRaisesMessage(
+                    QueryBudgetExceeded, 'sub_menu menu rendered'
+                ), self.assertLogs('django.request'):
+                    self.client.get('/')
+
+    def test_budgets_are_ignored_when_queries_cannot_be_counted(self):
+        with mock.patch(
+            'wagtailmenus.query_budgets.queries_can_be_counted', return_value=False
+        ), override_settings(
+            WAGTAILMENUS_QUERY_BUDGET={'main_menu': 0},
+            WAGTAILMENUS_QUERY_BUDGET_RAISE=True,
+        ):
+            with self.assertWarnsRegex(RuntimeWarning, "main_menu menu can't be counted"):
+                response = self.client.get('/')
+            with record_menu_queries() as counts:
+                self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(counts, {})
+
+    def test_menus_within_budget(self):
+        with override_settings(
+            WAGTAILMENUS_QUERY_BUDGET=100, WAGTAILMENUS_QUERY_BUDGET_RAISE=True
+        ):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+
+
+class TestMenuQueryCountsMixin(MenuQueryCountsMixin, TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.menu_query_counts_file = os.path.join(tmp_dir, 'counts.json')
+        self.client.get('/')
+
+    def test_counts_are_written_then_compared(self):
+        with self.assertMenuQueryCounts('home'):
+            self.client.get('/')
+        snapshot = self.read_menu_query_counts()
+        self.assertGreater(snapshot['TestMenuQueryCountsMixin.home']['main_menu'], 0)
+
+        with self.assertMenuQueryCounts('home'):
+            self.client.get('/')
+
+        snapshot['TestMenuQueryCountsMixin.home']['main_menu'] -= 1
+        self.write_menu_query_counts(snapshot)
+        with self.assertRaisesMessage(AssertionError, 'main_menu: '):
+            with self.assertMenuQueryCounts('home'):
+                self.client.get('/')
+
+        with mock.patch.dict(os.environ, {UPDATE_QUERY_COUNTS_ENV_VAR: '1'}):
+            with self.assertMenuQueryCounts('home'):
+                self.client.get('/')
+        with open(self.menu_query_counts_file) as f:
+            self.assertEqual(
+                json.load(f)['TestMenuQueryCountsMixin.home']['main_menu'],
+                snapshot['TestMenuQueryCountsMixin.home']['main_menu'] + 1
+            )
+
+    def test_counts_are_not_checked_when_queries_cannot_be_counted(self):
+        with mock.patch('wagtailmenus.query_budgets.queries_can_be_counted', return_value=False), \
+                mock.patch('wagtailmenus.testing.queries_can_be_counted', return_value=False):
+            with self.assertWarnsRegex(RuntimeWarning, "'TestMenuQueryCountsMixin.home' weren't checked"):
+                with self.assertMenuQueryCounts('home'):
+                    self.client.get('/')
+        self.assertFalse(os.path.exists(self.menu_query_counts_file))
@@ -1,4 +1,6 @@
+from django.template import engines
 from django.test import TestCase
+from django.test.client import RequestFactory
 
 from wagtailmenus.models import SectionMenu
 from wagtailmenus.tests import base, utils
@@ -40,3 +42,69 @@ class TestGetTemplateNames(
     base.GetTemplateNamesMethodTestCase
     """
     expected_default_result_length = 3
+
+
+class TestActiveTrailOnly(TestCase):
+    fixtures = ['test.json']
+
+    def get_prepared_menu(self, current_page_url, max_levels=3, **extra):
+        current_page = Page.objects.get(url_path='/home' + current_page_url)
+        menu = SectionMenu(
+            root_page=Page.objects.get(url_path='/home/about-us/'),
+            max_levels=max_levels,
+        )
+        menu._contextual_vals = utils.make_contextualvals_instance(
+            url=current_page_url, current_page=current_page,
+        )
+        menu._option_vals = utils.make_optionvals_instance(
+            max_levels=max_levels, extra=extra,
+        )
+        return menu
+
+    def get_displayed_urls(self, menu):
+        return sorted(p.url_path for p in menu.get_pages_for_display())
+
+    def test_all_pages_are_displayed_by_default(self):
+        menu = self.get_prepared_menu('/about-us/our-heritage/')
+        self.assertIn(
+            '/home/about-us/meet-the-team/staff-member-one/',
+            self.get_displayed_urls(menu)
+        )
+
+    def test_only_the_active_trail_is_expanded(self):
+        menu = self.get_prepared_menu('/about-us/our-heritage/', active_trail_only=True)
+        self.assertEqual(
+            self.get_displayed_urls(menu),
+            sorted(
+                p.url_path for p in
+                Page.objects.get(url_path='/home/about-us/').get_children().live().in_menu()
+            )
+        )
+
+        menu = self.get_prepared_menu('/about-us/meet-the-team/', active_trail_only=True)
+        displayed_urls = self.get_displayed_urls(menu)
+        self.assertIn('/home/about-us/our-heritage/', displayed_urls)
+        self.assertIn('/home/about-us/meet-the-team/staff-member-one/', displayed_urls)
+
+    def test_active_trail_respects_max_levels(self):
+        menu = self.get_prepared_menu(
+            '/about-us/meet-the-team/', max_levels=1, active_trail_only=True)
+        self.assertNotIn(
+            '/home/about-us/meet-the-team/staff-member-one/',
+            self.get_displayed_urls(menu)
+        )
+
+    def render_section_menu(self, url):
+        request = RequestFactory().get(url)
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(url_path='/home' + url)
+        template = engines['django'].from_string(
+            '{% load menu_tags %}{% section_menu max_levels=3 active_trail_only=True %}'
+        )
+        return template.render({}, request)
+
+    def test_rendering(self):
+        html = self.render_section_menu('/about-us/meet-the-team/staff-member-one/')
+        self.assertIn('/about-us/meet-the-team/staff-member-two/', html)
+        html = self.render_section_menu('/about-us/our-heritage/')
+        self.assertIn('/about-us/meet-the-team/', html)
+        self.assertNotIn('/about-us/meet-the-team/staff-member-two/', html)
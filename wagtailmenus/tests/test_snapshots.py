@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipIf
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from wagtail.core import hooks
+
+from wagtailmenus import snapshots, versioning
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+Site = utils.get_site_model()
+
+
+class TestMenuSnapshots(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        self.site = Site.objects.get(is_default_site=True)
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_dir)
+        settings_override = override_settings(
+            WAGTAILMENUS_SNAPSHOT_DIR=self.snapshot_dir,
+            WAGTAILMENUS_SNAPSHOT_CHECK_INTERVAL=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        snapshots.reader.clear()
+        self.addCleanup(snapshots.reader.clear)
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())
+
+    def is_page_query(self, sql):
+        return 'FROM "wagtailcore_page"' in sql
+
+    def get_live_json(self, url):
+        with override_settings(WAGTAILMENUS_SNAPSHOT_DIR=None):
+            return self.get_json(url)
+
+    def test_api_responses_match_live_responses(self):
+        for url in ('/menus-api/main/', '/menus-api/flat/footer/'):
+            self.assertEqual(self.get_json(url), self.get_live_json(url))
+        self.assertTrue(os.path.exists(snapshots.get_snapshot_path(self.site.pk)))
+
+    def test_snapshots_are_not_used_when_options_are_supplied(self):
+        self.get_json('/menus-api/main/')
+        with CaptureQueriesContext(connection) as queries:
+            self.get_json('/menus-api/main/?max_levels=1')
+        self.assertTrue(any(self.is_page_query(q['sql']) for q in queries))
+
+    def test_snapshot_data_is_served_without_page_queries(self):
+        self.get_json('/menus-api/main/')
+        with CaptureQueriesContext(connection) as queries:
+            self.get_json('/menus-api/main/')
+            self.get_json('/menus-api/flat/footer/')
+        self.assertFalse(any(self.is_page_query(q['sql']) for q in queries))
+
+    def test_snapshots_are_not_used_when_menus_vary_on_request_values(self):
+        self.get_json('/menus-api/main/')
+        hooks.register('menus_cache_vary_on', lambda request, **kwargs: 'en')
+        self.addCleanup(hooks._hooks.pop, 'menus_cache_vary_on')
+        with CaptureQueriesContext(connection) as queries:
+            self.get_json('/menus-api/main/')
+        self.assertTrue(any(self.is_page_query(q['sql']) for q in queries))
+
+    def test_unknown_flat_menu_handle(self):
+        self.assertEqual(
+            snapshots.get_snapshot_menu_data(self.site, 'flat:does-not-exist'), (None, None)
+        )
+        response = self.client.get('/menus-api/flat/does-not-exist/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_snapshot_file_contents(self):
+        path = snapshots.write_site_snapshot(self.site)
+        self.assertEqual(os.listdir(self.snapshot_dir), [os.path.basename(path)])
+        self.assertEqual(
+            snapshots.read_snapshot_version(path),
+            versioning.get_site_version(self.site)
+        )
+        snapshot = snapshots.MappedSnapshot(path)
+        self.assertIn(snapshots.MAIN_MENU_KEY, snapshot)
+        self.assertIn(snapshots.get_flat_menu_key('footer'), snapshot)
+        self.assertEqual(
+            snapshot.get(snapshots.MAIN_MENU_KEY),
+            snapshots.compile_site_menus(self.site)[snapshots.MAIN_MENU_KEY]
+        )
+
+    def test_snapshot_is_rebuilt_when_a_page_is_published(self):
+        self.get_json('/menus-api/main/')
+        page = Page.objects.get(pk=18).specific
+        page.title = 'Get in touch'
+        page.save_revision().publish()
+        utils.run_on_commit_callbacks()
+        data = self.get_json('/menus-api/main/')
+        self.assertIn('Get in touch', [item['text'] for item in data['items']])
+
+    def test_snapshot_versions_are_only_checked_periodically(self):
+        snapshot = snapshots.reader.get_snapshot(self.site)
+        versioning.bump_site_version(self.site)
+        with override_settings(WAGTAILMENUS_SNAPSHOT_CHECK_INTERVAL=60):
+            self.assertIs(snapshots.reader.get_snapshot(self.site), snapshot)
+        self.assertIsNot(snapshots.reader.get_snapshot(self.site), snapshot)
+
+    def test_previous_snapshot_is_used_while_another_thread_refreshes(self):
+        reader = snapshots.SnapshotReader()
+        snapshot = reader.get_snapshot(self.site)
+        refreshing = threading.Event()
+        finish = threading.Event()
+
+        def refresh(site, snapshot):
+            refreshing.set()
+            finish.wait(5)
+            return snapshot
+
+        with mock.patch.object(reader, 'refresh', refresh):
+            thread = threading.Thread(target=reader.get_snapshot, args=(self.site,))
+            thread.start()
+            self.assertTrue(refreshing.wait(5))
+            # Returned straight away, without waiting for the other thread
+            self.assertIs(reader.get_snapshot(self.site), snapshot)
+            finish.set()
+            thread.join()
+        self.assertEqual(reader.refreshing, set())
+
+    def test_menu_data_is_decoded_once_per_snapshot(self):
+        snapshot = snapshots.reader.get_snapshot(self.site)
+        with mock.patch.object(snapshots, 'unpack_menu', wraps=snapshots.unpack_menu) as unpack:
+            data = snapshot.get(snapshots.MAIN_MENU_KEY)
+            self.assertIs(snapshot.get(snapshots.MAIN_MENU_KEY), data)
+        self.assertEqual(unpack.call_count, 1)
+
+    def test_snapshots_rebuilt_by_other_processes_are_reused(self):
+        other_reader = snapshots.SnapshotReader()
+        snapshots.reader.get_snapshot(self.site)
+        versioning.bump_site_version(self.site)
+        new_snapshot = other_reader.get_snapshot(self.site)
+
+        self.assertFalse(snapshots.rebuild_site_snapshot(
+            self.site, versioning.get_site_version(self.site)
+        ))
+        snapshot = snapshots.reader.get_snapshot(self.site)
+        self.assertEqual(snapshot.file_id, new_snapshot.file_id)
+
+    @skipIf(snapshots.fcntl is None, "File locking is unavailable")
+    def test_snapshots_are_not_rebuilt_while_locked(self):
+        path = snapshots.get_snapshot_path(self.site.pk)
+        with open(path + '.lock', 'wb') as lock_file:
+            snapshots.fcntl.flock(lock_file, snapshots.fcntl.LOCK_EX)
+            self.assertFalse(snapshots.rebuild_site_snapshot(
+                self.site, versioning.get_site_version(self.site)
+            ))
+            self.assertIsNone(snapshots.reader.get_snapshot(self.site))
+        self.assertFalse(os.path.exists(path))
+
+        # Menus are rendered 'live' in the meantime
+        self.assertEqual(
+            self.get_json('/menus-api/main/'),
+            self.get_live_json('/menus-api/main/')
+        )
+
+    def test_etags_match_the_versions_snapshots_were_compiled_for(self):
+        main_etag = self.client.get('/menus-api/main/')['ETag']
+        footer_etag = self.client.get('/menus-api/flat/footer/')['ETag']
+        self.assertEqual(main_etag, '"%s.%s"' % (
+            self.site.pk, versioning.get_site_version(self.site)
+        ))
+        versioning.bump_versions([(self.site.pk, ''), (self.site.pk, 'footer')])
+        with override_settings(WAGTAILMENUS_SNAPSHOT_CHECK_INTERVAL=60):
+            # The previous snapshot is still in use
+            for url, etag in (
+                ('/menus-api/main/', main_etag),
+                ('/menus-api/flat/footer/', footer_etag),
+            ):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['ETag'], etag)
+        response = self.client.get('/menus-api/main/', HTTP_IF_NONE_MATCH=main_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], main_etag)
+        response = self.client.get('/menus-api/main/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_snapshots_are_compiled_for_anonymous_visitors(self):
+        users = []
+
+        def record_user(menu_items, request, **kwargs):
+            users.append(request.user)
+            return menu_items
+
+        hooks.register('menus_modify_primed_menu_items', record_user)
+        self.addCleanup(hooks._hooks.pop, 'menus_modify_primed_menu_items')
+        snapshots.compile_site_menus(self.site)
+        self.assertTrue(users)
+        self.assertTrue(all(user.is_anonymous for user in users))
@@ -0,0 +1,149 @@
+from unittest import mock, skipIf
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from wagtailmenus import signal_handlers, versioning
+from wagtailmenus.models import FlatMenu, MainMenu, MenuVersion
+from wagtailmenus.tests import utils
+
+Page = utils.get_page_model()
+Site = utils.get_site_model()
+
+
+class TestVersioning(TestCase):
+    fixtures = ['test.json']
+
+    def setUp(self):
+        cache.clear()
+        # A site with a root page outside of the default site
+        Site.objects.create(
+            pk=3,
+            hostname='other.wagtailmenus.co.uk',
+            root_page_id=2,
+        )
+        self.other_site_page = Page.objects.get(pk=2).add_child(
+            instance=Page(title='Other site page', slug='other-site-page'))
+
+    def get_versions(self, *keys):
+        return [versioning.get_version(site_id, handle) for site_id, handle in keys]
+
+    def assertVersionsChanged(self, func, changed=(), unchanged=()):
+        changed_before = self.get_versions(*changed)
+        unchanged_before = self.get_versions(*unchanged)
+        func()
+        utils.run_on_commit_callbacks()
+        for key, before, after in zip(changed, changed_before, self.get_versions(*changed)):
+            self.assertGreater(after, before, "Version %r did not increase" % (key,))
+        self.assertEqual(self.get_versions(*unchanged), unchanged_before)
+
+    def test_versions_are_stable_until_bumped(self):
+        version = versioning.get_site_version(1)
+        self.assertEqual(versioning.get_site_version(1), version)
+        versioning.bump_site_version(1)
+        self.assertEqual(versioning.get_site_version(1), version + 1)
+
+    def test_versions_are_read_from_the_cache(self):
+        versioning.get_site_version(1)
+        with self.assertNumQueries(0):
+            versioning.get_site_version(1)
+
+    def test_versions_survive_cache_clearing(self):
+        versioning.bump_site_version(1)
+        version = versioning.get_site_version(1)
+        cache.clear()
+        self.assertEqual(versioning.get_site_version(1), version)
+        self.assertEqual(MenuVersion.objects.get(site_id=1, handle='').version, version)
+
+    def test_new_versions_are_never_lower_than_lost_ones(self):
+        version = versioning.get_site_version(1)
+        MenuVersion.objects.all().delete()
+        cache.clear()
+        self.assertGreaterEqual(versioning.get_site_version(1), version)
+
+    def test_bumped_versions_are_cached(self):
+        version = versioning.get_site_version(1)
+        versioning.bump_site_version(1)
+        with self.assertNumQueries(0):
+            self.assertEqual(versioning.get_site_version(1), version + 1)
+
+    def test_earlier_versions_read_during_bump_are_not_cached(self):
+        # A reader fetches the current value from the database (after it
+        # expires from the cache), but caches it after a bump has happened
+        versioning.get_site_version(1)
+        cache.clear()
+        old_version = MenuVersion.objects.get(site_id=1, handle='').version
+        versioning.bump_site_version(1)
+        cache.add(versioning.get_cache_key(1), old_version)
+        self.assertEqual(versioning.get_site_version(1), old_version + 1)
+
+    def test_saving_other_models_does_not_bump_versions(self):
+        with mock.patch.object(signal_handlers, 'bump_versions_for_menu') as bump:
+            Site.objects.get(pk=1).save()
+            MainMenu.objects.get(site_id=1).save()
+        self.assertEqual(bump.call_count, 1)
+
+    def test_main_menu_changes(self):
+        menu = MainMenu.objects.get(site_id=1)
+        item = menu.get_menu_items_manager().first()
+        self.assertVersionsChanged(
+            menu.save, changed=[(1, '')], unchanged=[(2, ''), (1, 'footer')])
+        self.assertVersionsChanged(
+            item.save, changed=[(1, '')], unchanged=[(2, ''), (1, 'footer')])
+        self.assertVersionsChanged(
+            item.delete, changed=[(1, '')], unchanged=[(2, ''), (1, 'footer')])
+
+    def test_flat_menu_changes(self):
+        menu = FlatMenu.objects.get(site_id=1, handle='footer')
+        item = menu.get_menu_items_manager().first()
+        # Other sites can fall back to using the default site's menus
+        changed = [(1, ''), (1, 'footer'), (2, ''), (2, 'footer')]
+        unchanged = [(1, 'contact'), (2, 'contact')]
+        self.assertVersionsChanged(menu.save, changed=changed, unchanged=unchanged)
+        self.assertVersionsChanged(item.save, changed=changed, unchanged=unchanged)
+
+    def test_flat_menu_changes_for_non_default_site(self):
+        menu = FlatMenu.objects.create(site_id=2, handle='footer', title='Footer')
+        self.assertVersionsChanged(
+            menu.save,
+            changed=[(2, ''), (2, 'footer')],
+            unchanged=[(1, ''), (1, 'footer'), (2, 'contact')],
+        )
+
+    def test_page_publishing(self):
+        page = Page.objects.get(url_path='/home/superheroes/')
+        # Site 3 could use the default site's flat menus, so is also affected
+        self.assertVersionsChanged(
+            lambda: page.save_revision().publish(),
+            changed=[(1, ''), (1, 'footer'), (2, ''), (2, 'contact'), (3, ''), (3, 'footer')],
+        )
+        self.assertVersionsChanged(
+            page.unpublish, changed=[(1, ''), (2, ''), (3, '')])
+
+    def test_page_publishing_for_non_default_site(self):
+        page = self.other_site_page
+        self.assertVersionsChanged(
+            lambda: page.save_revision().publish(),
+            changed=[(3, '')],
+            unchanged=[(1, ''), (1, 'footer'), (2, ''), (3, 'footer')],
+        )
+
+    @skipIf(signal_handlers.post_page_move is None, "Page move signals are not available")
+    def test_page_moves(self):
+        page = self.other_site_page
+        new_parent = Page.objects.get(url_path='/home/about-us/')
+        self.assertVersionsChanged(
+            lambda: page.move(new_parent, pos='last-child'),
+            changed=[(1, ''), (2, ''), (3, '')],
+        )
+
+    def test_page_deletion(self):
+        self.assertVersionsChanged(
+            self.other_site_page.delete,
+            changed=[(3, '')],
+            unchanged=[(1, ''), (2, '')],
+        )
+        self.assertVersionsChanged(
+            Page.objects.get(url_path='/home/superheroes/').delete,
+            changed=[(1, ''), (2, '')],
+        )
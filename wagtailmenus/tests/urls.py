@@ -6,6 +6,7 @@ from wagtail.core import urls as wagtail_urls
 
 urlpatterns = [
     url(r'^admin/', include(wagtailadmin_urls)),
+    url(r'^menus-api/', include('wagtailmenus.api.urls')),
     url(r'^custom-url/$', TemplateView.as_view(template_name='page.html')),
     url(r'^sub_menu-tag-used-directly/$',
         TemplateView.as_view(template_name='sub_menu-tag-used-directly.html')),
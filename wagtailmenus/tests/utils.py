@@ -77,3 +77,19 @@ def make_contextualvals_instance(
         current_section_root_page,
         current_page_ancestor_ids,
     )
+
+
+def run_on_commit_callbacks(using='default'):
+    """
+    Run (and discard) callbacks registered with ``transaction.on_commit()``
+    as if the current transaction had been committed. Tests wrapped in a
+    transaction that is never committed (e.g. those using ``TestCase``) can
+    call this to have menu invalidations applied.
+    """
+    from django.db import connections
+    connection = connections[using]
+    while connection.run_on_commit:
+        callbacks, connection.run_on_commit = connection.run_on_commit, []
+        for callback in callbacks:
+            # (sids, func), or (sids, func, robust) on Django 4.2+
+            callback[1]()
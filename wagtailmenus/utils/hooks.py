@@ -0,0 +1,39 @@
+"""
+Wagtail's ``hooks.get_hooks()`` searches for and sorts registered functions
+every time it is called, which adds up when menus call it several times for
+every menu (and sub menu) rendered. The ``get_hooks()`` function below caches
+the result for each hook name instead, and only works it out again when the
+list of registrations for that name is replaced, or its length changes (e.g.
+because a function is registered or removed). Checking for that doesn't copy
+or compare any registrations.
+"""
+from wagtail.core import hooks
+
+_cache = {}
+
+
+def get_hooks(hook_name):
+    """
+    Return a list of functions registered for ``hook_name``, sorted by their
+    order (the same as ``wagtail.core.hooks.get_hooks()``).
+    """
+    all_registered = getattr(hooks, '_hooks', None)
+    if all_registered is None:
+        # Registrations are stored differently by this version of Wagtail,
+        # so results can't be cached safely
+        return hooks.get_hooks(hook_name)
+    # A list of (function, order) tuples (or None)
+    registered = all_registered.get(hook_name)
+    cached = _cache.get(hook_name)
+    if (
+        cached is not None and cached[0] is registered and
+        (registered is None or len(registered) == cached[1])
+    ):
+        return cached[2]
+    # Searches for hooks (the first time it's called) before sorting them
+    fns = hooks.get_hooks(hook_name)
+    registered = all_registered.get(hook_name)
+    _cache[hook_name] = (
+        registered, len(registered) if registered is not None else 0, fns
+    )
+    return fns
@@ -0,0 +1,137 @@
+"""
+Listing templates often render a ``{% children_menu %}`` for each of a number
+of pages (e.g. one per 'card'), and each menu would normally fetch its pages
+with a separate set of queries. The ``ChildrenLoader`` class below batches that
+work for a single request: parent pages can be queued in advance (using the
+``{% queue_children_menus %}`` tag, or ``queue_children_menus()`` in Python),
+and the first time any of their children are needed, pages for all queued
+parents are fetched together, with one query for each parent page depth.
+Results are reused by any other children menus of the same class rendered for
+the same pages during the request.
+
+Only pages that have been queued are loaded this way, and the loader isn't
+used at all when functions are registered for the
+``menus_modify_base_page_queryset`` hook (because those can return a
+different queryset for every menu).
+"""
+import copy
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from wagtailmenus.conf import settings
+
+REQUEST_ATTRIBUTE_NAME = '_wagtailmenus_children_loader'
+
+
+class ChildrenLoader:
+
+    def __init__(self):
+        # Queued parent pages (with the number of levels to load for each),
+        # keyed by path
+        self.queued = {}
+        # Lists of descendant pages for loaded parent pages (with the number
+        # of levels loaded), keyed by path, for each 'menu key' (see
+        # ``get_menu_key()``)
+        self.loaded = defaultdict(dict)
+
+    def queue(self, pages, max_levels):
+        """
+        Add ``pages`` to the list of parent pages to fetch descendants for
+        (down to ``max_levels``) the next time anything needs loading.
+        """
+        for page in pages:
+            queued_max_levels = self.queued.get(page.path, (page, 0))[1]
+            self.queued[page.path] = (page, max(max_levels, queued_max_levels))
+
+    def is_queued(self, page, max_levels):
+        """
+        Return a boolean indicating whether ``page`` has been queued, with
+        descendants down to at least ``max_levels``.
+        """
+        return self.queued.get(page.path, (page, 0))[1] >= max_levels
+
+    @staticmethod
+    def get_menu_key(menu):
+        """
+        Return a value identifying the menus that pages loaded for ``menu``
+        can be shared with: those of the same class, loading the same page
+        fields.
+        """
+        field_names = menu.get_page_fields_for_display()
+        if field_names is not None:
+            field_names = frozenset(field_names)
+        return (menu.__class__, field_names)
+
+    def get_pages(self, menu, parent_page, max_levels):
+        """
+        Return a list of 'specific' descendants of ``parent_page`` (which
+        must have been queued) down to ``max_levels``, for ``menu``, loading
+        them (along with those for any other queued pages) first if
+        necessary. Pages are copied, so that attributes set on them by one
+        menu are not seen by another.
+        """
+        loaded = self.loaded[self.get_menu_key(menu)]
+        if loaded.get(parent_page.path, (0, None))[0] < max_levels:
+            self.load(menu, loaded)
+        max_depth = parent_page.depth + max_levels
+        return [
+            copy.copy(page) for page in loaded[parent_page.path][1]
+            if page.depth <= max_depth
+        ]
+
+    def load(self, menu, loaded):
+        """
+        Fetch descendants for all queued parent pages that haven't already
+        been loaded into ``loaded`` (the results for ``menu``'s 'menu key'),
+        using the base page queryset and field selection for ``menu``, with
+        a single query for each parent page depth. The base page queryset
+        must not be modified by hooks, because results are shared with other
+        menus.
+        """
+        queryset = menu.get_base_page_queryset()
+        by_depth = defaultdict(list)
+        for path, (page, max_levels) in self.queued.items():
+            if loaded.get(path, (0, None))[0] < max_levels:
+                by_depth[page.depth].append((page, max_levels))
+
+        for depth, parents in by_depth.items():
+            max_levels = max(parent[1] for parent in parents)
+            results = {page.path: [] for page, _ in parents}
+            pages = menu.get_specific_pages(queryset.filter(
+                depth__gt=depth, depth__lte=depth + max_levels
+            ).filter(reduce(or_, (
+                Q(path__startswith=path) for path in results
+            ))))
+            # Parent pages at the same depth all have paths of the same length
+            path_length = len(parents[0][0].path)
+            for page in pages:
+                results[page.path[:path_length]].append(page)
+            for page, _ in parents:
+                loaded[page.path] = (max_levels, results[page.path])
+
+
+def get_children_loader(request, create=True):
+    """
+    Return the ``ChildrenLoader`` instance for ``request``, creating one if
+    necessary (and ``create`` is ``True``).
+    """
+    loader = getattr(request, REQUEST_ATTRIBUTE_NAME, None)
+    if loader is None and create and request is not None:
+        loader = ChildrenLoader()
+        setattr(request, REQUEST_ATTRIBUTE_NAME, loader)
+    return loader
+
+
+def queue_children_menus(request, pages, max_levels=None):
+    """
+    Queue ``pages`` to have their descendants fetched together the first time
+    a children menu is rendered for any of them during ``request``.
+    """
+    if max_levels is None:
+        max_levels = settings.DEFAULT_CHILDREN_MENU_MAX_LEVELS
+    loader = get_children_loader(request)
+    if loader is not None:
+        loader.queue(pages, max_levels)
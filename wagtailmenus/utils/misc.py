@@ -1,9 +1,60 @@
+import json
+import zlib
+
+from django.core import signing
+from django.db import close_old_connections, connections
 from django.http import Http404
 from wagtail.core.models import Page, Site
 
+from wagtailmenus.conf import constants
 from wagtailmenus.models.menuitems import MenuItem
 
 
+def menu_sync_to_async(func, thread_sensitive=True):
+    """
+    Return an async version of ``func`` (using ``asgiref.sync.sync_to_async()``).
+
+    When ``thread_sensitive`` is ``False``, ``func`` is called in a thread from
+    a pool, which opens database connections of its own. Those connections are
+    closed once ``func`` has finished, so that they aren't left open (one per
+    thread) for the lifetime of the process.
+    """
+    from asgiref.sync import sync_to_async
+    if thread_sensitive:
+        return sync_to_async(func, thread_sensitive=True)
+
+    def call_and_close_connections(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    return sync_to_async(call_and_close_connections, thread_sensitive=False)
+
+
+def flatten_context(context):
+    """
+    Return a dictionary of the values in ``context``, which could be a
+    Django ``Context``, a Jinja2 ``Context``, a dictionary, or ``None``.
+    """
+    try:
+        # Django template engine (or similar) Context
+        return context.flatten()
+    except AttributeError:
+        pass
+
+    try:
+        # Jinja2 Context
+        return context.get_all()
+    except AttributeError:
+        pass
+
+    if isinstance(context, dict):
+        return context.copy()
+
+    return {}
+
+
 def get_site_from_request(request, fallback_to_default=True):
     site = getattr(request, 'site', None)
     if isinstance(site, Site):
@@ -80,8 +131,8 @@ def derive_section_root(page):
     if no such page can be identified. Results are dependant on the
     value of the ``WAGTAILMENUS_SECTION_ROOT_DEPTH`` setting.
     """
-    from wagtailmenus.conf import settings
-    desired_depth = settings.SECTION_ROOT_DEPTH
+    from wagtailmenus.conf.snapshot import get_settings_snapshot
+    desired_depth = get_settings_snapshot().SECTION_ROOT_DEPTH
     if page.depth == desired_depth:
         return page.specific
     if page.depth > desired_depth:
@@ -89,7 +140,7 @@ def derive_section_root(page):
 
 
 def validate_supplied_values(tag, max_levels=None, parent_page=None,
-                             menuitem_or_page=None):
+                             menuitem_or_page=None, limit=None):
     if max_levels is not None:
         if max_levels not in (1, 2, 3, 4, 5):
             raise ValueError(
@@ -110,3 +161,31 @@ def validate_supplied_values(tag, max_levels=None, parent_page=None,
                 "`MenuItem` instance. A value of type `%s` was supplied." %
                 (tag, menuitem_or_page.__class__)
             )
+    if limit is not None:
+        if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+            raise ValueError(
+                "The `%s` tag expects `limit` to be a positive integer. "
+                "Please review your template." % tag
+            )
+
+
+def dumps_lazy_sub_menu_options(options):
+    """
+    Return a compact, signed string representation of the ``options`` dict,
+    for including in lazy-loaded sub menu URLs. Unlike
+    ``django.core.signing.dumps()``, the value is not timestamped, so the same
+    options always result in the same URL (which is important for caching).
+    """
+    data = json.dumps(options, separators=(',', ':'), sort_keys=True)
+    value = signing.b64_encode(zlib.compress(data.encode())).decode()
+    return signing.Signer(salt=constants.LAZY_SUB_MENU_SIGNING_SALT).sign(value)
+
+
+def loads_lazy_sub_menu_options(value):
+    """
+    Reverse of ``dumps_lazy_sub_menu_options()``. Raises
+    ``django.core.signing.BadSignature`` if the signature is invalid.
+    """
+    signer = signing.Signer(salt=constants.LAZY_SUB_MENU_SIGNING_SALT)
+    value = signer.unsign(value)
+    return json.loads(zlib.decompress(signing.b64_decode(value.encode())).decode())
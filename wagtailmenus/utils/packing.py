@@ -0,0 +1,192 @@
+"""
+A compact binary format for 'compiled' menus (the dictionaries returned by
+``Menu.as_dict()``), for storing menus in caches and snapshot files without
+pickling model instances. Menu items are flattened into a series of parallel
+arrays (in depth-first order), and every string value is stored once in a
+shared string table, so repeated values (such as active classes) cost only
+a few bytes per item.
+
+Layout (all values little-endian)::
+
+    header      magic, format version, index size, item count,
+                string count, string table length, index of the 'menu
+                values' string
+    page_ids    uint32 per item (0 where the item has no page)
+    parents     index per item (the index of the item's parent plus one,
+                or 0 for top-level items)
+    depths      uint8 per item (1 for top-level items)
+    flags       uint8 per item
+    strings     index per item for each of: text, href, active_class,
+                and any additional values (JSON-encoded)
+    offsets     uint32 per string (plus one), in characters
+    table       all strings, concatenated and UTF-8 encoded
+
+'Index' values are stored as uint16 where the numbers of items and strings
+allow it, or uint32 otherwise.
+
+Arrays are read with ``struct.unpack_from()``, so data can be decoded
+directly from a memory-mapped file without copying it first.
+"""
+import json
+import struct
+
+MAGIC = b'WMNU'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBIIII')
+
+# Item flags
+HAS_CHILDREN = 1
+HAS_NO_PAGE = 2
+
+ITEM_KEYS = frozenset(('text', 'href', 'page_id', 'active_class', 'children'))
+
+INDEX_CODES = {2: 'H', 4: 'I'}
+
+
+def pack_menu(data):
+    """
+    Return a compact binary representation of ``data`` (a dictionary returned
+    by a menu's ``as_dict()`` method) as bytes.
+    """
+    # String index 0 is reserved for None
+    strings = {None: 0}
+
+    def get_string_index(value):
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    page_ids = []
+    parents = []
+    depths = []
+    flags = []
+    string_indexes = [[], [], [], []]
+    texts, hrefs, active_classes, extras = string_indexes
+
+    stack = [(item, 0, 1) for item in reversed(data['items'])]
+    while stack:
+        item, parent, depth = stack.pop()
+        # Parent values are offset by one, so that 0 can mean 'no parent'
+        index = len(page_ids) + 1
+        item_flags = 0
+        page_id = item.get('page_id')
+        if page_id is None:
+            item_flags |= HAS_NO_PAGE
+            page_id = 0
+        children = item.get('children')
+        if children is not None:
+            item_flags |= HAS_CHILDREN
+            stack.extend((child, index, depth + 1) for child in reversed(children))
+        extra = None
+        if item.keys() - ITEM_KEYS:
+            extra = {key: value for key, value in item.items() if key not in ITEM_KEYS}
+        page_ids.append(page_id)
+        parents.append(parent)
+        depths.append(depth)
+        flags.append(item_flags)
+        texts.append(get_string_index(item.get('text')))
+        hrefs.append(get_string_index(item.get('href')))
+        active_classes.append(get_string_index(item.get('active_class')))
+        extras.append(get_string_index(
+            json.dumps(extra, separators=(',', ':')) if extra is not None else None
+        ))
+
+    # Values other than items are stored as a single JSON string, with a
+    # placeholder for 'items', so that the original key order is kept
+    menu_values = dict(data, items=None)
+    menu_values_index = get_string_index(json.dumps(menu_values, separators=(',', ':')))
+
+    string_list = list(strings)
+    string_list[0] = ''
+    offsets = [0]
+    for value in string_list:
+        offsets.append(offsets[-1] + len(value))
+    table = ''.join(string_list).encode('utf-8')
+
+    count = len(page_ids)
+    index_size = 2 if max(count, len(string_list)) <= 0xFFFF else 4
+    index_code = INDEX_CODES[index_size]
+    return b''.join((
+        HEADER.pack(
+            MAGIC, FORMAT_VERSION, index_size, count, len(string_list),
+            len(table), menu_values_index
+        ),
+        struct.pack('<%dI' % count, *page_ids),
+        struct.pack('<%d%s' % (count, index_code), *parents),
+        struct.pack('<%dB' % count, *depths),
+        struct.pack('<%dB' % count, *flags),
+        struct.pack(
+            '<%d%s' % (count * 4, index_code),
+            *texts, *hrefs, *active_classes, *extras
+        ),
+        struct.pack('<%dI' % len(offsets), *offsets),
+        table,
+    ))
+
+
+def unpack_menu(buffer, offset=0):
+    """
+    Return the dictionary represented by packed menu data found in
+    ``buffer`` (any object supporting the buffer protocol, such as ``bytes``
+    or an ``mmap``), starting at ``offset``. Raises ``ValueError`` if the data
+    isn't in a compatible format.
+    """
+    try:
+        (
+            magic, format_version, index_size, count, string_count,
+            table_length, menu_values_index
+        ) = HEADER.unpack_from(buffer, offset)
+    except struct.error:
+        raise ValueError("The supplied data is not a packed menu.")
+    if magic != MAGIC:
+        raise ValueError("The supplied data is not a packed menu.")
+    if format_version != FORMAT_VERSION:
+        raise ValueError(
+            "Packed menus in format version %s are not supported (expected "
+            "version %s)." % (format_version, FORMAT_VERSION)
+        )
+    index_code = INDEX_CODES[index_size]
+    offset += HEADER.size
+    page_ids = struct.unpack_from('<%dI' % count, buffer, offset)
+    offset += 4 * count
+    parents = struct.unpack_from('<%d%s' % (count, index_code), buffer, offset)
+    # Depths aren't needed to rebuild the tree
+    offset += (index_size + 1) * count
+    flags = struct.unpack_from('<%dB' % count, buffer, offset)
+    offset += count
+    string_indexes = struct.unpack_from('<%d%s' % (count * 4, index_code), buffer, offset)
+    offset += 4 * index_size * count
+    offsets = struct.unpack_from('<%dI' % (string_count + 1), buffer, offset)
+    offset += 4 * (string_count + 1)
+    table = str(buffer[offset:offset + table_length], 'utf-8')
+    strings = [table[start:end] for start, end in zip(offsets, offsets[1:])]
+    strings[0] = None
+
+    data = json.loads(strings[menu_values_index])
+    data['items'] = items = []
+    # Lists of children for each item (if it has any), with top-level items
+    # at index 0
+    children_lists = [items]
+    for page_id, parent, item_flags, text, href, active_class, extra in zip(
+        page_ids, parents, flags,
+        string_indexes[:count],
+        string_indexes[count:count * 2],
+        string_indexes[count * 2:count * 3],
+        string_indexes[count * 3:],
+    ):
+        item = {
+            'text': strings[text],
+            'href': strings[href],
+            'page_id': None if item_flags & HAS_NO_PAGE else page_id,
+            'active_class': strings[active_class],
+        }
+        if extra:
+            item.update(json.loads(strings[extra]))
+        if item_flags & HAS_CHILDREN:
+            item['children'] = children = []
+            children_lists.append(children)
+        else:
+            children_lists.append(None)
+        children_lists[parent].append(item)
+    return data
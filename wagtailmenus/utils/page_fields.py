@@ -0,0 +1,86 @@
+"""
+By default, menus fetch complete 'specific' page objects, which can include
+large values (such as StreamField content) that menus never use. When a list
+of fields is supplied via the ``WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS`` setting
+(or a menu class's ``page_fields_for_display`` attribute), the functions below
+are used to only load those fields (plus any that wagtailmenus itself, or
+functions registered for the ``menus_page_fields`` hook, need) from the base
+and specific page tables.
+"""
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from wagtail.core.models import Page
+
+from wagtailmenus.conf import constants, settings
+from wagtailmenus.utils.hooks import get_hooks
+
+
+def get_hook_page_fields():
+    """
+    Return a list of page field names declared by functions registered for
+    the ``menus_page_fields`` hook.
+    """
+    return list(chain.from_iterable(
+        hook() for hook in get_hooks('menus_page_fields')
+    ))
+
+
+def get_page_fields_to_load(field_names):
+    """
+    Return a ``frozenset`` of names for all fields that should be loaded when
+    ``field_names`` are requested for a menu.
+    """
+    return frozenset(chain(
+        constants.REQUIRED_MENU_PAGE_FIELDS,
+        (settings.PAGE_FIELD_FOR_MENU_ITEM_TEXT,),
+        field_names,
+        get_hook_page_fields(),
+    ))
+
+
+@lru_cache(maxsize=None)
+def get_concrete_field_names(model):
+    return frozenset(f.name for f in model._meta.get_fields() if f.concrete)
+
+
+def get_page_models():
+    return [model for model in apps.get_models() if issubclass(model, Page)]
+
+
+def is_page_field(name):
+    """
+    Return a boolean indicating whether ``name`` is the name of a concrete
+    field on ``Page`` or any specific page model.
+    """
+    return any(
+        name in get_concrete_field_names(model) for model in get_page_models()
+    )
+
+
+def get_specific_pages(queryset, field_names):
+    """
+    Return a list of 'specific' pages matching ``queryset`` (in the same
+    order), with only fields from ``field_names`` loaded (names that aren't
+    fields of a specific page type are ignored for that type). Like
+    ``PageQuerySet.specific()``, one additional query is needed for each
+    page type.
+    """
+    pks_and_types = list(queryset.values_list('pk', 'content_type'))
+    pks_by_type = defaultdict(list)
+    for pk, content_type_id in pks_and_types:
+        pks_by_type[content_type_id].append(pk)
+
+    pages = {}
+    for content_type_id, pks in pks_by_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class() or Page
+        pages.update(
+            (page.pk, page) for page in model._default_manager.filter(
+                pk__in=pks
+            ).only(*(field_names & get_concrete_field_names(model)))
+        )
+    # Pages deleted in the meantime are left out
+    return [pages[pk] for pk, _ in pks_and_types if pk in pages]
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.test import TestCase
+from wagtail.core import hooks
+
+from wagtailmenus.models import MainMenu
+from wagtailmenus.tests import utils
+from wagtailmenus.utils.hooks import get_hooks
+
+
+class TestGetHooks(TestCase):
+    """Tests for wagtailmenus.utils.hooks.get_hooks()"""
+    hook_name = 'wagtailmenus_test_hook'
+
+    def tearDown(self):
+        hooks._hooks.pop(self.hook_name, None)
+
+    def test_result_is_cached(self):
+        self.assertEqual(get_hooks(self.hook_name), [])
+        self.assertIs(get_hooks(self.hook_name), get_hooks(self.hook_name))
+
+    def test_result_is_refreshed_when_hooks_change(self):
+        def first_hook():
+            pass
+
+        def second_hook():
+            pass
+
+        self.assertEqual(get_hooks(self.hook_name), [])
+        hooks.register(self.hook_name, second_hook, order=1)
+        self.assertEqual(get_hooks(self.hook_name), [second_hook])
+        hooks.register(self.hook_name, first_hook)
+        self.assertEqual(get_hooks(self.hook_name), [first_hook, second_hook])
+        del hooks._hooks[self.hook_name]
+        self.assertEqual(get_hooks(self.hook_name), [])
+
+    def test_result_is_refreshed_when_a_hook_is_removed(self):
+        def first_hook():
+            pass
+
+        def second_hook():
+            pass
+
+        hooks.register(self.hook_name, first_hook)
+        hooks.register(self.hook_name, second_hook)
+        self.assertEqual(get_hooks(self.hook_name), [first_hook, second_hook])
+        hooks._hooks[self.hook_name].remove((first_hook, 0))
+        self.assertEqual(get_hooks(self.hook_name), [second_hook])
+
+    def test_registrations_are_not_searched_or_sorted_when_cached(self):
+        get_hooks(self.hook_name)
+        with mock.patch.object(hooks, 'get_hooks') as wagtail_get_hooks:
+            get_hooks(self.hook_name)
+        self.assertFalse(wagtail_get_hooks.called)
+
+
+class TestMenuHookKwargs(TestCase):
+    fixtures = ['test.json']
+
+    def test_hook_kwargs_are_not_built_when_no_hooks_are_registered(self):
+        menu = MainMenu.objects.get(pk=1)
+        menu._contextual_vals = utils.make_contextualvals_instance(url='/')
+        menu._option_vals = utils.make_optionvals_instance()
+        menu.set_request(menu._contextual_vals.request)
+        menu.get_base_page_queryset()
+        menu.get_base_menuitem_queryset()
+        menu.get_menu_items_for_rendering()
+        self.assertNotIn('common_hook_kwargs', menu.__dict__)
@@ -0,0 +1,150 @@
+from unittest import mock
+
+from django.db import connection
+from django.template import engines
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from wagtailmenus.models import ChildrenMenu
+from wagtailmenus.tests import utils
+from wagtailmenus.utils.loaders import (
+    ChildrenLoader, get_children_loader, queue_children_menus
+)
+
+Page = utils.get_page_model()
+
+
+class TestChildrenLoader(TestCase):
+    """Tests for wagtailmenus.utils.loaders.ChildrenLoader"""
+    fixtures = ['test.json']
+
+    def setUp(self):
+        self.loader = ChildrenLoader()
+        self.menu = ChildrenMenu(parent_page=Page(), max_levels=2)
+        self.about_us = Page.objects.get(url_path='/home/about-us/')
+        self.legal = Page.objects.get(url_path='/home/legal/')
+        self.news = Page.objects.get(url_path='/home/news-and-events/')
+
+    def get_ids(self, parent_page, max_levels=2):
+        return [
+            page.id for page in
+            self.loader.get_pages(self.menu, parent_page, max_levels)
+        ]
+
+    def test_queued_pages_are_loaded_together(self):
+        self.loader.queue([self.about_us, self.legal], 2)
+        with self.assertNumQueries(2):
+            # One query for the pages, and one for 'specific' pages
+            self.assertEqual(self.get_ids(self.about_us), [7, 31, 32, 33, 8, 9])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_ids(self.legal), [20, 21, 22])
+            self.assertEqual(self.get_ids(self.about_us, max_levels=1), [7, 8, 9])
+
+    def test_pages_at_different_depths_are_loaded_separately(self):
+        meet_the_team = Page.objects.get(url_path='/home/about-us/meet-the-team/')
+        self.loader.queue([self.legal, meet_the_team], 1)
+        with self.assertNumQueries(4):
+            self.assertEqual(self.get_ids(self.legal, max_levels=1), [20, 21, 22])
+        self.assertEqual(self.get_ids(meet_the_team, max_levels=1), [31, 32, 33])
+
+    def test_more_levels_are_loaded_when_queued(self):
+        self.loader.queue([self.about_us], 1)
+        self.assertTrue(self.loader.is_queued(self.about_us, 1))
+        self.assertFalse(self.loader.is_queued(self.about_us, 2))
+        self.assertFalse(self.loader.is_queued(self.legal, 1))
+        self.assertEqual(self.get_ids(self.about_us, max_levels=1), [7, 8, 9])
+        self.loader.queue([self.about_us], 2)
+        self.assertTrue(self.loader.is_queued(self.about_us, 2))
+        self.assertEqual(self.get_ids(self.about_us), [7, 31, 32, 33, 8, 9])
+
+    def test_pages_are_loaded_separately_for_each_menu_class_and_fields(self):
+        class OtherChildrenMenu(ChildrenMenu):
+            pass
+
+        self.loader.queue([self.news], 1)
+        other_menu = OtherChildrenMenu(parent_page=Page(), max_levels=1)
+        other_fields_menu = ChildrenMenu(parent_page=Page(), max_levels=1)
+        other_fields_menu.page_fields_for_display = ['title']
+        expected = self.get_ids(self.news, max_levels=1)
+        for menu in (other_menu, other_fields_menu):
+            with CaptureQueriesContext(connection) as queries:
+                pages = self.loader.get_pages(menu, self.news, 1)
+            self.assertGreater(len(queries), 0)
+            self.assertEqual([page.id for page in pages], expected)
+        self.assertEqual(len(self.loader.loaded), 3)
+        with self.assertNumQueries(0):
+            self.get_ids(self.news, max_levels=1)
+
+    def test_pages_are_copied(self):
+        self.loader.queue([self.news], 1)
+        first = self.loader.get_pages(self.menu, self.news, 1)
+        second = self.loader.get_pages(self.menu, self.news, 1)
+        self.assertEqual(first, second)
+        first[0].text = 'Changed'
+        self.assertFalse(hasattr(second[0], 'text'))
+
+
+class TestGetChildrenLoader(TestCase):
+
+    def test_loader_is_stored_on_the_request(self):
+        request = RequestFactory().get('/')
+        self.assertIsNone(get_children_loader(request, create=False))
+        loader = get_children_loader(request)
+        self.assertIsInstance(loader, ChildrenLoader)
+        self.assertIs(get_children_loader(request), loader)
+
+    def test_no_request(self):
+        self.assertIsNone(get_children_loader(None))
+        # Queueing pages without a request does nothing
+        queue_children_menus(None, [Page()])
+
+
+class TestQueueChildrenMenusTag(TestCase):
+    fixtures = ['test.json']
+
+    def render(self, pages, queue=True):
+        request = RequestFactory().get('/')
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(url_path='/home/')
+        template = engines['django'].from_string(
+            '{% load menu_tags %}'
+            '{% if queue %}{% queue_children_menus pages max_levels=2 %}{% endif %}'
+            '{% for page in pages %}'
+            '{% children_menu page max_levels=2 template="menus/children_menu.html" %}'
+            '{% endfor %}'
+        )
+        return template.render({'pages': pages, 'queue': queue}, request)
+
+    def test_output_is_unchanged(self):
+        pages = list(Page.objects.filter(pk__in=(6, 14, 19)))
+        self.assertEqual(self.render(pages), self.render(pages, queue=False))
+
+    def test_loader_is_only_used_for_queued_pages(self):
+        pages = list(Page.objects.filter(pk__in=(6, 14)))
+        with mock.patch.object(ChildrenLoader, 'get_pages') as get_pages:
+            self.render(pages, queue=False)
+        get_pages.assert_not_called()
+
+    def test_loader_is_not_used_when_base_page_queryset_is_modified(self):
+        pages = list(Page.objects.filter(pk__in=(6, 14)))
+        expected = self.render(pages, queue=False)
+        with mock.patch(
+            'wagtailmenus.models.menus.get_hooks',
+            side_effect=lambda hook_name: (
+                [lambda queryset, **kwargs: queryset]
+                if hook_name == 'menus_modify_base_page_queryset' else []
+            )
+        ), mock.patch.object(ChildrenLoader, 'get_pages') as get_pages:
+            self.assertEqual(self.render(pages), expected)
+        get_pages.assert_not_called()
+
+    def test_number_of_queries_does_not_grow_with_number_of_menus(self):
+        about_us = Page.objects.get(url_path='/home/about-us/')
+        legal = Page.objects.get(url_path='/home/legal/')
+        # Populate the content type and site caches first
+        self.render([about_us])
+        with CaptureQueriesContext(connection) as single:
+            self.render([about_us])
+        with CaptureQueriesContext(connection) as multiple:
+            self.render([about_us, legal])
+        self.assertEqual(len(multiple), len(single))
@@ -0,0 +1,101 @@
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from wagtailmenus.models import FlatMenu, MainMenu
+from wagtailmenus.tests import utils
+from wagtailmenus.utils.packing import FORMAT_VERSION, HEADER, pack_menu, unpack_menu
+
+Page = utils.get_page_model()
+
+
+class TestPackedMenus(TestCase):
+    """Tests for wagtailmenus.utils.packing"""
+    fixtures = ['test.json']
+
+    def get_menu_data(self, menu_class, **option_values):
+        # Render as if viewing the 'Meet the team' page, so that items have
+        # a mixture of active classes
+        context = {
+            'request': RequestFactory().get('/about-us/meet-the-team/'),
+            'wagtailmenus_vals': {
+                'current_page': Page.objects.get(pk=7).specific,
+                'section_root': Page.objects.get(pk=6).specific,
+                'current_page_ancestor_ids': (6, 7),
+            },
+        }
+        values = dict(
+            max_levels=None,
+            apply_active_classes=True,
+            allow_repeating_parents=True,
+            use_absolute_page_urls=False,
+            add_sub_menus_inline=False,
+        )
+        values.update(option_values)
+        return menu_class._get_render_prepared_object(context, **values).as_dict()
+
+    def test_round_trip_main_menu(self):
+        data = self.get_menu_data(MainMenu)
+        unpacked = unpack_menu(pack_menu(data))
+        self.assertEqual(unpacked, data)
+        # Key order is preserved too
+        self.assertEqual(list(unpacked), list(data))
+        self.assertEqual(list(unpacked['items'][1]), list(data['items'][1]))
+
+    def test_round_trip_flat_menu(self):
+        data = self.get_menu_data(
+            FlatMenu, handle='footer', show_menu_heading=True,
+            fall_back_to_default_site_menus=False,
+        )
+        self.assertEqual(unpack_menu(pack_menu(data)), data)
+
+    def test_round_trip_items_without_pages_and_additional_values(self):
+        data = {
+            'type': 'children_menu',
+            'items': [
+                {'text': 'Ünïcödé', 'href': '/a/', 'page_id': 1, 'active_class': '', 'children': [
+                    {'text': 'Child', 'href': '/a/b/', 'page_id': 2, 'active_class': 'active', 'children': []},
+                    {'text': '3 more', 'href': '/a/', 'page_id': None, 'active_class': '', 'more_count': 3},
+                ]},
+                {'text': 'External', 'href': None, 'page_id': None, 'active_class': None},
+            ],
+        }
+        self.assertEqual(unpack_menu(pack_menu(data)), data)
+
+    def test_empty_menu(self):
+        data = {'type': 'main_menu', 'items': []}
+        self.assertEqual(unpack_menu(pack_menu(data)), data)
+
+    def test_unpacking_from_an_offset(self):
+        data = self.get_menu_data(MainMenu)
+        packed = pack_menu(data)
+        buffer = bytearray(b'ignored' + packed + b'also ignored')
+        self.assertEqual(unpack_menu(memoryview(buffer), offset=7), data)
+
+    def test_strings_are_only_stored_once(self):
+        item = {'text': 'Repeated text', 'href': '/repeated/', 'page_id': 1, 'active_class': ''}
+        one_item = pack_menu({'type': 'main_menu', 'items': [item]})
+        many_items = pack_menu({'type': 'main_menu', 'items': [item] * 100})
+        self.assertEqual(many_items.count(b'Repeated text'), 1)
+        # Each additional item only needs 4 bytes for its page id, 2 for its
+        # parent, 1 for its depth, 1 for its flags and 8 for string indexes
+        self.assertEqual(len(many_items) - len(one_item), 99 * 16)
+
+    def test_large_menus_use_wider_indexes(self):
+        data = {'type': 'main_menu', 'items': [
+            {'text': 'Page %s' % i, 'href': '/page-%s/' % i, 'page_id': i, 'active_class': ''}
+            for i in range(1, 40000)
+        ]}
+        packed = pack_menu(data)
+        self.assertEqual(HEADER.unpack_from(packed)[2], 4)
+        self.assertEqual(unpack_menu(packed), data)
+
+    def test_invalid_data(self):
+        packed = pack_menu({'type': 'main_menu', 'items': []})
+        with self.assertRaisesMessage(ValueError, "not a packed menu"):
+            unpack_menu(b'WMN')
+        with self.assertRaisesMessage(ValueError, "not a packed menu"):
+            unpack_menu(b'JUNK' + packed[4:])
+        wrong_version = bytearray(packed)
+        wrong_version[4] = FORMAT_VERSION + 1
+        with self.assertRaisesMessage(ValueError, "format version"):
+            unpack_menu(bytes(wrong_version))
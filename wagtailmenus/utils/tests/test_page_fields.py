@@ -0,0 +1,77 @@
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from wagtail.core import hooks
+
+from wagtailmenus.models import MainMenu
+from wagtailmenus.tests import utils
+from wagtailmenus.tests.models import TopLevelPage
+from wagtailmenus.utils.page_fields import (
+    get_page_fields_to_load, get_specific_pages, is_page_field
+)
+
+Page = utils.get_page_model()
+
+
+class TestPageFields(TestCase):
+    """Tests for wagtailmenus.utils.page_fields"""
+    fixtures = ['test.json']
+
+    def test_get_page_fields_to_load(self):
+        fields = get_page_fields_to_load(['title_de'])
+        self.assertIn('title_de', fields)
+        self.assertIn('path', fields)
+        self.assertIn('repeat_in_subnav', fields)
+
+        hooks.register('menus_page_fields', lambda: ['title_fr'])
+        try:
+            self.assertIn('title_fr', get_page_fields_to_load([]))
+        finally:
+            hooks._hooks.pop('menus_page_fields')
+
+    def test_is_page_field(self):
+        self.assertTrue(is_page_field('title'))
+        self.assertTrue(is_page_field('publish_date'))
+        self.assertFalse(is_page_field('not_a_field'))
+        self.assertFalse(is_page_field('relative_url'))
+
+    def test_get_specific_pages(self):
+        queryset = Page.objects.filter(depth=3).order_by('-path')
+        with self.assertNumQueries(3):
+            pages = get_specific_pages(queryset, frozenset(['title', 'path', 'title_de']))
+        self.assertEqual(pages, list(queryset.specific()))
+        about_us = pages[-1]
+        self.assertIsInstance(about_us, TopLevelPage)
+        deferred_fields = about_us.get_deferred_fields()
+        self.assertNotIn('title_de', deferred_fields)
+        self.assertIn('title_fr', deferred_fields)
+        self.assertIn('search_description', deferred_fields)
+
+
+class TestMenusWithPageFields(TestCase):
+    fixtures = ['test.json']
+
+    def render(self):
+        request = RequestFactory().get('/about-us/')
+        request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(url_path='/home/about-us/')
+        template = engines['django'].from_string(
+            '{% load menu_tags %}'
+            '{% main_menu max_levels=3 template="menus/main_menu.html" %}'
+            '{% section_menu max_levels=3 %}'
+            '{% children_menu max_levels=2 template="menus/children_menu.html" %}'
+        )
+        return template.render({}, request)
+
+    def test_output_is_unchanged(self):
+        expected = self.render()
+        with override_settings(WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS=()):
+            self.assertEqual(self.render(), expected)
+
+    def test_page_fields_for_display(self):
+        menu = MainMenu.objects.get(pk=1)
+        menu._option_vals = utils.make_optionvals_instance(max_levels=2)
+        self.assertIsNone(menu.get_page_fields_for_display())
+        with override_settings(WAGTAILMENUS_PAGE_FIELDS_FOR_MENUS=['title_de']):
+            self.assertIn('title_de', menu.get_page_fields_for_display())
+            page = next(iter(menu.pages_for_display.values()))
+            self.assertIn('search_description', page.get_deferred_fields())
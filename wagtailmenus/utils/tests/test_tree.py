@@ -0,0 +1,89 @@
+from django.template import engines
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+
+from wagtailmenus.models import MainMenu
+from wagtailmenus.tests import utils
+from wagtailmenus.utils.tree import CompactPageTree
+
+Page = utils.get_page_model()
+
+
+def make_page(id, path):
+    return Page(id=id, path=path, depth=len(path) // Page.steplen)
+
+
+class TestCompactPageTree(TestCase):
+    """Tests for wagtailmenus.utils.tree.CompactPageTree"""
+
+    def setUp(self):
+        self.parent = make_page(1, '0001')
+        self.pages = [
+            make_page(4, '00010002'),
+            make_page(2, '00010001'),
+            make_page(3, '000100010001'),
+            make_page(6, '000100020001'),
+            make_page(5, '000100010002'),
+            # The parent of this page isn't included
+            make_page(7, '000100030001'),
+        ]
+        self.tree = CompactPageTree(self.pages)
+
+    def get_child_ids(self, page):
+        return [child.id for child in self.tree.get_children_for_page(page)]
+
+    def test_children_keep_their_original_order(self):
+        self.assertEqual(self.get_child_ids(self.parent), [4, 2])
+        self.assertEqual(self.get_child_ids(self.pages[1]), [3, 5])
+        self.assertEqual(self.get_child_ids(self.pages[0]), [6])
+
+    def test_pages_without_children(self):
+        self.assertEqual(self.get_child_ids(self.pages[2]), [])
+        self.assertFalse(self.tree.page_has_children(self.pages[2]))
+        self.assertTrue(self.tree.page_has_children(self.pages[1]))
+
+    def test_pages_that_are_not_included(self):
+        self.assertTrue(self.tree.page_has_children(self.parent))
+        missing_parent = make_page(8, '00010003')
+        self.assertEqual(self.get_child_ids(missing_parent), [7])
+        self.assertFalse(self.tree.page_has_children(make_page(9, '00010004')))
+
+    def test_empty_tree(self):
+        tree = CompactPageTree([])
+        self.assertEqual(tree.get_children_for_page(self.parent), [])
+        self.assertFalse(tree.page_has_children(self.parent))
+
+
+@override_settings(WAGTAILMENUS_USE_COMPACT_PAGE_TREE=True)
+class TestMenusWithCompactPageTree(TestCase):
+    fixtures = ['test.json']
+
+    def test_lookups_match_page_children_dict(self):
+        menu = MainMenu.objects.get(pk=1)
+        menu._option_vals = utils.make_optionvals_instance(max_levels=3)
+        self.assertTrue(menu.uses_compact_page_tree())
+        for page in Page.objects.all():
+            self.assertEqual(
+                menu.get_children_for_page(page),
+                menu.page_children_dict.get(page.path, [])
+            )
+            self.assertEqual(
+                menu.page_has_children(page), page.path in menu.page_children_dict
+            )
+
+    def test_output_is_unchanged(self):
+        def render():
+            request = RequestFactory().get('/about-us/')
+            request.META['WAGTAILMENUS_CURRENT_PAGE'] = Page.objects.get(
+                url_path='/home/about-us/')
+            template = engines['django'].from_string(
+                '{% load menu_tags %}'
+                '{% main_menu max_levels=3 template="menus/main_menu.html" %}'
+                '{% section_menu max_levels=3 %}'
+                '{% children_menu max_levels=2 template="menus/children_menu.html" %}'
+            )
+            return template.render({}, request)
+
+        html = render()
+        with override_settings(WAGTAILMENUS_USE_COMPACT_PAGE_TREE=False):
+            self.assertEqual(render(), html)
@@ -0,0 +1,82 @@
+"""
+A compact alternative to the dictionary of child page lists that menus build
+by default (see ``Menu.get_page_children_dict()``), for menus containing very
+large numbers of pages. Rather than creating a string key and a list for
+every page with children, relationships are stored as integer arrays in a
+'compressed sparse row' (CSR) layout: the children of the page at index ``i``
+are the pages at the indexes stored in ``children[offsets[i]:offsets[i + 1]]``.
+Pages are found by id using a binary search of a sorted list, rather than
+a dictionary.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate, chain, repeat
+
+
+class CompactPageTree:
+    """
+    Indexes the parent/child relationships between the supplied ``pages``,
+    and offers the same lookups as a menu's 'page children dict'. The order
+    of ``pages`` is preserved in lists of children.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages = list(pages)
+        count = len(pages)
+        paths = [page.path for page in pages]
+
+        # Identify the index of each page's parent (or -1 if the parent isn't
+        # included), using a temporary path lookup
+        index_by_path = dict(zip(paths, range(count)))
+        parent_paths = [page.path[:-page.steplen] for page in pages]
+        parent_indexes = list(map(index_by_path.get, parent_paths, repeat(-1)))
+        del index_by_path
+
+        # A stable sort groups child indexes by parent (in their original
+        # order), with pages whose parents aren't included at the start
+        grouped = sorted(range(count), key=parent_indexes.__getitem__)
+        root_count = parent_indexes.count(-1)
+        self.children = array('l', grouped[root_count:])
+        child_counts = Counter(parent_indexes)
+        self.offsets = array('l', chain((0,), accumulate(
+            map(child_counts.get, range(count), repeat(0))
+        )))
+
+        # Children of pages that aren't included are looked up by path
+        self.root_children = {}
+        for i in grouped[:root_count]:
+            self.root_children.setdefault(parent_paths[i], []).append(i)
+
+        # A list (rather than an array) of ids is used for binary searches, so
+        # that existing 'int' objects are reused, and are never recreated
+        # during lookups
+        ids_and_indexes = sorted(zip((page.id for page in pages), range(count)))
+        self.sorted_ids = [item[0] for item in ids_and_indexes]
+        self.indexes_by_sorted_id = array('l', (item[1] for item in ids_and_indexes))
+
+    def get_index(self, page):
+        """
+        Return the index of ``page`` in ``self.pages``, or ``None`` if it isn't
+        included.
+        """
+        sorted_ids = self.sorted_ids
+        i = bisect_left(sorted_ids, page.id)
+        if i < len(sorted_ids) and sorted_ids[i] == page.id:
+            return self.indexes_by_sorted_id[i]
+
+    def get_children_for_page(self, page):
+        """Return a list of child pages for ``page``."""
+        i = self.get_index(page)
+        if i is None:
+            indexes = self.root_children.get(page.path, ())
+        else:
+            indexes = self.children[self.offsets[i]:self.offsets[i + 1]]
+        return list(map(self.pages.__getitem__, indexes))
+
+    def page_has_children(self, page):
+        """Return a boolean indicating whether ``page`` has any children."""
+        i = self.get_index(page)
+        if i is None:
+            return page.path in self.root_children
+        return self.offsets[i + 1] > self.offsets[i]
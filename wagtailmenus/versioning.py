@@ -0,0 +1,128 @@
+"""
+Monotonically increasing 'menu version' numbers, which change whenever
+something that could affect the output of menus is changed (e.g. a menu is
+edited, or a page is published). Because checking a version number is much
+cheaper than rendering a menu, they are useful for generating ETags or cache
+keys.
+
+Version numbers are maintained for each site, and for each flat menu handle
+on each site. Values are read from the cache (``WAGTAILMENUS_CACHE_ALIAS``)
+where possible, with the ``MenuVersion`` model acting as a durable fallback,
+so values are never reissued when the cache is cleared.
+"""
+import time
+
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from wagtailmenus.conf import settings
+
+VERSION_CACHE_KEY = 'wagtailmenus:version:%s:%s'
+
+
+def get_cache():
+    return caches[settings.CACHE_ALIAS]
+
+
+def get_cache_key(site_id, handle=''):
+    return VERSION_CACHE_KEY % (site_id, handle)
+
+
+def get_initial_version():
+    # Using the current time (in milliseconds) means that, even if stored
+    # values are lost altogether, version numbers are never reissued
+    return int(time.time() * 1000)
+
+
+def _get_site_id(site):
+    return getattr(site, 'pk', site)
+
+
+def get_version(site, handle=''):
+    from wagtailmenus.models import MenuVersion
+    site_id = _get_site_id(site)
+    cache = get_cache()
+    key = get_cache_key(site_id, handle)
+    version = cache.get(key)
+    if version is None:
+        version = MenuVersion.objects.filter(
+            site_id=site_id, handle=handle
+        ).values_list('version', flat=True).first()
+        if version is None:
+            version = _create_version(site_id, handle)
+        cache.add(key, version, settings.VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def get_site_version(site):
+    """
+    Return the current menu version number for the supplied ``Site`` (or
+    site id), which changes whenever anything that could affect any menu for
+    the site is changed.
+    """
+    return get_version(site)
+
+
+def get_flat_menu_version(site, handle):
+    """
+    Return the current version number for flat menus with the supplied
+    ``handle`` on the supplied ``Site`` (or site id), which changes when a
+    matching flat menu (or one of its menu items) is changed, or a page
+    belonging to the site is changed.
+    """
+    return get_version(site, handle)
+
+
+def _create_version(site_id, handle):
+    from wagtailmenus.models import MenuVersion
+    version = get_initial_version()
+    try:
+        with transaction.atomic():
+            MenuVersion.objects.create(site_id=site_id, handle=handle, version=version)
+    except IntegrityError:
+        # Created by another process in the meantime
+        version = MenuVersion.objects.get(site_id=site_id, handle=handle).version
+    return version
+
+
+def bump_versions(keys):
+    """
+    Increment the version numbers identified by ``keys`` (an iterable of
+    ``(site, handle)`` tuples, where ``handle`` is blank for site versions).
+    """
+    from wagtailmenus.models import MenuVersion
+    from wagtail.core.models import Site
+    keys = set((_get_site_id(site), handle) for site, handle in keys)
+    # Sites can be deleted along with their root page
+    site_ids = set(Site.objects.filter(
+        pk__in=set(site_id for site_id, handle in keys)
+    ).values_list('pk', flat=True))
+    keys = set(key for key in keys if key[0] in site_ids)
+    versions = {}
+    with transaction.atomic():
+        for site_id, handle in keys:
+            queryset = MenuVersion.objects.filter(site_id=site_id, handle=handle)
+            if queryset.update(version=F('version') + 1):
+                version = queryset.values_list('version', flat=True).get()
+            else:
+                version = _create_version(site_id, handle)
+            versions[get_cache_key(site_id, handle)] = version
+        # The new values are cached while the updated rows are still locked,
+        # so that values from concurrent bumps are cached in the order they
+        # are applied to the database. Readers only ever use 'cache.add()',
+        # so a reader that fetched an earlier value from the database can't
+        # replace them.
+        get_cache().set_many(versions, settings.VERSION_CACHE_TIMEOUT)
+
+
+def bump_site_version(site):
+    bump_versions([(site, '')])
+
+
+def bump_flat_menu_version(site, handle):
+    """
+    Increment the version number for the supplied flat menu ``handle`` on the
+    supplied site, along with the site's own version number.
+    """
+    bump_versions([(site, ''), (site, handle)])
@@ -0,0 +1,142 @@
+"""
+'Warming' of the menu cache (see ``wagtailmenus.cache``) and menu snapshots
+(see ``wagtailmenus.snapshots``), so that the first visitors to each site
+after a deployment (or a cache being cleared) don't have to wait for menus
+to be built. Used by the ``warm_menus`` management command.
+
+Menus are built in the same way as by the JSON API views (using the views
+themselves), so that they are stored with the same cache keys. Each menu is
+a separate 'task', and tasks can be carried out in parallel by a pool of
+threads or processes.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.db import connections
+
+from wagtailmenus.conf import settings
+from wagtailmenus.conf.snapshot import get_settings_snapshot
+
+# 'menu' is one of the keys of VIEW_CLASS_NAMES, or 'snapshot'
+WarmingTask = namedtuple('WarmingTask', ('site_id', 'menu', 'handle', 'page_id'))
+WarmingResult = namedtuple('WarmingResult', ('task', 'duration', 'error'))
+
+VIEW_CLASS_NAMES = {
+    'main_menu': 'MainMenuAPIView',
+    'flat_menu': 'FlatMenuAPIView',
+    'section_menu': 'SectionMenuAPIView',
+}
+
+
+def get_warming_tasks(sites, section_menus=False):
+    """
+    Return a list of ``WarmingTask`` objects for the menus that can be
+    warmed for ``sites``: a snapshot for each site (if snapshots are
+    enabled), and cached main menus, flat menus, and (if ``section_menus``
+    is ``True``) section menus for every page within a section (if the menu
+    cache is enabled). Section menus have active classes applied for the
+    current page, so the API caches a separate copy for each page.
+    """
+    from wagtail.core.models import Page
+    from wagtailmenus.snapshots import get_flat_menu_handles, snapshots_enabled
+    tasks = []
+    for site in sites:
+        if snapshots_enabled():
+            tasks.append(WarmingTask(site.pk, 'snapshot', '', None))
+        if not settings.USE_MENU_CACHE:
+            continue
+        tasks.append(WarmingTask(site.pk, 'main_menu', '', None))
+        tasks.extend(
+            WarmingTask(site.pk, 'flat_menu', handle, None)
+            for handle in get_flat_menu_handles(site)
+        )
+        if section_menus:
+            tasks.extend(
+                WarmingTask(site.pk, 'section_menu', '', page_id)
+                for page_id in Page.objects.live().descendant_of(
+                    site.root_page, inclusive=True
+                ).filter(depth__gte=get_settings_snapshot().SECTION_ROOT_DEPTH).values_list('pk', flat=True)
+            )
+    return tasks
+
+
+def warm_menu(task):
+    """
+    Build and store the menu (or snapshot) identified by ``task`` (if it
+    isn't already up-to-date), and return a ``WarmingResult``.
+    """
+    from wagtail.core.models import Page, Site
+    from wagtailmenus.api import views
+    from wagtailmenus.snapshots import get_menu_context, rebuild_site_snapshot
+    from wagtailmenus.versioning import get_site_version
+
+    start = time.perf_counter()
+    error = None
+    try:
+        site = Site.objects.get(pk=task.site_id)
+        if task.menu == 'snapshot':
+            rebuild_site_snapshot(site, get_site_version(site))
+        else:
+            # Menus are warmed for anonymous visitors
+            request = get_menu_context(site)['request']
+            page = None
+            if task.page_id is not None:
+                page = Page.objects.get(pk=task.page_id).specific
+            kwargs = {'handle': task.handle} if task.handle else {}
+            view = getattr(views, VIEW_CLASS_NAMES[task.menu])()
+            view.setup_menu(request, site, page, **kwargs)
+            view.get_menu_data(view.option_values)
+    except Exception as e:
+        error = '%s: %s' % (e.__class__.__name__, e)
+    return WarmingResult(task, time.perf_counter() - start, error)
+
+
+def warm_menu_in_worker(task):
+    """
+    Call ``warm_menu()`` from a thread or process in a pool, setting up
+    Django first if necessary, and closing database connections afterwards.
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        # Processes started using the 'spawn' method
+        django.setup()
+    try:
+        return warm_menu(task)
+    finally:
+        connections.close_all()
+
+
+def warm_menus(tasks, workers=1, use_processes=False):
+    """
+    Carry out ``tasks``, using a pool of ``workers`` threads (or processes,
+    if ``use_processes`` is ``True``), or in the current thread if
+    ``workers`` is ``1``. Yields a ``WarmingResult`` for each task as it is
+    completed.
+    """
+    if workers <= 1:
+        for task in tasks:
+            yield warm_menu(task)
+        return
+    if use_processes:
+        # Processes mustn't share database connections with this one
+        connections.close_all()
+        executor_class = ProcessPoolExecutor
+    else:
+        executor_class = ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        for result in executor.map(warm_menu_in_worker, tasks):
+            yield result
+
+
+def warm_menus_after_migrate(**kwargs):
+    """
+    A ``post_migrate`` signal handler, which warms menus for all sites if
+    ``WAGTAILMENUS_WARM_MENUS_AFTER_MIGRATE`` is ``True``.
+    """
+    from wagtail.core.models import Site
+    if not settings.WARM_MENUS_AFTER_MIGRATE:
+        return
+    for result in warm_menus(get_warming_tasks(Site.objects.all())):
+        pass